@@ -1,13 +1,31 @@
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+import argparse
 import pandas as pd
 import joblib
 import numpy as np
-from datetime import datetime
-from unidecode import unidecode
 import os
+import json
+import threading
+import time
+import uuid
+from collections import deque
 
-from models.performance_model import predict_performance
-from models.match_result_model import predict_match_result
-from models.transfer_model import predict_transfer
+from models.player_similarity import DEFAULT_NEIGHBOURS, MAX_NEIGHBOURS
+from models.performance_model import predict_performance, predict_performance_batch
+from models.match_result_model import predict_match_result, predict_match_result_batch, simulate_season
+from models.transfer_model import predict_transfer, predict_transfer_batch
+from models.snapshot import print_report
+from models.cache import ResponseCache
+from models.row_index import lookup
+from models.data_state import load_state, reload_state
+from models.session_store import make_session_store
+from models.model_registry import ModelRegistry, MicroBatcher, model_transfer_results
+from models.market_cube import recent_trends
+from models.instrumentation import Metrics, SamplingProfiler, finish_stages, stage, start_stages
+from models.snapshot import rss_bytes
+from models.schema import memory_report
+from models.serving import Overloaded, SingleFlight, WorkerPool
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
@@ -15,58 +33,272 @@ CORS(app, supports_credentials=True)
 
 # Path to data files
 DATA_PATH = "../data/"
+FEATURE_STORE_PATH = DATA_PATH + "feature_store/"
+MODEL_PATH = "../models/saved/"
 
-# Load required datasets
+# Saved models are loaded on first use unless preloaded at startup
+PRELOAD_MODELS = False
+# Concurrent model requests are scored together, up to this many per call,
+# waiting at most this many seconds for a batch to fill
+MODEL_BATCH_SIZE = 64
+MODEL_BATCH_WAIT = 0.005
+
+# Form windows and EWM half-life (in games) accepted by /predict_performance,
+# with their smallest and largest values; windows are whole numbers
+FORM_PARAMS = ["last_games", "last_days", "season", "halflife"]
+FORM_LIMITS = {"last_games": (1, 1000), "last_days": (1, 36500), "season": (1900, 2100), "halflife": (0.01, 1000)}
+
+# Moves followed by /club_destinations at most, and destinations listed per move
+MAX_TRANSFER_HOPS = 3
+CLUB_DESTINATIONS = 10
+MAX_CLUB_DESTINATIONS = 50
+
+# Season simulations run by /simulate_season by default and at most, and the
+# most clubs simulated; memory grows with simulations x clubs^2
+SEASON_SIMULATIONS = 1000
+MAX_SEASON_SIMULATIONS = 20000
+MAX_SEASON_CLUBS = 30
+
+# Per-client search/selection state: "memory" for one process, "sqlite" to
+# share it between worker processes on the same host
+SESSION_BACKEND = "memory"
+SESSION_DB_PATH = DATA_PATH + "sessions.sqlite3"
+SESSION_TTL = 3600
+MAX_SESSIONS = 10000
+SESSION_MEMORY_CAP = 64 * 1024 * 1024
+SESSION_COOKIE = "session_id"
+
+# Cached responses of the deterministic endpoints, dropped on data reload
+RESPONSE_CACHE_ENTRIES = 10000
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+
+# CPU-bound prediction work runs on a bounded pool: SERVING_WORKERS calls at
+# once and SERVING_QUEUE waiting, beyond which requests get a 503
+SERVING_WORKERS = 4
+SERVING_QUEUE = 64
+# Seconds a request waits for its result before a 504
+REQUEST_TIMEOUT = 10
+BATCH_REQUEST_TIMEOUT = 120
+# Retry-After sent with the 503 of a full pool
+RETRY_AFTER_SECONDS = 1
+
+# Requests slower than this many seconds are logged with their stage times
+SLOW_REQUEST_SECONDS = 1.0
+# Let a request with "X-Profile: 1" (and the admin token, when set) run
+# under the sampling profiler; the last PROFILES_KEPT reports are kept
+PROFILING = False
+PROFILE_INTERVAL = 0.001
+PROFILES_KEPT = 20
+
+# Poll the CSVs for new rows every this many seconds (0 disables the watcher;
+# POST /admin/reload always works)
+RELOAD_INTERVAL = 0
+# Required as X-Admin-Token by the admin endpoints when set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Load required datasets (memory-mapped snapshot when fresh, CSVs otherwise)
+# and build the indexes, search index, aggregates and features on top
 try:
-    appearances = pd.read_csv(DATA_PATH + "appearances.csv")
-    club_games = pd.read_csv(DATA_PATH + "club_games.csv")
-    clubs = pd.read_csv(DATA_PATH + "clubs.csv")
-    games = pd.read_csv(DATA_PATH + "games.csv")
-    players = pd.read_csv(DATA_PATH + "players.csv")
-    player_valuations = pd.read_csv(DATA_PATH + "player_valuations.csv")
-    transfers = pd.read_csv(DATA_PATH + "transfers.csv")
+    state, load_report = load_state(DATA_PATH, FEATURE_STORE_PATH)
 except FileNotFoundError as e:
     print(f"Error loading files: {e}")
     exit(1)
+print_report(load_report)
 
-# Player preprocessing
-players = players.dropna(subset=["name", "date_of_birth", "current_club_name"])
-players["name_norm"] = players["name"].apply(lambda x: unidecode(str(x)).lower())
-players["date_of_birth"] = pd.to_datetime(players["date_of_birth"], errors="coerce")
-players["age"] = players["date_of_birth"].apply(
-    lambda x: datetime.now().year - x.year if pd.notnull(x) else None
+# Saved XGBoost models behind /predict_transfer_model
+model_registry = ModelRegistry(MODEL_PATH)
+if PRELOAD_MODELS:
+    model_registry.load_all()
+model_batcher = MicroBatcher(
+    lambda ids: model_transfer_results(model_registry, state.player_features, ids, state.club_names),
+    MODEL_BATCH_SIZE, MODEL_BATCH_WAIT,
 )
-if "player_id" not in players.columns:
-    players["player_id"] = players.index
 
-# Stores the last searched players for selection by number
-last_search = {}
+# Last search results and selected player of each client, keyed by session id
+sessions = make_session_store(
+    SESSION_BACKEND, SESSION_DB_PATH, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, max_bytes=SESSION_MEMORY_CAP
+)
+
+# Request latency per route and stage, exported with table sizes by /metrics
+metrics = Metrics()
+metrics.describe("http_request_duration_seconds", "Request latency by route.")
+metrics.describe("http_requests_total", "Requests by route and status.")
+metrics.describe("stage_duration_seconds", "Time spent in named stages of a request.")
+profiles = deque(maxlen=PROFILES_KEPT)
+
+def is_admin():
+    return not ADMIN_TOKEN or request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+@app.before_request
+def start_request_timer():
+    request.start_time = time.perf_counter()
+    request.stages_token = start_stages()
+    if PROFILING and request.headers.get("X-Profile") == "1" and is_admin():
+        request.profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+
+@app.after_request
+def record_request(response):
+    if not hasattr(request, "start_time"):
+        return response
+    seconds = time.perf_counter() - request.start_time
+    stages = finish_stages(request.stages_token)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("http_request_duration_seconds", seconds, route=route, method=request.method)
+    metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    for name, stage_seconds in stages.items():
+        metrics.observe("stage_duration_seconds", stage_seconds, stage=name)
+
+    if seconds >= SLOW_REQUEST_SECONDS:
+        breakdown = ", ".join(f"{name}={stage_seconds * 1000:.1f}ms" for name, stage_seconds in stages.items())
+        app.logger.warning(f"Slow request {request.method} {request.full_path} took {seconds * 1000:.1f}ms: {breakdown or 'no stages'}")
+
+    profiler = getattr(request, "profiler", None)
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex[:12]
+        profiles.append({"id": profile_id, "method": request.method, "path": request.full_path, **profiler.stop().report()})
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+def session_id():
+    # From the X-Session-Id header or the session cookie, new sessions get a cookie
+    sid = request.headers.get("X-Session-Id") or request.cookies.get(SESSION_COOKIE)
+    if not sid:
+        sid = getattr(request, "new_session_id", None) or uuid.uuid4().hex
+        request.new_session_id = sid
+    return sid
+
+@app.after_request
+def set_session_cookie(response):
+    sid = getattr(request, "new_session_id", None)
+    if sid:
+        response.set_cookie(SESSION_COOKIE, sid, max_age=SESSION_TTL, httponly=True, samesite="Lax")
+    return response
+
+def selected_player_id():
+    state = sessions.get(session_id()) or {}
+    return state.get("selected_player_id")
+
+response_cache = ResponseCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES)
+worker_pool = WorkerPool(SERVING_WORKERS, SERVING_QUEUE)
+in_flight = SingleFlight()
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": "Server busy, try again shortly"})
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
+@app.errorhandler(TimeoutError)
+def timed_out(e):
+    return jsonify({"error": "Request timed out"}), 504
+
+def compute_response(key, version, compute):
+    # Cached on the pool thread, so a result too late for its request serves the retry
+    result, extra = compute()
+    return response_cache.put(key, version, jsonify(result).get_data(), extra)
+
+def cached_json(endpoint, inputs, version, compute):
+    """JSON response of compute() for these inputs and data version.
+
+    compute returns (result, extra) and runs on the worker pool, so it must
+    not touch the request; extra is cached alongside the body and returned
+    with the response. Identical requests arriving while one is computed
+    wait for it instead of computing again. Clients revalidate with
+    If-None-Match and get a 304 when the ETag still matches.
+    """
+    key = (endpoint, json.dumps(inputs, sort_keys=True, default=str))
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = in_flight.do(
+            (key, version),
+            lambda: worker_pool.run(compute_response, key, version, compute, timeout=REQUEST_TIMEOUT),
+            timeout=REQUEST_TIMEOUT,
+        )
+    # Checked by hand: werkzeug only answers conditional GET/HEAD, the predict endpoints are POST
+    if request.if_none_match.contains(entry.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(entry.body, mimetype=app.json.mimetype)
+    response.set_etag(entry.etag)
+    return response, entry.extra
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "data_version": state.version,
+        "responses": response_cache.stats(),
+        "in_flight": in_flight.stats(),
+        "workers": worker_pool.stats(),
+    })
 
 @app.route("/")
 def home():
     return "Football Prediction API Running!"
 
+# Ranking weights accepted as query parameters by the search endpoints
+RANKING_PARAMS = {"rank_age": "age", "rank_value": "market_value", "rank_club": "current_club"}
+
+def ranking_from_args(args):
+    # Raises ValueError for weights that are not finite numbers
+    ranking = {weight: float(args[param]) for param, weight in RANKING_PARAMS.items() if param in args}
+    if not all(np.isfinite(value) for value in ranking.values()):
+        raise ValueError("ranking weights must be finite")
+    return ranking
+
 # Search for a player by name
 @app.route("/search_player", methods=["GET"])
 def search_player():
+    data = state
     query = request.args.get("q", "")
-    q_norm = unidecode(query.lower())
+    fuzzy = request.args.get("fuzzy", "1") != "0"
+    try:
+        ranking = ranking_from_args(request.args)
+    except ValueError:
+        return jsonify({"error": f"{', '.join(RANKING_PARAMS)} must be numbers"}), 400
+    club = request.args.get("club")
 
-    matched = players[players["name_norm"].str.contains(q_norm, na=False)].copy()
-    matched = matched[matched["age"].notnull()]
-    matched["relevance_score"] = abs(matched["age"] - 25)
-    matched = matched.sort_values(by="relevance_score").head(10)
+    def compute():
+        matched = data.player_search.search(query, fuzzy=fuzzy, ranking=ranking, club=club)
+        search_results = matched.reset_index(drop=True)
 
-    search_results = matched.reset_index(drop=True)
-    last_search["players"] = search_results
+        with stage("search.format"):
+            result_lines = []
+            for idx, row in search_results.iterrows():
+                result_lines.append(
+                    f"{idx + 1}. {row['name']} - {row['current_club_name']} ({row['country_of_citizenship']}, {int(row['age'])} years)"
+                )
+        # Only ids and scores are kept per session, rows are looked up again on selection
+        options = [
+            [player_id, score]
+            for player_id, score in zip(search_results["player_id"].tolist(), search_results["relevance_score"].tolist())
+        ]
+        return {"options": result_lines}, options
 
-    result_lines = []
-    for idx, row in search_results.iterrows():
-        result_lines.append(
-            f"{idx + 1}. {row['name']} - {row['current_club_name']} ({row['country_of_citizenship']}, {int(row['age'])} years)"
-        )
+    response, options = cached_json("search_player", sorted(request.args.items(multi=True)), data.version, compute)
+    with stage("search.session"):
+        sessions.update(session_id(), players=options)
+    return response
 
-    return jsonify({"options": result_lines})
+# Name suggestions while typing (token prefix match)
+@app.route("/autocomplete_player", methods=["GET"])
+def autocomplete_player():
+    prefix = request.args.get("q", "")
+    try:
+        limit = min(int(request.args.get("limit", 10)), 50)
+        ranking = ranking_from_args(request.args)
+    except ValueError:
+        return jsonify({"error": f"limit and {', '.join(RANKING_PARAMS)} must be numbers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    matched = state.player_search.autocomplete(
+        prefix, limit=limit, ranking=ranking, club=request.args.get("club")
+    )
+    suggestions = [
+        {"player_id": int(row["player_id"]), "name": row["name"], "current_club_name": row["current_club_name"]}
+        for _, row in matched.iterrows()
+    ]
+    return jsonify({"suggestions": suggestions})
 
 # Select a player by the number from the previous list
 @app.route("/select_player", methods=["POST"])
@@ -74,14 +306,19 @@ def select_player():
     data = request.get_json()
     index = int(data.get("option")) - 1
 
-    if "players" not in last_search or index >= len(last_search["players"]):
+    sid = session_id()
+    options = (sessions.get(sid) or {}).get("players")
+    if options is None or index >= len(options):
         return jsonify({"error": "Invalid selection"}), 400
 
-    selected = last_search["players"].iloc[index].to_dict()
-    last_search["selected_player"] = selected  # Save the chosen player
+    player_id, relevance_score = options[index]
+    data = state
+    selected = lookup(data.indexes, "players", data.players, "player_id", player_id).iloc[0].to_dict()
+    selected["relevance_score"] = relevance_score
+    sessions.update(sid, selected_player_id=player_id)  # Save the chosen player
     return jsonify({"selected_player": selected})
 
-# Performance prediction (not modified)
+# Career means per game, plus recent form over the windows given in the body
 @app.route("/predict_performance", methods=["POST"])
 def performance():
     data = request.json
@@ -89,9 +326,21 @@ def performance():
 
     if player_id is None:
         return jsonify({"error": "player_id is required"}), 400
+    window = {key: data.get(key) for key in FORM_PARAMS if data.get(key) is not None}
+    for key, value in window.items():
+        low, high = FORM_LIMITS[key]
+        if not is_id(value) or not low <= value <= high or (key != "halflife" and value != int(value)):
+            kind = "a number" if key == "halflife" else "a whole number"
+            return jsonify({"error": f"{key} must be {kind} between {low} and {high}"}), 400
+    # Windows count whole games, days and seasons; the half-life may be fractional
+    window = {key: value if key == "halflife" else int(value) for key, value in window.items()}
 
-    result = predict_performance(player_id, appearances)
-    return jsonify(result)
+    data = state
+    response, _ = cached_json(
+        "predict_performance", [player_id, window] if window else player_id, data.version,
+        lambda: (predict_performance(player_id, data.appearances, data.indexes, data.player_form, window), None),
+    )
+    return response
 
 # Match result prediction (not modified)
 @app.route("/predict_match_result", methods=["POST"])
@@ -103,9 +352,39 @@ def match_result():
     if not home_team or not away_team:
         return jsonify({"error": "home_team and away_team are required"}), 400
 
-    result = predict_match_result(home_team, away_team, club_games, games)
+    data = state
+    result = predict_match_result(home_team, away_team, data.team_strengths)
     return jsonify(result)
 
+# Simulated final table of a league season, from the team strength table
+@app.route("/simulate_season", methods=["POST"])
+def season_simulation():
+    data = request.get_json() or {}
+    competition_id = data.get("competition_id")
+    club_ids = data.get("club_ids")
+    seed = data.get("seed")
+    n_sims = data.get("n_sims", SEASON_SIMULATIONS)
+    if not isinstance(n_sims, int) or isinstance(n_sims, bool) or n_sims < 1:
+        return jsonify({"error": "n_sims must be a positive integer"}), 400
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return jsonify({"error": "seed must be a non-negative integer or null"}), 400
+    n_sims = min(n_sims, MAX_SEASON_SIMULATIONS)
+
+    data = state
+    if club_ids is None:
+        if not competition_id:
+            return jsonify({"error": "competition_id or club_ids is required"}), 400
+        club_ids = data.clubs.loc[data.clubs["domestic_competition_id"] == competition_id, "club_id"].tolist()
+    if not isinstance(club_ids, list) or not all(is_id(club_id) for club_id in club_ids):
+        return jsonify({"error": "club_ids must be a list of club ids"}), 400
+    if len(set(club_ids)) < 2:
+        return jsonify({"error": "At least two clubs are needed."}), 400
+    if len(set(club_ids)) > MAX_SEASON_CLUBS:
+        return jsonify({"error": f"at most {MAX_SEASON_CLUBS} clubs per season"}), 400
+
+    table = worker_pool.run(simulate_season, club_ids, data.team_strengths, n_sims, seed, timeout=REQUEST_TIMEOUT)
+    return jsonify({"n_sims": n_sims, "table": table.round(4).to_dict(orient="records")})
+
 @app.route("/predict_transfer", methods=["POST"])
 def transfer():
     data = request.get_json()
@@ -113,13 +392,373 @@ def transfer():
 
     # If not explicitly provided, use the selected one
     if player_id is None:
-        selected = last_search.get("selected_player")
-        if not selected:
+        player_id = selected_player_id()
+        if player_id is None:
+            return jsonify({"error": "No player selected or provided"}), 400
+
+    data = state
+
+    def compute():
+        # Precomputed by precompute_transfers.py for this data version, live for anyone it missed
+        if data.transfer_predictions is not None:
+            result = data.transfer_predictions.get(player_id)
+            if result is not None:
+                return result, None
+        return predict_transfer(
+            player_id, data.player_valuations, data.transfers, data.players, data.clubs,
+            data.aggregates, data.indexes, data.player_features,
+        ), None
+
+    response, _ = cached_json("predict_transfer", player_id, data.version, compute)
+    return response
+
+# Filters of /similar_players: exact matches and numeric bounds
+SIMILAR_MATCH_FILTERS = ["position", "foot", "league"]
+SIMILAR_RANGE_FILTERS = ["min_age", "max_age", "min_market_value", "max_market_value"]
+
+# Players closest to one player in the feature space, with optional filters
+@app.route("/similar_players", methods=["POST"])
+def similar_players():
+    data = request.get_json() or {}
+    player_id = data.get("player_id")
+
+    # If not explicitly provided, use the selected one
+    if player_id is None:
+        player_id = selected_player_id()
+        if player_id is None:
+            return jsonify({"error": "No player selected or provided"}), 400
+
+    k = data.get("k", DEFAULT_NEIGHBOURS)
+    if not is_id(k) or k < 1:
+        return jsonify({"error": "k must be a positive number"}), 400
+    filters = {key: data[key] for key in SIMILAR_MATCH_FILTERS if data.get(key) is not None}
+    filters.update({key: data[key] for key in SIMILAR_RANGE_FILTERS if data.get(key) is not None})
+    if not all(is_id(filters[key]) for key in SIMILAR_RANGE_FILTERS if key in filters):
+        return jsonify({"error": f"{', '.join(SIMILAR_RANGE_FILTERS)} must be numbers"}), 400
+    if data.get("other_clubs"):
+        filters["other_clubs"] = True
+    k = min(int(k), MAX_NEIGHBOURS)
+
+    data = state
+
+    def compute():
+        similar = data.player_similarity.similar(player_id, k, **filters)
+        if similar is None:
+            return {"error": "Player not found."}, None
+        return {"player_id": player_id, "filters": filters, "similar_players": similar}, None
+
+    response, _ = cached_json("similar_players", [player_id, k, filters], data.version, compute)
+    return response
+
+# Latest rolling rating from game events (games_ratings.py)
+@app.route("/player_rating", methods=["POST"])
+def player_rating():
+    data = request.get_json()
+    player_id = data.get("player_id")
+
+    # If not explicitly provided, use the selected one
+    if player_id is None:
+        player_id = selected_player_id()
+        if player_id is None:
+            return jsonify({"error": "No player selected or provided"}), 400
+
+    ratings = state.player_ratings
+    if ratings is None:
+        return jsonify({"error": "Ratings not available, run games_ratings.py"}), 503
+    if player_id not in ratings.index:
+        return jsonify({"error": "Player not found."})
+
+    rating = ratings.loc[player_id]
+    return jsonify({
+        "player_id": int(player_id),
+        "rating": round(float(rating["rolling_rating"]), 2),
+        "date": None if pd.isna(rating["date"]) else f"{rating['date']:%Y-%m-%d}",
+    })
+
+# Recent league market totals per season and transfer window, read from the market cube
+@app.route("/market_trends", methods=["GET"])
+def market_trends():
+    data = state
+    league = request.args.get("league")
+    window = request.args.get("window")
+    try:
+        seasons = min(int(request.args.get("seasons", 3)), 50)
+    except ValueError:
+        return jsonify({"error": "seasons must be a number"}), 400
+    if seasons < 1:
+        return jsonify({"error": "seasons must be positive"}), 400
+
+    def compute():
+        rows = recent_trends(data.market_cube, league=league, seasons=seasons, window=window)
+        rows = rows.drop(columns="season_start").round(2).astype(object).where(rows.notna(), None)
+        return rows.to_dict(orient="records"), None
+
+    response, _ = cached_json("market_trends", sorted(request.args.items(multi=True)), data.version, compute)
+    return response
+
+# Where players of one or more clubs move next, and after that, from the transfer graph
+@app.route("/club_destinations", methods=["GET"])
+def club_destinations():
+    data = state
+    try:
+        club_ids = [int(club_id) for club_id in request.args.getlist("club_id")]
+        hops = int(request.args.get("hops", 1))
+        top = min(int(request.args.get("top", CLUB_DESTINATIONS)), MAX_CLUB_DESTINATIONS)
+        half_life = float(request.args["half_life"]) if "half_life" in request.args else None
+    except ValueError:
+        return jsonify({"error": "club_id, hops, top and half_life must be numbers"}), 400
+    fee_weighted = request.args.get("fee_weighted", "false").lower() in ("1", "true", "yes")
+    if not club_ids:
+        return jsonify({"error": "club_id is required"}), 400
+    if not 1 <= hops <= MAX_TRANSFER_HOPS:
+        return jsonify({"error": f"hops must be between 1 and {MAX_TRANSFER_HOPS}"}), 400
+    if top < 1:
+        return jsonify({"error": "top must be at least 1"}), 400
+    if half_life is not None and not (np.isfinite(half_life) and half_life > 0):
+        return jsonify({"error": "half_life must be a positive number"}), 400
+
+    def compute():
+        graph = data.aggregates["transfer_graph"]
+        steps = graph.reach(club_ids, hops, half_life, fee_weighted)
+        results = []
+        for row, club_id in enumerate(club_ids):
+            if club_id not in graph.slots:
+                results.append({"club_id": club_id, "error": "Club not found."})
+                continue
+            results.append({
+                "club_id": club_id,
+                "name": graph.names[graph.slots[club_id]],
+                "hops": [
+                    [
+                        {"club_id": to_club_id, "name": name, "probability": round(probability * 100, 2)}
+                        for to_club_id, name, probability in graph.top(step[row], top)
+                    ]
+                    for step in steps
+                ],
+            })
+        return results, None
+
+    inputs = [club_ids, hops, top, half_life, fee_weighted]
+    response, _ = cached_json("club_destinations", inputs, data.version, compute)
+    return response
+
+# Transfer prediction from the saved models, micro-batched across concurrent requests
+@app.route("/predict_transfer_model", methods=["POST"])
+def transfer_model():
+    data = request.get_json()
+    player_id = data.get("player_id")
+
+    # If not explicitly provided, use the selected one
+    if player_id is None:
+        player_id = selected_player_id()
+        if player_id is None:
             return jsonify({"error": "No player selected or provided"}), 400
-        player_id = selected["player_id"]
+    if not is_id(player_id):
+        return jsonify({"error": "invalid player_id"}), 400
 
-    result = predict_transfer(player_id, player_valuations, transfers, players, clubs)
+    try:
+        result = model_batcher(player_id, timeout=REQUEST_TIMEOUT)
+    except TimeoutError:
+        raise  # an OSError too, but answered with a 504
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Model unavailable: {e}"}), 503
     return jsonify(result)
 
+@app.route("/models", methods=["GET"])
+def models_status():
+    return jsonify({
+        "models": model_registry.status(),
+        "batches": model_batcher.batches,
+        "batched_requests": model_batcher.items,
+    })
+
+# Batch variants: one request scores many players/fixtures, results in input order
+MAX_BATCH_SIZE = 20000
+
+def read_batch(key):
+    data = request.get_json(silent=True) or {}
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"{key} must be a non-empty list"}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({"error": f"at most {MAX_BATCH_SIZE} items per batch"}), 400)
+    return items, None
+
+def is_id(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def predict_ids(items, predict):
+    # Invalid ids get a per-item error, the rest are scored in one call
+    valid = [item for item in items if is_id(item)]
+    scored = iter(predict(valid)) if valid else iter([])
+    return [next(scored) if is_id(item) else {"error": "invalid player_id"} for item in items]
+
+@app.route("/predict_performance_batch", methods=["POST"])
+def performance_batch():
+    player_ids, error = read_batch("player_ids")
+    if error:
+        return error
+
+    data = state
+    results = worker_pool.run(
+        predict_ids, player_ids, lambda ids: predict_performance_batch(ids, data.appearances, data.indexes),
+        timeout=BATCH_REQUEST_TIMEOUT,
+    )
+    return jsonify({"results": results})
+
+@app.route("/predict_match_result_batch", methods=["POST"])
+def match_result_batch():
+    fixtures, error = read_batch("fixtures")
+    if error:
+        return error
+
+    pairs = [
+        (f.get("home_team"), f.get("away_team")) if isinstance(f, dict) else (None, None)
+        for f in fixtures
+    ]
+    valid = [pair for pair in pairs if is_id(pair[0]) and is_id(pair[1])]
+    data = state
+    scored = iter(worker_pool.run(predict_match_result_batch, valid, data.team_strengths, timeout=BATCH_REQUEST_TIMEOUT))
+    results = [
+        next(scored) if is_id(home) and is_id(away) else {"error": "home_team and away_team are required"}
+        for home, away in pairs
+    ]
+    return jsonify({"results": results})
+
+@app.route("/predict_transfer_batch", methods=["POST"])
+def transfer_batch():
+    player_ids, error = read_batch("player_ids")
+    if error:
+        return error
+
+    data = state
+    results = worker_pool.run(
+        predict_ids,
+        player_ids,
+        lambda ids: predict_transfer_batch(
+            ids, data.player_valuations, data.transfers, data.players, data.clubs,
+            data.aggregates, data.indexes, data.player_features,
+        ),
+        timeout=BATCH_REQUEST_TIMEOUT,
+    )
+    return jsonify({"results": results})
+
+@app.route("/predict_transfer_model_batch", methods=["POST"])
+def transfer_model_batch():
+    player_ids, error = read_batch("player_ids")
+    if error:
+        return error
+
+    try:
+        data = state
+        results = worker_pool.run(
+            predict_ids,
+            player_ids,
+            lambda ids: model_transfer_results(model_registry, data.player_features, ids, data.club_names),
+            timeout=BATCH_REQUEST_TIMEOUT,
+        )
+    except TimeoutError:
+        raise  # an OSError too, but answered with a 504
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Model unavailable: {e}"}), 503
+    return jsonify({"results": results})
+
+# Hot reload: new CSV rows are applied to a copy of the state, which then
+# replaces the current one in a single assignment
+reload_lock = threading.Lock()
+last_reload = None
+
+def reload_data():
+    global state, last_reload
+    with reload_lock:
+        new_state, report = reload_state(state)
+        state = new_state
+        last_reload = report
+    if report["method"] != "none":
+        print(f"Reloaded data ({report['method']}) in {report['seconds']:.2f}s: {report['rows_applied']}")
+    return report
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(reload_data())
+
+@app.route("/admin/data", methods=["GET"])
+def admin_data():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({
+        "version": state.version,
+        "rows": {name: len(df) for name, df in state.tables.items()},
+        "transfer_predictions": state.transfer_predictions.stats() if state.transfer_predictions is not None else None,
+        "last_reload": last_reload,
+    })
+
+# Deep memory use of every loaded table and column, and of the derived frames
+@app.route("/debug/memory", methods=["GET"])
+def debug_memory():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    data = state
+    tables = memory_report(data.tables)
+    derived = memory_report({"player_features": data.player_features, "market_cube": data.market_cube})
+    return jsonify({
+        "version": data.version,
+        "tables": tables,
+        "derived": derived,
+        "table_bytes": sum(table["bytes"] for table in tables.values()),
+        "process_resident_memory_bytes": rss_bytes(),
+    })
+
+# Prometheus text: request and stage histograms, plus data and cache sizes
+@app.route("/metrics", methods=["GET"])
+def metrics_text():
+    data = state
+    gauges = [("data_table_rows", {"table": name}, len(df)) for name, df in data.tables.items()]
+    gauges += [
+        ("data_info", {"version": data.version}, 1),
+        ("player_features_rows", {}, len(data.player_features)),
+        ("market_cube_rows", {}, len(data.market_cube)),
+        ("team_strength_clubs", {}, len(data.team_strengths.club_ids)),
+        ("process_resident_memory_bytes", {}, rss_bytes()),
+    ]
+    cache = response_cache.stats()
+    gauges += [("response_cache_entries", {}, cache["entries"]), ("response_cache_bytes", {}, cache["bytes"])]
+    pool = worker_pool.stats()
+    gauges += [(f"worker_pool_{name}", {}, pool[name]) for name in ["pending", "completed", "rejected", "timeouts"]]
+    gauges += [("single_flight_shared", {}, in_flight.stats()["shared"])]
+    session_stats = sessions.stats()
+    gauges += [("sessions", {"backend": session_stats["backend"]}, session_stats["sessions"])]
+    return app.response_class(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+# Reports of the requests run under the sampling profiler, newest last
+@app.route("/admin/profiles", methods=["GET"])
+def admin_profiles():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"profiling": PROFILING, "profiles": list(profiles)})
+
+def watch_data():
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        try:
+            reload_data()
+        except Exception as e:
+            print(f"Reload failed: {e}")
+
+if RELOAD_INTERVAL:
+    threading.Thread(target=watch_data, daemon=True).start()
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Football prediction API")
+    parser.add_argument("--production", action="store_true",
+                        help="threaded server without the debugger and reloader")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    if args.production:
+        # Server threads only parse and wait, prediction work is bounded by the worker pool
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    else:
+        app.run(host=args.host, port=args.port, debug=True)
@@ -0,0 +1,64 @@
+"""Throughput of the batch prediction functions against a loop of single calls.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch --data-path data/ --players 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from models.performance_model import predict_performance, predict_performance_batch
+from models.row_index import build_indexes
+from models.snapshot import load_tables
+from models.transfer_model import build_transfer_aggregates, predict_transfer, predict_transfer_batch
+
+
+def throughput(fn, n):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "per_second": n / seconds}
+
+
+def run(data_path, n_players, seed=42):
+    tables, _, _ = load_tables(data_path)
+    indexes = build_indexes(tables)
+    players, valuations, transfers = tables["players"], tables["player_valuations"], tables["transfers"]
+    aggregates = build_transfer_aggregates(transfers, players, tables["clubs"])
+
+    rng = np.random.default_rng(seed)
+    player_ids = rng.choice(players["player_id"].to_numpy(), n_players).tolist()
+
+    def transfer_args():
+        return valuations, transfers, players, tables["clubs"], aggregates, indexes
+
+    results = {
+        "predict_transfer": {
+            "loop": throughput(lambda: [predict_transfer(p, *transfer_args()) for p in player_ids], n_players),
+            "batch": throughput(lambda: predict_transfer_batch(player_ids, *transfer_args()), n_players),
+        },
+        "predict_performance": {
+            "loop": throughput(
+                lambda: [predict_performance(p, tables["appearances"], indexes) for p in player_ids], n_players
+            ),
+            "batch": throughput(
+                lambda: predict_performance_batch(player_ids, tables["appearances"], indexes), n_players
+            ),
+        },
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-path", default="../data/")
+    parser.add_argument("--players", type=int, default=10_000)
+    args = parser.parse_args()
+
+    for name, result in run(args.data_path, args.players).items():
+        loop, batch = result["loop"], result["batch"]
+        print(f"{name} ({args.players} players)")
+        print(f"  single-call loop : {loop['seconds']:8.2f}s  {loop['per_second']:10.0f} players/s")
+        print(f"  batch            : {batch['seconds']:8.2f}s  {batch['per_second']:10.0f} players/s")
+        print(f"  speedup          : {loop['seconds'] / batch['seconds']:.1f}x")
@@ -0,0 +1,63 @@
+"""Compare KeyIndex lookups with the boolean-mask scans they replace.
+
+Run from the repository root:
+    python -m benchmarks.bench_row_index --rows 2000000 --keys 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.row_index import KeyIndex
+
+
+def time_lookups(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def run(rows, n_keys, n_lookups, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "player_id": rng.integers(0, n_keys, rows),
+        "goals": rng.poisson(0.2, rows),
+        "assists": rng.poisson(0.15, rows),
+    })
+    keys = rng.integers(0, n_keys, n_lookups).tolist()
+
+    start = time.perf_counter()
+    index = KeyIndex(df, "player_id")
+    build_seconds = time.perf_counter() - start
+
+    mask_seconds = time_lookups(lambda k: df[df["player_id"] == k], keys)
+    index_seconds = time_lookups(index.rows, keys)
+
+    # Both paths must return the same rows in the same order
+    for key in keys[:20]:
+        pd.testing.assert_frame_equal(df[df["player_id"] == key], index.rows(key))
+
+    return {
+        "rows": rows,
+        "keys": n_keys,
+        "build_seconds": build_seconds,
+        "mask_ms_per_lookup": mask_seconds * 1000,
+        "index_ms_per_lookup": index_seconds * 1000,
+        "speedup": mask_seconds / index_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keys", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.rows, args.keys, args.lookups)
+    print(f"{result['rows']} rows, {result['keys']} keys (index built in {result['build_seconds']:.3f}s)")
+    print(f"  mask scan : {result['mask_ms_per_lookup']:.3f} ms/lookup")
+    print(f"  key index : {result['index_ms_per_lookup']:.3f} ms/lookup")
+    print(f"  speedup   : {result['speedup']:.1f}x")
@@ -0,0 +1,357 @@
+"""Benchmark suite over generated data, with results written as JSON.
+
+Generates (or reuses) synthetic data at the given scale under --root and
+times backend startup, model loading, every endpoint, the predict_transfer internals,
+games_ratings.py, market_trends.py and both training dataset builders.
+Compare a run with an earlier one to spot regressions between commits.
+
+Run from the repository root:
+    python -m benchmarks.suite --scale 0.5 --output bench.json
+    python -m benchmarks.suite --scale 0.5 --output new.json --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from benchmarks.synthetic_data import generate
+from models.data_state import MARKET_CUBE_DIR, load_state
+from models.player_ratings import RATINGS_STATE_DIR
+from models.snapshot import SNAPSHOT_DIR, build_snapshot, load_tables
+
+GROUPS = ["startup", "models", "endpoints", "transfer", "games_ratings", "market_trends", "training"]
+# Files derived from the CSVs; removed before the cold startup run
+DERIVED = [SNAPSHOT_DIR, "feature_store", MARKET_CUBE_DIR, RATINGS_STATE_DIR]
+# Regressions are reported when a timing grows by more than this factor
+THRESHOLD = 1.25
+
+
+def timed(fn, repeat=1):
+    """Median seconds of fn() over repeat runs."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return {"seconds": round(float(np.median(seconds)), 4), "runs": repeat}
+
+
+def latencies(call, inputs, reset=None):
+    """p50/p99 of call(input) over inputs; failed responses are counted.
+
+    The first request is timed on its own: it includes lazy loading. reset
+    runs before the timed requests, e.g. to empty a response cache.
+    """
+    start = time.perf_counter()
+    call(inputs[0])
+    first_ms = (time.perf_counter() - start) * 1000
+    if reset:
+        reset()
+    ms, errors = [], 0
+    for value in inputs:
+        start = time.perf_counter()
+        response = call(value)
+        ms.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code >= 400
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "first_ms": round(first_ms, 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(np.mean(ms)), 3),
+    }
+
+
+def prepare(root, scale, seed):
+    """Data under root/data for this scale and seed, plus the layout the backend expects."""
+    data_path = os.path.join(root, "data")
+    meta_file = os.path.join(data_path, "synthetic.json")
+    meta = None
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+    if meta is None or meta["scale"] != scale or meta["seed"] != seed:
+        shutil.rmtree(data_path, ignore_errors=True)
+        print(f"Generating scale {scale} data in {data_path}")
+        generate(data_path, scale, seed)
+        with open(meta_file) as f:
+            meta = json.load(f)
+
+    # The backend reads ../data/ and ../models/saved/ relative to its directory
+    os.makedirs(os.path.join(root, "backend"), exist_ok=True)
+    os.makedirs(os.path.join(root, "models"), exist_ok=True)
+    saved = os.path.join(root, "models", "saved")
+    if not os.path.exists(saved) and os.path.isdir(os.path.join(REPO, "models", "saved")):
+        os.symlink(os.path.join(REPO, "models", "saved"), saved)
+    return data_path + "/", meta["rows"]
+
+
+def bench_startup(data_path, **_):
+    for name in DERIVED:
+        shutil.rmtree(os.path.join(data_path, name), ignore_errors=True)
+    feature_store = os.path.join(data_path, "feature_store/")
+    return {
+        # CSVs only: features, market cube and indexes all built from scratch
+        "cold_csv": timed(lambda: load_state(data_path, feature_store, use_snapshot=False)),
+        "build_snapshot": timed(lambda: build_snapshot(data_path)),
+        # Snapshot and stored features/cube reused, as on a normal restart
+        "warm": timed(lambda: load_state(data_path, feature_store), repeat=3),
+    }
+
+
+def bench_models(**_):
+    # Cold model loading in fresh processes, native artifacts against the pickles
+    import export_models
+    return export_models.bench(os.path.join(REPO, export_models.MODEL_PATH))
+
+
+def bench_endpoints(root, data_path, requests, seed, **_):
+    if not os.path.exists(os.path.join(data_path, RATINGS_STATE_DIR)):
+        import games_ratings
+        with contextlib.redirect_stdout(io.StringIO()):
+            games_ratings.run(data_path, full=True)
+    cwd = os.getcwd()
+    os.chdir(os.path.join(root, "backend"))
+    sys.path.insert(0, os.path.join(REPO, "backend"))
+    try:
+        import app as backend
+        client = backend.app.test_client()
+        state = backend.state
+        rng = np.random.default_rng(seed)
+        player_ids = rng.choice(state.players["player_id"].to_numpy(), requests).tolist()
+        club_ids = state.clubs["club_id"].to_numpy()
+        leagues = state.clubs["domestic_competition_id"].unique().tolist()
+        fixtures = [rng.choice(club_ids, 2, replace=False).tolist() for _ in range(requests)]
+        names = state.players["name"].sample(requests, replace=True, random_state=seed).tolist()
+        queries = [name.split()[-1][:5] for name in names]
+
+        cases = {
+            "GET /search_player": (lambda q: client.get("/search_player", query_string={"q": q}), queries),
+            "GET /autocomplete_player": (lambda q: client.get("/autocomplete_player", query_string={"q": q[:3]}), queries),
+            "POST /predict_performance": (lambda p: client.post("/predict_performance", json={"player_id": p}), player_ids),
+            "POST /predict_transfer": (lambda p: client.post("/predict_transfer", json={"player_id": p}), player_ids),
+            "POST /player_rating": (lambda p: client.post("/player_rating", json={"player_id": p}), player_ids),
+            "POST /similar_players": (lambda p: client.post("/similar_players", json={"player_id": p}), player_ids),
+            "POST /predict_match_result": (
+                lambda f: client.post("/predict_match_result", json={"home_team": f[0], "away_team": f[1]}), fixtures
+            ),
+            "GET /market_trends": (
+                lambda league: client.get("/market_trends", query_string={"league": league}), leagues * 3
+            ),
+            "POST /simulate_season": (
+                lambda league: client.post("/simulate_season", json={"competition_id": league, "n_sims": 200}), leagues
+            ),
+            "POST /predict_transfer_model": (
+                lambda p: client.post("/predict_transfer_model", json={"player_id": p}), player_ids
+            ),
+            "POST /predict_transfer_batch": (
+                lambda ids: client.post("/predict_transfer_batch", json={"player_ids": ids}),
+                [player_ids[i:i + 50] for i in range(0, len(player_ids), 50)]
+            ),
+        }
+        results = {}
+        for name, (call, inputs) in cases.items():
+            # Requests start from an empty response cache, so they are computed
+            backend.response_cache.clear()
+            results[name] = latencies(call, inputs, reset=backend.response_cache.clear)
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def bench_transfer(data_path, requests, seed, **_):
+    from models.market_cube import build_cube
+    from models.row_index import build_indexes
+    from models.transfer_graph import TransferGraph
+    from models.transfer_model import (
+        build_transfer_aggregates, get_club_to_club_patterns, get_market_trends, get_recent_transfer_patterns,
+        predict_transfer, predict_transfer_batch,
+    )
+
+    tables, _, _ = load_tables(data_path)
+    indexes = build_indexes(tables)
+    players, valuations, transfers, clubs = tables["players"], tables["player_valuations"], tables["transfers"], tables["clubs"]
+    cube = build_cube(transfers, clubs)
+    aggregates = build_transfer_aggregates(transfers, players, clubs, cube)
+    player_ids = np.random.default_rng(seed).choice(players["player_id"].to_numpy(), requests).tolist()
+    args = (valuations, transfers, players, clubs, aggregates, indexes)
+
+    single = timed(lambda: [predict_transfer(p, *args) for p in player_ids])
+    graph = aggregates["transfer_graph"]
+    club_ids = players["current_club_id"].dropna().unique().tolist()
+    rows = timed(lambda: [
+        (get_recent_transfer_patterns(transfers, c, indexes), get_club_to_club_patterns(transfers, c, indexes)) for c in club_ids
+    ])
+    graph_rows = timed(lambda: [(graph.destination_shares(c), graph.pair_shares(c)) for c in club_ids])
+    return {
+        "build_cube": timed(lambda: build_cube(transfers, clubs), repeat=3),
+        "market_trends_from_cube": timed(lambda: get_market_trends(transfers, clubs, cube), repeat=3),
+        "build_transfer_aggregates": timed(lambda: build_transfer_aggregates(transfers, players, clubs, cube), repeat=3),
+        "build_transfer_graph": timed(lambda: TransferGraph.build(transfers), repeat=3),
+        "club_patterns_rows_ms": round(rows["seconds"] * 1000 / len(club_ids), 3),
+        "club_patterns_graph_ms": round(graph_rows["seconds"] * 1000 / len(club_ids), 3),
+        "club_reach_2_hops": timed(lambda: graph.reach(club_ids, 2), repeat=3),
+        "predict_transfer_ms": round(single["seconds"] * 1000 / len(player_ids), 3),
+        "predict_transfer_batch": timed(lambda: predict_transfer_batch(player_ids, *args)),
+        "players": len(player_ids),
+    }
+
+
+def bench_games_ratings(data_path, **_):
+    import games_ratings
+
+    for name in [RATINGS_STATE_DIR]:
+        shutil.rmtree(os.path.join(data_path, name), ignore_errors=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            "full_rebuild": timed(lambda: games_ratings.run(data_path, full=True)),
+            # Nothing new since the rebuild: the cost of a no-op incremental run
+            "incremental_noop": timed(lambda: games_ratings.run(data_path), repeat=3),
+        }
+
+
+def bench_market_trends(data_path, **_):
+    import market_trends
+    from models.market_cube import MarketCube
+
+    transfers = pd.read_csv(os.path.join(data_path, "transfers.csv"))
+    clubs = pd.read_csv(os.path.join(data_path, "clubs.csv"))
+    store = MarketCube(os.path.join(data_path, MARKET_CUBE_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            "legacy": timed(lambda: market_trends.market_trends_legacy(transfers, clubs), repeat=3),
+            "cube_build": timed(lambda: market_trends.market_trends(store.build(transfers, clubs)), repeat=3),
+            "cube_stored": timed(lambda: market_trends.market_trends(store.get(transfers, clubs)), repeat=3),
+            "script": timed(lambda: market_trends.run(data_path)),
+        }
+
+
+def bench_training(data_path, **_):
+    from models.feature_store import MonthlyValuations, player_features
+    from models import train_club_prediction_model as club
+    from models import train_transfer_model as transfer
+
+    tables = transfer.load_data(data_path)
+    cutoff = pd.Timestamp(transfer.CUTOFF_DATE)
+    features = player_features(tables, cutoff)
+
+    players, transfers, player_valuations, appearances, clubs, competitions = club.load_data(data_path)
+    club_transfers = club.prepare_transfers(transfers, clubs, competitions)
+    peak_value, total_perf = club.player_stats(player_valuations, appearances)
+    return {
+        "transfer_features": timed(lambda: player_features(tables, cutoff)),
+        "transfer_training_frame": timed(lambda: transfer.training_frame(features, tables["transfers"], cutoff), repeat=3),
+        "club_build_dataset": timed(
+            lambda: club.build_dataset(club_transfers, MonthlyValuations(player_valuations), players, total_perf, peak_value)
+        ),
+    }
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "models": bench_models,
+    "endpoints": bench_endpoints,
+    "transfer": bench_transfer,
+    "games_ratings": bench_games_ratings,
+    "market_trends": bench_market_trends,
+    "training": bench_training,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(root, scale, seed, requests, groups):
+    data_path, rows = prepare(root, scale, seed)
+    results = {}
+    for group in groups:
+        print(f"Running {group}...")
+        results[group] = BENCHMARKS[group](data_path=data_path, root=root, requests=requests, seed=seed)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpus": os.cpu_count(),
+            "scale": scale,
+            "seed": seed,
+            "requests": requests,
+            "rows": rows,
+        },
+        "results": results,
+    }
+
+
+def timings(results, prefix=""):
+    """Flattens results to {"group.name.metric": value} for the timing metrics."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(timings(value, path + "."))
+        elif key == "seconds" or key.endswith("_ms"):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Prints every timing next to the baseline; returns the regressed ones."""
+    if current["meta"]["scale"] != baseline["meta"]["scale"]:
+        print(f"Warning: scale {current['meta']['scale']} vs baseline {baseline['meta']['scale']}")
+    now, before = timings(current["results"]), timings(baseline["results"])
+    regressions = []
+    for name in sorted(now.keys() & before.keys()):
+        ratio = now[name] / before[name] if before[name] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<60} {before[name]:>10.3f} -> {now[name]:>10.3f}  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=os.path.join(REPO, "bench_data"), help="where data and stores are kept between runs")
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown factor reported as a regression")
+    args = parser.parse_args()
+
+    report = run(os.path.abspath(args.root), args.scale, args.seed, args.requests, args.only)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} timings slower than {args.threshold}x the baseline")
+            sys.exit(1)
@@ -0,0 +1,385 @@
+"""Deterministic synthetic data shaped like the Transfermarkt dataset.
+
+Writes every CSV the backend and the scripts read, with the same columns,
+id formats and kinds of missing values. Sizes grow linearly with the scale
+factor (scale 1 is about 0.5M appearances); the same scale and seed always
+produce byte-identical files.
+
+Run from the repository root:
+    python -m benchmarks.synthetic_data bench_data/data --scale 1
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Leagues at scale 1; more scale adds leagues, so every table grows together
+LEAGUES_PER_SCALE = 8
+CLUBS_PER_LEAGUE = 18
+PLAYERS_PER_CLUB = 28
+FIRST_SEASON = 2016
+SEASONS = 8
+# Players per side in a match: 11 starters and 3 substitutes
+LINEUP = 14
+STARTERS = 11
+# Clubs outside the covered leagues appear in transfers but not in clubs.csv
+OUTSIDE_CLUB_START = 100_000
+OUTSIDE_CLUBS_PER_SCALE = 400
+
+KNOWN_LEAGUES = [
+    ("GB1", "England"), ("ES1", "Spain"), ("IT1", "Italy"), ("L1", "Germany"), ("FR1", "France"),
+    ("PO1", "Portugal"), ("NL1", "Netherlands"), ("TR1", "Turkey"), ("BE1", "Belgium"), ("SC1", "Scotland"),
+    ("GR1", "Greece"), ("DK1", "Denmark"), ("RU1", "Russia"), ("UKR1", "Ukraine"),
+]
+POSITIONS = np.array(["Attack", "Midfield", "Defender", "Goalkeeper"], dtype=object)
+POSITION_SHARE = [0.25, 0.35, 0.3, 0.1]
+# Relative chance of scoring per position
+SCORING_WEIGHT = np.array([4.0, 2.0, 0.7, 0.02])
+FIRST_NAMES = ["João", "José", "Lucas", "Pedro", "Andrés", "Luka", "Thomas", "Mohamed", "Kevin", "Søren",
+               "Ángel", "Harry", "Kylian", "Erling", "Marco", "Jan", "Nicolò", "Bukayo", "Rúben", "Çağlar"]
+LAST_NAMES = ["Silva", "Müller", "Rodríguez", "Kane", "Mbappé", "Ødegaard", "Haaland", "Salah", "De Bruyne",
+              "Modrić", "Fernandes", "Díaz", "Kovačić", "Özil", "Smith", "Dias", "Reus", "Saka", "Kimmich", "Pérez"]
+COUNTRIES = ["Brazil", "Spain", "Portugal", "France", "England", "Germany", "Argentina", "Italy", "Netherlands", "Croatia"]
+GOAL_DESCRIPTIONS = np.array([
+    "Right-footed shot, 1. Goal of the Season Assist: Pass", "Left-footed shot, Assist: Cross",
+    "Header, Assist: Corner", "Direct free kick", "Penalty", "Right-footed shot",
+], dtype=object)
+CARD_DESCRIPTIONS = np.array(["1. Yellow card  , Foul", "2. Yellow card  , Dissent", "Red card  , Serious foul play"], dtype=object)
+ASSIST_DESCRIPTIONS = np.array(["Pass", "Cross", "Corner", "Free kick", "Fouled", "Not reported"], dtype=object)
+
+
+def _dates(days, start):
+    return (pd.Timestamp(start) + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+
+
+def _hex_ids(rng, n):
+    high, low = rng.integers(0, 2**63, n), rng.integers(0, 2**63, n)
+    return [f"{a:016x}{b:016x}" for a, b in zip(high.tolist(), low.tolist())]
+
+
+def _season_label(year):
+    return f"{year % 100:02d}/{(year + 1) % 100:02d}"
+
+
+def _league_tables(rng, n_leagues):
+    leagues = KNOWN_LEAGUES + [(f"X{i}", f"Country {i}") for i in range(len(KNOWN_LEAGUES), n_leagues)]
+    leagues = leagues[:n_leagues]
+    competitions = pd.DataFrame({
+        "competition_id": [league for league, _ in leagues],
+        "country_name": [country for _, country in leagues],
+        "name": [f"{country} First Division" for _, country in leagues],
+        "type": "domestic_league",
+    })
+
+    n_clubs = n_leagues * CLUBS_PER_LEAGUE
+    club_ids = np.arange(1, n_clubs + 1) * 7
+    squad_size = rng.integers(22, 36, n_clubs)
+    foreigners = rng.integers(0, 20, n_clubs)
+    clubs = pd.DataFrame({
+        "club_id": club_ids,
+        "name": [f"FC Synthetic {club_id}" for club_id in club_ids],
+        "domestic_competition_id": np.repeat(competitions["competition_id"].to_numpy(), CLUBS_PER_LEAGUE),
+        "total_market_value": np.where(rng.random(n_clubs) < 0.2, np.nan, rng.integers(5, 900, n_clubs) * 1e6),
+        "squad_size": squad_size,
+        "average_age": rng.uniform(22, 29, n_clubs).round(1),
+        "foreigners_number": foreigners,
+        "foreigners_percentage": (100 * foreigners / squad_size).round(1),
+        "national_team_players": rng.integers(0, 12, n_clubs),
+    })
+    return competitions, clubs
+
+
+def _careers(rng, n_players, club_ids, n_outside):
+    """Club of every player in every half season, and the transfers between them."""
+    halves = 2 * SEASONS
+    club = np.empty((n_players, halves), dtype=np.int64)
+    club[:, 0] = rng.choice(club_ids, n_players)
+    for half in range(1, halves):
+        summer = half % 2 == 0
+        moves = rng.random(n_players) < (0.22 if summer else 0.06)
+        destination = np.where(
+            rng.random(n_players) < 0.15,
+            OUTSIDE_CLUB_START + rng.integers(0, n_outside, n_players),
+            rng.choice(club_ids, n_players),
+        )
+        moves &= destination != club[:, half - 1]
+        club[:, half] = np.where(moves, destination, club[:, half - 1])
+
+    # Half h runs July-December of season FIRST_SEASON + h // 2 when even, January-June after it when odd
+    player, half = np.nonzero(club[:, 1:] != club[:, :-1])
+    half = half + 1
+    year = FIRST_SEASON + (half + 1) // 2
+    summer = half % 2 == 0
+    days = np.where(summer, rng.integers(0, 62, len(half)), rng.integers(0, 31, len(half)))
+    start = pd.to_datetime(np.where(summer, year.astype(str) + "-07-01", year.astype(str) + "-01-01"))
+    dates = start + pd.to_timedelta(days, unit="D")
+    return club, pd.DataFrame({
+        "player_index": player,
+        "half": half,
+        "transfer_date": dates,
+        "transfer_season": [_season_label(FIRST_SEASON + h // 2) for h in half.tolist()],
+        "from_club_id": club[player, half - 1],
+        "to_club_id": club[player, half],
+    })
+
+
+def _valuations(rng, players, club):
+    # Half-yearly values following a random walk around a per-player level
+    n_players, halves = club.shape
+    level = rng.normal(14.5, 1.2, n_players)
+    walk = level[:, None] + np.cumsum(rng.normal(0, 0.25, (n_players, halves)), axis=1)
+    values = (np.round(np.exp(walk) / 25_000) * 25_000).clip(25_000)
+    player, half = np.nonzero(rng.random((n_players, halves)) < 0.85)
+    year = FIRST_SEASON + (half + 1) // 2
+    start = pd.to_datetime(np.where(half % 2 == 0, year.astype(str) + "-09-15", year.astype(str) + "-03-15"))
+    dates = start + pd.to_timedelta(rng.integers(0, 20, len(half)), unit="D")
+    return pd.DataFrame({
+        "player_id": players["player_id"].to_numpy()[player],
+        "date": dates.strftime("%Y-%m-%d"),
+        "market_value_in_eur": values[player, half].astype(np.int64),
+        "current_club_id": club[player, half],
+    }), values
+
+
+def _fixtures(rng, clubs):
+    """Double round-robin per league and season, with strength-driven scores."""
+    strength = rng.normal(0, 0.3, len(clubs))
+    frames = []
+    for league, members in clubs.groupby("domestic_competition_id", sort=False).indices.items():
+        home, away = np.nonzero(~np.eye(len(members), dtype=bool))
+        for season in range(FIRST_SEASON, FIRST_SEASON + SEASONS):
+            order = rng.permutation(len(home))
+            days = np.sort(rng.integers(0, 285, len(home)))
+            frames.append(pd.DataFrame({
+                "competition_id": league,
+                "season": season,
+                "date": pd.Timestamp(f"{season}-08-10") + pd.to_timedelta(days, unit="D"),
+                "home_index": members[home[order]],
+                "away_index": members[away[order]],
+            }))
+    games = pd.concat(frames, ignore_index=True).sort_values("date", kind="stable", ignore_index=True)
+    home, away = games["home_index"].to_numpy(), games["away_index"].to_numpy()
+    games["home_club_goals"] = rng.poisson(np.exp(0.3 + strength[home] - strength[away]))
+    games["away_club_goals"] = rng.poisson(np.exp(0.05 + strength[away] - strength[home]))
+    return games
+
+
+def _lineups(rng, games, club_of, club_ids):
+    """(games, 2, LINEUP) player indexes per side, -1 where a squad is short."""
+    dates = games["date"]
+    half = ((dates.dt.year - FIRST_SEASON) * 2 - (dates.dt.month < 7)).to_numpy()
+    half = half.clip(0, club_of.shape[1] - 1)
+    lineups = np.full((len(games), 2, LINEUP), -1, dtype=np.int64)
+    for side, column in enumerate(["home_index", "away_index"]):
+        club = club_ids[games[column].to_numpy()]
+        keys = pd.DataFrame({"club": club, "half": half})
+        for (club_id, h), rows in keys.groupby(["club", "half"], sort=True).indices.items():
+            squad = np.flatnonzero(club_of[:, h] == club_id)
+            if len(squad) == 0:
+                continue
+            picked = rng.random((len(rows), len(squad))).argsort(axis=1)[:, :LINEUP]
+            lineups[rows, side, :picked.shape[1]] = squad[picked]
+    return lineups
+
+
+def _pick(rng, candidates, weights):
+    # One weighted pick per row of candidates (Gumbel-max); -1 candidates never win
+    with np.errstate(divide="ignore"):
+        scores = np.log(np.where(candidates >= 0, weights, 0)) + rng.gumbel(size=candidates.shape)
+    return candidates[np.arange(len(candidates)), scores.argmax(axis=1)]
+
+
+def _events(rng, games, lineups, position_index):
+    """Goals, assists, cards, substitutions and shootouts of every game."""
+    frames = []
+    sides = [("home_club_goals", 0), ("away_club_goals", 1)]
+
+    def add(game_rows, side, event_type, player, minute, description):
+        frames.append(pd.DataFrame({
+            "game_row": game_rows, "side": side, "type": event_type,
+            "player_index": player, "minute": minute, "description": description,
+        }))
+
+    for column, side in sides:
+        goal_rows = np.repeat(np.arange(len(games)), games[column].to_numpy())
+        candidates = lineups[goal_rows, side]
+        weights = SCORING_WEIGHT[position_index[candidates.clip(0)]]
+        scorer = _pick(rng, candidates, weights)
+        minute = rng.integers(1, 91, len(goal_rows))
+        add(goal_rows, side, "Goals", scorer, minute, rng.choice(GOAL_DESCRIPTIONS, len(goal_rows)))
+
+        assisted = rng.random(len(goal_rows)) < 0.7
+        assist_weights = np.where(candidates == scorer[:, None], 0, 1.0)
+        assistant = _pick(rng, candidates[assisted], assist_weights[assisted])
+        add(goal_rows[assisted], side, "Assist", assistant, minute[assisted],
+            rng.choice(ASSIST_DESCRIPTIONS, assisted.sum()))
+
+        n_cards = rng.poisson(1.9, len(games))
+        card_rows = np.repeat(np.arange(len(games)), n_cards)
+        booked = _pick(rng, lineups[card_rows, side], np.ones((len(card_rows), LINEUP)))
+        add(card_rows, side, "Cards", booked, rng.integers(1, 96, len(card_rows)),
+            rng.choice(CARD_DESCRIPTIONS, len(card_rows), p=[0.8, 0.15, 0.05]))
+
+        subs = lineups[:, side, STARTERS:]
+        sub_rows, sub_slot = np.nonzero(subs >= 0)
+        add(sub_rows, side, "Substitutions", subs[sub_rows, sub_slot], rng.integers(15, 90, len(sub_rows)),
+            np.where(rng.random(len(sub_rows)) < 0.5, "Tactical", "Injury"))
+
+    # A few games go to penalties
+    shootout_rows = np.flatnonzero((games["home_club_goals"] == games["away_club_goals"]).to_numpy()
+                                   & (rng.random(len(games)) < 0.05))
+    for side in (0, 1):
+        takers = _pick(rng, lineups[shootout_rows, side], np.ones((len(shootout_rows), LINEUP)))
+        add(shootout_rows, side, "Shootout", takers, 120, "Penalty")
+
+    events = pd.concat(frames, ignore_index=True)
+    events = events[events["player_index"] >= 0]
+    return events.sort_values(["game_row", "minute", "side"], kind="stable", ignore_index=True)
+
+
+def generate(out, scale=1.0, seed=0):
+    """Writes the synthetic CSVs to out and returns the row count of each."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out, exist_ok=True)
+    n_leagues = max(1, round(LEAGUES_PER_SCALE * scale))
+    competitions, clubs = _league_tables(rng, n_leagues)
+    club_ids = clubs["club_id"].to_numpy()
+    n_outside = max(1, round(OUTSIDE_CLUBS_PER_SCALE * scale))
+
+    # Players and their careers
+    n_players = len(clubs) * PLAYERS_PER_CLUB
+    player_ids = np.arange(n_players) * 3 + 10
+    club_of, moves = _careers(rng, n_players, club_ids, n_outside)
+    position_index = rng.choice(len(POSITIONS), n_players, p=POSITION_SHARE)
+    names = [
+        f"{first} {last}" if i % 5 else f"{first} {last} {i}"
+        for i, (first, last) in enumerate(zip(rng.choice(FIRST_NAMES, n_players), rng.choice(LAST_NAMES, n_players)))
+    ]
+    club_names = dict(zip(club_ids.tolist(), clubs["name"]))
+    club_leagues = dict(zip(club_ids.tolist(), clubs["domestic_competition_id"]))
+    current = club_of[:, -1]
+    retired = rng.random(n_players) < 0.02
+    players = pd.DataFrame({
+        "player_id": player_ids,
+        "name": names,
+        "current_club_id": current,
+        "current_club_name": [None if gone else club_names.get(c, f"Club {c}") for c, gone in zip(current.tolist(), retired)],
+        "current_club_domestic_competition_id": [club_leagues.get(c) for c in current.tolist()],
+        "country_of_citizenship": np.where(rng.random(n_players) < 0.03, None, rng.choice(COUNTRIES, n_players)),
+        "date_of_birth": _dates(rng.integers(0, 9000, n_players), "1980-01-01"),
+        "position": POSITIONS[position_index],
+        "foot": np.where(rng.random(n_players) < 0.05, None, rng.choice(["right", "left", "both"], n_players, p=[0.7, 0.25, 0.05])),
+        "height_in_cm": np.where(rng.random(n_players) < 0.05, np.nan, rng.normal(182, 7, n_players).round()),
+        "contract_expiration_date": np.where(
+            rng.random(n_players) < 0.1, None, _dates(rng.integers(0, 1800, n_players), f"{FIRST_SEASON + SEASONS}-06-30")
+        ),
+    })
+    valuations, values = _valuations(rng, players, club_of)
+    players["market_value_in_eur"] = np.where(retired, np.nan, values[:, -1])
+
+    # Transfers: fee missing, free or around the market value
+    half = moves["half"].to_numpy()
+    player = moves["player_index"].to_numpy()
+    value = values[player, half]
+    fee_kind = rng.random(len(moves))
+    fee = np.where(fee_kind < 0.3, np.nan, np.where(fee_kind < 0.5, 0, np.round(value * rng.uniform(0.5, 1.8, len(moves)) / 50_000) * 50_000))
+    to_club = moves["to_club_id"].to_numpy().astype(float)
+    to_club[rng.random(len(moves)) < 0.01] = np.nan
+    transfers = pd.DataFrame({
+        "player_id": player_ids[player],
+        "transfer_date": moves["transfer_date"].dt.strftime("%Y-%m-%d"),
+        "transfer_season": moves["transfer_season"],
+        "from_club_id": moves["from_club_id"],
+        "to_club_id": to_club,
+        "from_club_name": [club_names.get(c, f"Club {c}") for c in moves["from_club_id"].tolist()],
+        "to_club_name": [club_names.get(int(c), f"Club {int(c)}") if c == c else "Retired" for c in to_club.tolist()],
+        "transfer_fee": fee,
+        "market_value_in_eur": value,
+    }).sort_values("transfer_date", kind="stable", ignore_index=True)
+
+    # Games and their per-club rows
+    fixtures = _fixtures(rng, clubs)
+    game_ids = np.arange(len(fixtures)) * 11 + 2_000_000
+    home_club = club_ids[fixtures["home_index"].to_numpy()]
+    away_club = club_ids[fixtures["away_index"].to_numpy()]
+    games = pd.DataFrame({
+        "game_id": game_ids,
+        "competition_id": fixtures["competition_id"],
+        "season": fixtures["season"],
+        "round": "Matchday",
+        "date": fixtures["date"].dt.strftime("%Y-%m-%d"),
+        "home_club_id": home_club,
+        "away_club_id": away_club,
+        "home_club_goals": fixtures["home_club_goals"],
+        "away_club_goals": fixtures["away_club_goals"],
+    })
+    club_games = pd.concat([
+        pd.DataFrame({"game_id": game_ids, "club_id": home_club, "own_goals": games["home_club_goals"],
+                      "opponent_id": away_club, "opponent_goals": games["away_club_goals"], "hosting": "Home"}),
+        pd.DataFrame({"game_id": game_ids, "club_id": away_club, "own_goals": games["away_club_goals"],
+                      "opponent_id": home_club, "opponent_goals": games["home_club_goals"], "hosting": "Away"}),
+    ]).sort_values(["game_id", "hosting"], ascending=[True, False], kind="stable", ignore_index=True)
+
+    # Appearances and events come from the same lineups, so their totals agree
+    lineups = _lineups(rng, fixtures, club_of, club_ids)
+    events = _events(rng, fixtures, lineups, position_index)
+    event_game = events["game_row"].to_numpy()
+    event_player = events["player_index"].to_numpy()
+    event_club = np.where(events["side"].to_numpy() == 0, home_club[event_game], away_club[event_game])
+    game_events = pd.DataFrame({
+        "game_event_id": _hex_ids(rng, len(events)),
+        "date": games["date"].to_numpy()[event_game],
+        "game_id": game_ids[event_game],
+        "minute": events["minute"],
+        "type": events["type"],
+        "club_id": event_club,
+        "player_id": player_ids[event_player],
+        "description": np.where(rng.random(len(events)) < 0.05, None, events["description"].to_numpy(dtype=object)),
+    })
+
+    game_row, side, slot = np.nonzero(lineups >= 0)
+    player = lineups[game_row, side, slot]
+    key = pd.MultiIndex.from_arrays([game_row, player])
+    counts = events.groupby(["game_row", "player_index", "type"]).size().unstack(fill_value=0)
+    counts = counts.reindex(key, fill_value=0)
+    yellow = events[(events["type"] == "Cards") & events["description"].str.contains("Yellow")]
+    red = events[(events["type"] == "Cards") & events["description"].str.contains("Red")]
+    sub_minutes = rng.integers(15, 90, len(slot))
+    appearances = pd.DataFrame({
+        "appearance_id": [f"{g}_{p}" for g, p in zip(game_ids[game_row].tolist(), player_ids[player].tolist())],
+        "game_id": game_ids[game_row],
+        "player_id": player_ids[player],
+        "player_club_id": np.where(side == 0, home_club[game_row], away_club[game_row]),
+        "date": games["date"].to_numpy()[game_row],
+        "competition_id": games["competition_id"].to_numpy()[game_row],
+        "yellow_cards": yellow.groupby(["game_row", "player_index"]).size().reindex(key, fill_value=0).to_numpy(),
+        "red_cards": red.groupby(["game_row", "player_index"]).size().reindex(key, fill_value=0).to_numpy(),
+        "goals": counts.get("Goals", pd.Series(0, index=key)).to_numpy(),
+        "assists": counts.get("Assist", pd.Series(0, index=key)).to_numpy(),
+        "minutes_played": np.where(slot < STARTERS, np.where(slot >= STARTERS - 3, sub_minutes, 90), 90 - sub_minutes),
+    })
+
+    tables = {
+        "competitions": competitions, "clubs": clubs, "players": players, "player_valuations": valuations,
+        "transfers": transfers, "games": games, "club_games": club_games, "appearances": appearances,
+        "game_events": game_events,
+    }
+    for name, df in tables.items():
+        df.to_csv(os.path.join(out, name + ".csv"), index=False)
+    rows = {name: len(df) for name, df in tables.items()}
+    with open(os.path.join(out, "synthetic.json"), "w") as f:
+        json.dump({"scale": scale, "seed": seed, "rows": rows}, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", help="directory the CSVs are written to")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, count in generate(args.out, args.scale, args.seed).items():
+        print(f"  {name:<18} {count:>10} rows")
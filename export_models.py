@@ -0,0 +1,107 @@
+# Exports the served models from their pickles to the native artifact format
+# of models/artifacts.py, checks the two give the same predictions and
+# compares how long each takes to load in a fresh process
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# Allow `models.*` imports when run as a script
+REPO = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(REPO)
+
+from models.artifacts import export_model, native_path
+from models.model_registry import MODEL_SPECS, ModelRegistry, model_inputs
+
+DATA_PATH = "data/"
+MODEL_PATH = "models/saved/"
+# Fresh processes timed per format
+BENCH_RUNS = 5
+
+# Run in a fresh process: seconds to import the registry and to load every model
+_LOAD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from models.model_registry import ModelRegistry
+imported = time.perf_counter()
+registry = ModelRegistry({model_path!r}, native={native!r})
+for name in registry.specs:
+    registry.get(name)
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "load": done - imported, "formats": registry.formats}}))
+"""
+
+
+def export(model_path, specs=MODEL_SPECS):
+    """Native artifacts of every served model, written from its pickles."""
+    registry = ModelRegistry(model_path, specs, native=False)
+    for name in specs:
+        manifest = export_model(name, registry.get(name), model_path)
+        size = sum(file["bytes"] for file in manifest["files"].values())
+        print(f"{name}: {len(manifest['files'])} files, {size / 1024:.0f} KiB in {native_path(model_path, name)}")
+
+
+def verify(model_path, features, specs=MODEL_SPECS):
+    """Compares predict_proba of the native and pickled models on every row of features."""
+    native = ModelRegistry(model_path, specs, native=True)
+    pickled = ModelRegistry(model_path, specs, native=False)
+    player_ids = features.index.tolist()
+    identical = True
+    for name in specs:
+        outputs = []
+        for registry in (native, pickled):
+            artifacts = registry.get(name)
+            X = artifacts["preprocessor"].transform(model_inputs(features, player_ids, artifacts["features"]))
+            outputs.append(artifacts["model"].predict_proba(X))
+        same = np.array_equal(outputs[0], outputs[1], equal_nan=True)
+        identical &= same
+        difference = np.nanmax(np.abs(outputs[0] - outputs[1])) if len(player_ids) else 0.0
+        print(f"{name} ({native.formats[name]} vs {pickled.formats[name]}): "
+              f"{'identical' if same else f'max difference {difference:.3g}'} on {len(player_ids)} players")
+    return identical
+
+
+def bench(model_path, runs=BENCH_RUNS):
+    """Median seconds to import and to load all models in a fresh process, per format."""
+    results = {}
+    for native in (False, True):
+        samples = []
+        for _ in range(runs):
+            script = _LOAD_SCRIPT.format(repo=REPO, model_path=os.path.abspath(model_path), native=native)
+            output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        results["native" if native else "joblib"] = {
+            "import_seconds": round(float(np.median([s["import"] for s in samples])), 4),
+            "load_seconds": round(float(np.median([s["load"] for s in samples])), 4),
+            "runs": runs,
+            "formats": samples[0]["formats"],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the served models to native artifacts")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--skip-export", action="store_true", help="keep the existing export")
+    parser.add_argument("--verify", action="store_true", help="compare predictions with the pickles on every player of --data-path")
+    parser.add_argument("--bench", type=int, nargs="?", const=BENCH_RUNS, metavar="RUNS",
+                        help="time loading in fresh processes, native against joblib")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.model_path)
+    ok = True
+    if args.verify:
+        from models.data_state import load_state
+        state, _ = load_state(args.data_path, os.path.join(args.data_path, "feature_store/"))
+        ok = verify(args.model_path, state.player_features)
+    if args.bench:
+        for fmt, result in bench(args.model_path, args.bench).items():
+            print(f"{fmt}: import {result['import_seconds'] * 1000:.0f}ms, "
+                  f"load {result['load_seconds'] * 1000:.1f}ms (median of {result['runs']} processes)")
+    raise SystemExit(0 if ok else 1)
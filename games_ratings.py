@@ -1,59 +1,358 @@
-# Reload event and player data
+# Player ratings from game events: every event is scored by the rules below
+# and a player's rating is the rolling mean of their last event scores
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
 import pandas as pd
 
-players_df = pd.read_csv("data/players.csv")
-game_events_df = pd.read_csv("data/game_events.csv")
+# Allow `models.*` imports when run as a script
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.player_ratings import RatingState
+
+DATA_PATH = "data/"
+OUTPUT_FILE = "games_ratings.csv"
+# Ratings of the events rated by the last incremental run
+DELTA_FILE = "games_ratings_delta.csv"
+# Incremental runs between full rebuilds that check them
+FULL_EVERY = 7
+RATING_WINDOW = 10
+CHUNK_SIZE = 500_000
+EVENT_COLUMNS = ["game_event_id", "date", "type", "minute", "player_id", "description"]
+
+# Scoring rules: an event scores the sum of the points of every rule it
+# matches. None matches anything, keywords are case-sensitive substrings
+# of the description and max_minute is the latest minute that still counts.
+SCORING_RULES = [
+    # type, position, keyword, max_minute, points
+    ("Cards", None, "Yellow", None, -1.5),
+    ("Cards", None, "Red", None, -4.0),
+    # Goals: different by position
+    ("Goals", "Attack", None, None, 10.0),
+    ("Goals", "Midfield", None, None, 8.0),
+    ("Goals", "Defender", None, None, 6.0),
+    ("Goals", "Goalkeeper", None, None, 15.0),
+    ("Assist", None, None, None, 7.0),
+    # Shootouts (penalties) - bonus for scoring or saving
+    ("Shootout", "Attack", None, None, 5.0),
+    ("Shootout", "Goalkeeper", None, None, 7.0),
+    # Substitutions at the beginning of the game
+    ("Substitutions", None, None, 20, -2.0),
+    # Detailed descriptions
+    (None, None, "Pass", None, 1.0),
+    (None, None, "Cross", None, 1.5),
+    (None, None, "Header", None, 2.0),
+    (None, None, "Corner", None, 1.0),
+    (None, None, "Free kick", None, 1.5),
+    (None, None, "Fouled", None, 1.0),
+]
+
+
+class RuleSet:
+    """SCORING_RULES compiled for vectorized scoring.
+
+    Events are reduced to (type, position, description, minute bucket)
+    keys; the points of each distinct key are worked out once, with a
+    single regex pass over the description for all keywords, and cached
+    across chunks.
+    """
+
+    def __init__(self, rules=SCORING_RULES):
+        self.rules = rules
+        keywords = sorted({rule[2] for rule in rules if rule[2]})
+        # Lookahead so overlapping keywords are all found
+        self.keyword_pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+        self.minute_limits = np.array(sorted({rule[3] for rule in rules if rule[3] is not None}), dtype=float)
+        self.points = {}
+
+    def _key_points(self, event_type, position, description, bucket):
+        found = set(self.keyword_pattern.findall(description))
+        total = 0.0
+        for rule_type, rule_position, keyword, max_minute, points in self.rules:
+            if rule_type is not None and rule_type != event_type:
+                continue
+            if rule_position is not None and rule_position != position:
+                continue
+            if keyword is not None and keyword not in found:
+                continue
+            if max_minute is not None and bucket > np.searchsorted(self.minute_limits, max_minute):
+                continue
+            total += points
+        return total
+
+    def score(self, event_type, position, description, minute):
+        """Score of each event, from equally long arrays of its fields."""
+        # Bucket b means the minute is within every limit from the b-th on; NaN falls past all of them
+        buckets = np.searchsorted(self.minute_limits, minute.astype(float), side="left")
+        # One integer code per (type, position, description, bucket) combination
+        fields = [pd.factorize(values) for values in (event_type, position, description, buckets)]
+        combined = np.zeros(len(buckets), dtype=np.int64)
+        for codes, uniques in fields:
+            combined = combined * len(uniques) + codes
+        codes, combinations = pd.factorize(combined)
+
+        points = np.empty(len(combinations))
+        for i, code in enumerate(combinations):
+            key = []
+            for _, uniques in reversed(fields):
+                code, field = divmod(code, len(uniques))
+                key.append(uniques[field])
+            key = tuple(reversed(key))
+            if key not in self.points:
+                self.points[key] = self._key_points(*key)
+            points[i] = self.points[key]
+        return points[codes]
+
+
+def read_positions(data_path):
+    return pd.read_csv(os.path.join(data_path, "players.csv"), usecols=["player_id", "position"])
+
+
+def score_events(events, positions, rules):
+    """game_event_id, player_id, date and score of each event of one chunk."""
+    events = events.merge(positions, on="player_id", how="left")
+    score = rules.score(
+        events["type"].fillna("").to_numpy(dtype=object),
+        events["position"].fillna("Unknown").to_numpy(dtype=object),
+        events["description"].fillna("").to_numpy(dtype=object),
+        events["minute"].to_numpy(),
+    )
+    return pd.DataFrame({
+        "game_event_id": events["game_event_id"].to_numpy(),
+        "player_id": events["player_id"].to_numpy(),
+        "date": pd.to_datetime(events["date"], errors="coerce").to_numpy(),
+        "score": score,
+    })
+
+
+def read_scored_events(data_path, chunk_size=CHUNK_SIZE, rules=None):
+    # game_events.csv is streamed; only id, player, date and score are kept per event
+    rules = rules or RuleSet()
+    positions = read_positions(data_path)
+    chunks = pd.read_csv(os.path.join(data_path, "game_events.csv"), usecols=EVENT_COLUMNS, chunksize=chunk_size)
+    return pd.concat([score_events(chunk, positions, rules) for chunk in chunks], ignore_index=True)
+
+
+def rate_events(events, window=RATING_WINDOW):
+    """Events sorted by (player, date) with the rolling mean score per player."""
+    events = events.sort_values(["player_id", "date"])
+    rolling = events.groupby("player_id")["score"].rolling(window, min_periods=1).mean()
+    events["rolling_rating"] = rolling.droplevel(0)
+    return events
+
+
+def output_ratings(rated):
+    latest_ratings = rated.dropna(subset=["rolling_rating"])[["player_id", "date", "rolling_rating"]]
+    latest_ratings["rolling_rating"] = latest_ratings["rolling_rating"].clip(3, 10)
+    return latest_ratings
+
+
+def rolling_ratings(events, window=RATING_WINDOW):
+    return output_ratings(rate_events(events, window))
+
+
+def build_ratings(data_path, chunk_size=CHUNK_SIZE):
+    return rolling_ratings(read_scored_events(data_path, chunk_size))
+
+
+def _state_rows(rated, window):
+    # Rows of rated events (sorted by player and date) that the next run needs
+    rated = rated.dropna(subset=["player_id"]).astype({"player_id": "int64"})
+    undated = rated["date"].isna()
+    recent = rated[~undated].groupby("player_id").tail(window).index
+    windows = rated[rated.index.isin(recent) | undated][["player_id", "game_event_id", "date", "score"]]
+    latest = output_ratings(rated.groupby("player_id").tail(1))
+    return windows, latest
+
+
+def _high_water_mark(events, hwm_date=pd.NaT, hwm_ids=()):
+    dates = events["date"].dropna()
+    if dates.empty:
+        return hwm_date, set(hwm_ids)
+    latest = dates.max()
+    if pd.notna(hwm_date) and latest < hwm_date:
+        return hwm_date, set(hwm_ids)
+    ids = set(events.loc[events["date"] == latest, "game_event_id"])
+    if pd.notna(hwm_date) and latest == hwm_date:
+        ids |= set(hwm_ids)
+    return latest, ids
+
+
+def full_rebuild(data_path, chunk_size=CHUNK_SIZE, window=RATING_WINDOW):
+    """Rates every event; returns (output ratings, state for incremental runs)."""
+    events = read_scored_events(data_path, chunk_size)
+    hwm_date, hwm_ids = _high_water_mark(events)
+    nat_ids = set(events.loc[events["date"].isna(), "game_event_id"])
+    rated = rate_events(events, window)
+    windows, latest = _state_rows(rated, window)
+    state = RatingState(windows, latest, hwm_date, hwm_ids, nat_ids, {"events": len(events), "incremental_runs": 0})
+    return output_ratings(rated), state
+
+
+def read_new_events(data_path, state, chunk_size=CHUNK_SIZE, rules=None):
+    """Scored events that are past the high-water mark of state."""
+    rules = rules or RuleSet()
+    positions = read_positions(data_path)
+    chunks = pd.read_csv(os.path.join(data_path, "game_events.csv"), usecols=EVENT_COLUMNS, chunksize=chunk_size)
+    new = []
+    for chunk in chunks:
+        dates = pd.to_datetime(chunk["date"], errors="coerce")
+        ids = chunk["game_event_id"]
+        if pd.isna(state.hwm_date):
+            is_new = dates.notna()
+        else:
+            is_new = (dates > state.hwm_date) | ((dates == state.hwm_date) & ~ids.isin(state.hwm_ids))
+        is_new |= dates.isna() & ~ids.isin(state.nat_ids)
+        if is_new.any():
+            new.append(score_events(chunk[is_new], positions, rules))
+    if not new:
+        return score_events(pd.DataFrame(columns=EVENT_COLUMNS), positions, rules)
+    return pd.concat(new, ignore_index=True)
+
+
+def incremental_update(state, new_events, window=RATING_WINDOW):
+    """Rates new events on top of state; returns (emitted ratings, new state).
+
+    Only the players with new events are re-rated, from their stored
+    window. Emitted ratings cover the new events plus those of the
+    player's undated events, which sort last and so change as well.
+    """
+    if new_events.empty:
+        return output_ratings(new_events.assign(rolling_rating=np.nan)), RatingState(
+            state.windows, state.latest, state.hwm_date, state.hwm_ids, state.nat_ids,
+            {**state.meta, "incremental_runs": state.meta.get("incremental_runs", 0) + 1},
+        )
+    affected = new_events["player_id"].dropna().unique()
+    stored = state.windows["player_id"].isin(affected)
+    # Stored rows first: the stable sort keeps them ahead of new events on the same date
+    events = pd.concat([state.windows[stored].assign(new=False), new_events.assign(new=True)], ignore_index=True)
+    rated = rate_events(events, window)
+    windows, latest = _state_rows(rated, window)
+
+    emitted = output_ratings(rated[rated["new"] | rated["date"].isna()])
+    hwm_date, hwm_ids = _high_water_mark(new_events, state.hwm_date, state.hwm_ids)
+    nat_ids = state.nat_ids | set(new_events.loc[new_events["date"].isna(), "game_event_id"])
+    new_state = RatingState(
+        pd.concat([state.windows[~stored], windows]).sort_values("player_id", kind="stable"),
+        pd.concat([state.latest[~state.latest["player_id"].isin(affected)], latest]).sort_values("player_id"),
+        hwm_date, hwm_ids, nat_ids,
+        {**state.meta, "events": state.meta.get("events", 0) + len(new_events),
+         "incremental_runs": state.meta.get("incremental_runs", 0) + 1},
+    )
+    return emitted, new_state
+
+
+def compare_states(incremental, full):
+    """Players whose stored window or latest rating differs between two states."""
+    def by_player(df):
+        return {player_id: rows.drop(columns="player_id").to_numpy().tolist()
+                for player_id, rows in df.groupby("player_id")}
+
+    windows = [by_player(state.windows[["player_id", "date", "score"]]) for state in (incremental, full)]
+    latest = [by_player(state.latest) for state in (incremental, full)]
+    return sorted(
+        player_id for player_id in set(windows[0]) | set(windows[1])
+        if windows[0].get(player_id) != windows[1].get(player_id) or latest[0].get(player_id) != latest[1].get(player_id)
+    )
+
+
+def build_ratings_legacy(players_df, game_events_df):
+    # Original implementation, kept to verify build_ratings against
+    game_events_df = game_events_df.merge(players_df[["player_id", "position"]], on="player_id", how="left")
+    game_events_df["position"] = game_events_df["position"].fillna("Unknown")
+    game_events_df["score"] = 0.0
+
+    game_events_df.loc[game_events_df["type"] == "Cards", "score"] -= game_events_df["description"].str.contains("Yellow", na=False).astype(float) * 1.5
+    game_events_df.loc[game_events_df["type"] == "Cards", "score"] -= game_events_df["description"].str.contains("Red", na=False).astype(float) * 4
+
+    forwards = game_events_df["position"] == "Attack"
+    midfielders = game_events_df["position"] == "Midfield"
+    defenders = game_events_df["position"] == "Defender"
+    goalkeepers = game_events_df["position"] == "Goalkeeper"
+
+    game_events_df.loc[forwards & (game_events_df["type"] == "Goals"), "score"] += 10
+    game_events_df.loc[midfielders & (game_events_df["type"] == "Goals"), "score"] += 8
+    game_events_df.loc[defenders & (game_events_df["type"] == "Goals"), "score"] += 6
+    game_events_df.loc[goalkeepers & (game_events_df["type"] == "Goals"), "score"] += 15
+    game_events_df.loc[game_events_df["type"] == "Assist", "score"] += 7
+    game_events_df.loc[(game_events_df["type"] == "Shootout") & (forwards), "score"] += 5
+    game_events_df.loc[(game_events_df["type"] == "Shootout") & (goalkeepers), "score"] += 7
+    game_events_df.loc[(game_events_df["type"] == "Substitutions") & (game_events_df["minute"] <= 20), "score"] -= 2
+
+    game_events_df["description"] = game_events_df["description"].fillna("")
+    game_events_df.loc[game_events_df["description"].str.contains("Pass", na=False), "score"] += 1
+    game_events_df.loc[game_events_df["description"].str.contains("Cross", na=False), "score"] += 1.5
+    game_events_df.loc[game_events_df["description"].str.contains("Header", na=False), "score"] += 2
+    game_events_df.loc[game_events_df["description"].str.contains("Corner", na=False), "score"] += 1
+    game_events_df.loc[game_events_df["description"].str.contains("Free kick", na=False), "score"] += 1.5
+    game_events_df.loc[game_events_df["description"].str.contains("Fouled", na=False), "score"] += 1
 
-# Join position column
-game_events_df = game_events_df.merge(players_df[["player_id", "position"]], on="player_id", how="left")
-game_events_df["position"] = game_events_df["position"].fillna("Unknown")
+    game_events_df["date"] = pd.to_datetime(game_events_df["date"], errors="coerce")
+    game_events_df = game_events_df.sort_values(["player_id", "date"])
+    game_events_df["rolling_rating"] = game_events_df.groupby("player_id")["score"].transform(lambda x: x.rolling(10, min_periods=1).mean())
 
-# Initialize score column with float
-game_events_df["score"] = 0.0
+    latest_ratings = game_events_df.dropna(subset=["rolling_rating"])[["player_id", "date", "rolling_rating"]]
+    latest_ratings["rolling_rating"] = latest_ratings["rolling_rating"].clip(3, 10)
+    return latest_ratings
 
-# Mark cards
-game_events_df.loc[game_events_df["type"] == "Cards", "score"] -= game_events_df["description"].str.contains("Yellow", na=False).astype(float) * 1.5
-game_events_df.loc[game_events_df["type"] == "Cards", "score"] -= game_events_df["description"].str.contains("Red", na=False).astype(float) * 4
 
-# Goals: different by position
-forwards = game_events_df["position"] == "Attack"
-midfielders = game_events_df["position"] == "Midfield"
-defenders = game_events_df["position"] == "Defender"
-goalkeepers = game_events_df["position"] == "Goalkeeper"
+def verify(data_path, chunk_size):
+    start = time.perf_counter()
+    legacy = build_ratings_legacy(
+        pd.read_csv(os.path.join(data_path, "players.csv")), pd.read_csv(os.path.join(data_path, "game_events.csv"))
+    )
+    legacy_seconds = time.perf_counter() - start
 
-game_events_df.loc[forwards & (game_events_df["type"] == "Goals"), "score"] += 10
-game_events_df.loc[midfielders & (game_events_df["type"] == "Goals"), "score"] += 8
-game_events_df.loc[defenders & (game_events_df["type"] == "Goals"), "score"] += 6
-game_events_df.loc[goalkeepers & (game_events_df["type"] == "Goals"), "score"] += 15
+    start = time.perf_counter()
+    ratings = build_ratings(data_path, chunk_size)
+    seconds = time.perf_counter() - start
 
-# Assists
-game_events_df.loc[game_events_df["type"] == "Assist", "score"] += 7
+    same = legacy.to_csv(index=False) == ratings.to_csv(index=False)
+    print(f"{'Identical' if same else 'DIFFERENT'} output on {len(legacy)} rows: "
+          f"legacy {legacy_seconds:.2f}s, chunked {seconds:.2f}s ({legacy_seconds / seconds:.1f}x)")
+    return same
 
-# Shootouts (penalties) - bonus for scoring or saving
-game_events_df.loc[(game_events_df["type"] == "Shootout") & (forwards), "score"] += 5
-game_events_df.loc[(game_events_df["type"] == "Shootout") & (goalkeepers), "score"] += 7
 
-# Substitutions at the beginning of the game (minute <= 20)
-game_events_df.loc[(game_events_df["type"] == "Substitutions") & (game_events_df["minute"] <= 20), "score"] -= 2
+def run(data_path, chunk_size=CHUNK_SIZE, full=False, full_every=FULL_EVERY):
+    state = None if full else RatingState.load(data_path)
+    if state is not None and state.meta.get("incremental_runs", 0) < full_every:
+        start = time.perf_counter()
+        new_events = read_new_events(data_path, state, chunk_size)
+        emitted, state = incremental_update(state, new_events)
+        emitted.to_csv(os.path.join(data_path, DELTA_FILE), index=False)
+        state.save(data_path)
+        print(f"Rated {len(new_events)} new events, {len(emitted)} ratings emitted "
+              f"in {time.perf_counter() - start:.2f}s")
+        return
 
-# Detailed descriptions
-game_events_df["description"] = game_events_df["description"].fillna("")
+    start = time.perf_counter()
+    ratings, full_state = full_rebuild(data_path, chunk_size)
+    ratings.to_csv(os.path.join(data_path, OUTPUT_FILE), index=False)
+    print(f"Full rebuild: rated {full_state.meta['events']} events in {time.perf_counter() - start:.2f}s")
+    if state is not None:
+        # Periodic check that the incremental runs kept up with the history
+        mismatched = compare_states(incremental_update(state, read_new_events(data_path, state, chunk_size))[1], full_state)
+        if mismatched:
+            print(f"Incremental state differed for {len(mismatched)} players (e.g. {mismatched[:5]}); replaced")
+        else:
+            print("Incremental state matched the full rebuild")
+    full_state.save(data_path)
 
-game_events_df.loc[game_events_df["description"].str.contains("Pass", na=False), "score"] += 1
-game_events_df.loc[game_events_df["description"].str.contains("Cross", na=False), "score"] += 1.5
-game_events_df.loc[game_events_df["description"].str.contains("Header", na=False), "score"] += 2
-game_events_df.loc[game_events_df["description"].str.contains("Corner", na=False), "score"] += 1
-game_events_df.loc[game_events_df["description"].str.contains("Free kick", na=False), "score"] += 1.5
-game_events_df.loc[game_events_df["description"].str.contains("Fouled", na=False), "score"] += 1
 
-# Calculate rolling average per player
-game_events_df["date"] = pd.to_datetime(game_events_df["date"], errors="coerce")
-game_events_df = game_events_df.sort_values(["player_id", "date"])
-game_events_df["rolling_rating"] = game_events_df.groupby("player_id")["score"].transform(lambda x: x.rolling(10, min_periods=1).mean())
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate players from game events")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="game_events.csv rows read at a time")
+    parser.add_argument("--full", action="store_true", help="rate the whole history even when a state exists")
+    parser.add_argument("--full-every", type=int, default=FULL_EVERY, help="incremental runs between checking full rebuilds")
+    parser.add_argument("--verify", action="store_true", help="compare with the original implementation and exit")
+    args = parser.parse_args()
 
-# Select the latest known rating per player
-latest_ratings = game_events_df.dropna(subset=["rolling_rating"])[["player_id", "date", "rolling_rating"]]
-latest_ratings["rolling_rating"] = latest_ratings["rolling_rating"].clip(3, 10)
+    if args.verify:
+        raise SystemExit(0 if verify(args.data_path, args.chunk_size) else 1)
 
-# Export CSV
-latest_ratings.to_csv("data/games_ratings.csv", index=False)
+    run(args.data_path, args.chunk_size, args.full, args.full_every)
@@ -1,48 +1,93 @@
+# League market indicators: money spent and received per league, scored 0-10
+import argparse
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 
-# Load datasets
-transfers = pd.read_csv("data/transfers.csv")
-clubs = pd.read_csv("data/clubs.csv")
+# Allow `models.*` imports when run as a script
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.market_cube import MarketCube, league_totals
 
-# Ensure transfer_fee is numeric and no NaNs
-transfers["transfer_fee"] = transfers["transfer_fee"].fillna(0)
+DATA_PATH = "data/"
+OUTPUT_FILE = "market_trends.csv"
+CUBE_DIR = "market_cube"
+OUTPUT_COLUMNS = [
+    "domestic_competition_id", "total_bought", "total_sold", "net_spending",
+    "investment_score", "attractiveness_score", "net_score", "market_trend_score",
+]
 
-# Get league for both origin and destination clubs
-transfers_to = transfers.merge(clubs[["club_id", "domestic_competition_id"]], left_on="to_club_id", right_on="club_id", how="left")
-to_agg = transfers_to.groupby("domestic_competition_id")["transfer_fee"].sum().reset_index(name="total_bought")
 
-transfers_from = transfers.merge(clubs[["club_id", "domestic_competition_id"]], left_on="from_club_id", right_on="club_id", how="left")
-from_agg = transfers_from.groupby("domestic_competition_id")["transfer_fee"].sum().reset_index(name="total_sold")
+def score_markets(market_df):
+    # Normalize features to scale (0 to 10)
+    scaler = MinMaxScaler(feature_range=(0, 10))
+    normalized = scaler.fit_transform(market_df[["total_bought", "total_sold", "net_spending"]])
+    market_df[["investment_score", "attractiveness_score", "net_score"]] = normalized
 
-# Merge in and out data
-market_df = pd.merge(to_agg, from_agg, on="domestic_competition_id", how="outer").fillna(0)
-market_df["net_spending"] = market_df["total_bought"] - market_df["total_sold"]
+    # Final composite score (weights can be adjusted)
+    market_df["market_trend_score"] = (
+        0.5 * market_df["investment_score"] +
+        0.3 * market_df["attractiveness_score"] +
+        0.2 * market_df["net_score"]
+    )
+    return market_df[OUTPUT_COLUMNS]
 
-# Add number of clubs per league to normalize
-clubs_by_league = clubs.groupby("domestic_competition_id")["club_id"].nunique().reset_index(name="n_clubs")
-market_df = market_df.merge(clubs_by_league, on="domestic_competition_id", how="left")
-market_df["avg_spending_per_club"] = market_df["total_bought"] / market_df["n_clubs"]
 
-# Normalize features to scale (0 to 10)
-scaler = MinMaxScaler(feature_range=(0, 10))
-normalized = scaler.fit_transform(market_df[["total_bought", "total_sold", "net_spending"]])
-market_df[["investment_score", "attractiveness_score", "net_score"]] = normalized
+def market_trends(cube):
+    """All-time league indicators from the market cube."""
+    market_df = league_totals(cube).reset_index()
+    market_df["net_spending"] = market_df["total_bought"] - market_df["total_sold"]
+    return score_markets(market_df)
 
-# Final composite score (weights can be adjusted)
-market_df["market_trend_score"] = (
-    0.5 * market_df["investment_score"] +
-    0.3 * market_df["attractiveness_score"] +
-    0.2 * market_df["net_score"]
-)
 
-# Clean output
-market_df = market_df[[
-    "domestic_competition_id", "total_bought", "total_sold", "net_spending",
-    "investment_score", "attractiveness_score", "net_score", "market_trend_score"
-]]
+def market_trends_legacy(transfers, clubs):
+    # Original implementation, kept for --verify
+    transfers = transfers.copy()
+    transfers["transfer_fee"] = transfers["transfer_fee"].fillna(0)
+
+    transfers_to = transfers.merge(clubs[["club_id", "domestic_competition_id"]], left_on="to_club_id", right_on="club_id", how="left")
+    to_agg = transfers_to.groupby("domestic_competition_id")["transfer_fee"].sum().reset_index(name="total_bought")
+
+    transfers_from = transfers.merge(clubs[["club_id", "domestic_competition_id"]], left_on="from_club_id", right_on="club_id", how="left")
+    from_agg = transfers_from.groupby("domestic_competition_id")["transfer_fee"].sum().reset_index(name="total_sold")
+
+    market_df = pd.merge(to_agg, from_agg, on="domestic_competition_id", how="outer").fillna(0)
+    market_df["net_spending"] = market_df["total_bought"] - market_df["total_sold"]
+    return score_markets(market_df)
+
+
+def verify(data_path):
+    transfers = pd.read_csv(os.path.join(data_path, "transfers.csv"))
+    clubs = pd.read_csv(os.path.join(data_path, "clubs.csv"))
+    expected = market_trends_legacy(transfers, clubs).reset_index(drop=True)
+    actual = market_trends(MarketCube(os.path.join(data_path, CUBE_DIR)).get(transfers, clubs))
+    actual = actual.reset_index(drop=True)
+
+    same = (
+        expected["domestic_competition_id"].tolist() == actual["domestic_competition_id"].tolist()
+        and np.allclose(expected[OUTPUT_COLUMNS[1:]], actual[OUTPUT_COLUMNS[1:]], rtol=1e-9, atol=1e-6)
+    )
+    print(f"{len(expected)} leagues: {'identical' if same else 'MISMATCH'}")
+    return same
+
+
+def run(data_path):
+    transfers = pd.read_csv(os.path.join(data_path, "transfers.csv"))
+    clubs = pd.read_csv(os.path.join(data_path, "clubs.csv"))
+    cube = MarketCube(os.path.join(data_path, CUBE_DIR)).get(transfers, clubs)
+    market_trends(cube).to_csv(os.path.join(data_path, OUTPUT_FILE), index=False)
+    print(f"✅ Novo arquivo '{OUTPUT_FILE}' criado com indicadores refinados de mercado.")
+
 
-# Save
-market_df.to_csv("data/market_trends.csv", index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build league market indicators from transfers")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--verify", action="store_true", help="compare with the original implementation and exit")
+    args = parser.parse_args()
 
-print("✅ Novo arquivo 'market_trends.csv' criado com indicadores refinados de mercado.")
+    if args.verify:
+        sys.exit(0 if verify(args.data_path) else 1)
+    run(args.data_path)
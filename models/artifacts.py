@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+
+# Native artifacts of each model, under the model path
+NATIVE_DIR = "native"
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.ubj"
+ARTIFACT_FORMAT = 1
+
+
+def native_path(model_path, name):
+    return os.path.join(model_path, NATIVE_DIR, name)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _save_array(path, file, array, files):
+    np.save(os.path.join(path, file), array, allow_pickle=False)
+    with open(os.path.join(path, file), "rb") as f:
+        data = f.read()
+    files[file] = {"sha256": _sha256(data), "bytes": len(data)}
+    return file
+
+
+def _export_preprocessor(preprocessor, path, files):
+    # Parameters of a fitted ColumnTransformer of StandardScalers and OneHotEncoders
+    if getattr(preprocessor, "remainder", "drop") != "drop":
+        raise ValueError(f"unsupported remainder {preprocessor.remainder!r}")
+    transformers = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder" or transformer == "drop":
+            continue
+        kind = type(transformer).__name__
+        spec = {"name": name, "kind": kind, "columns": list(columns)}
+        if kind == "StandardScaler":
+            mean = transformer.mean_ if transformer.with_mean else np.zeros(len(columns))
+            scale = transformer.scale_ if transformer.with_std else np.ones(len(columns))
+            spec["mean"] = _save_array(path, f"{name}.mean.npy", np.asarray(mean, dtype=np.float64), files)
+            spec["scale"] = _save_array(path, f"{name}.scale.npy", np.asarray(scale, dtype=np.float64), files)
+        elif kind == "OneHotEncoder":
+            if transformer.drop is not None or getattr(transformer, "_infrequent_enabled", False):
+                raise ValueError(f"{name}: dropped or infrequent categories are not supported")
+            spec["handle_unknown"] = transformer.handle_unknown
+            spec["categories"] = [
+                _save_array(path, f"{name}.categories_{i}.npy", np.asarray(categories).astype(str), files)
+                for i, categories in enumerate(transformer.categories_)
+            ]
+        else:
+            raise ValueError(f"{name}: unsupported transformer {kind}")
+        transformers.append(spec)
+    return {"sparse_output": bool(preprocessor.sparse_output_), "transformers": transformers}
+
+
+def export_model(name, artifacts, model_path):
+    """Writes one loaded model as native artifacts under model_path/native/name.
+
+    The XGBoost booster is saved in its own UBJSON format, preprocessor
+    parameters and label classes as .npy arrays, and the manifest records
+    the feature order, how the arrays fit together and a SHA-256 of every
+    file. Returns the manifest.
+    """
+    path = native_path(model_path, name)
+    os.makedirs(path, exist_ok=True)
+    files = {}
+    model = artifacts["model"]
+    preprocessor = artifacts["preprocessor"]
+
+    data = bytes(model.get_booster().save_raw("ubj"))
+    with open(os.path.join(path, MODEL_FILE), "wb") as f:
+        f.write(data)
+    files[MODEL_FILE] = {"sha256": _sha256(data), "bytes": len(data)}
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "name": name,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "xgboost": xgb.__version__,
+        "features": list(preprocessor.feature_names_in_),
+        "preprocessor": _export_preprocessor(preprocessor, path, files),
+        "model": {
+            "file": MODEL_FILE,
+            "objective": model.get_params()["objective"],
+            "classes": np.asarray(model.classes_).tolist(),
+            "n_features": int(model.n_features_in_),
+            "iteration_range": list(model._get_iteration_range(None)),
+        },
+    }
+    encoder = artifacts.get("label_encoder")
+    if encoder is not None:
+        manifest["label_encoder"] = {"classes": _save_array(path, "label_classes.npy", np.asarray(encoder.classes_), files)}
+    manifest["files"] = files
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class StandardScaler:
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        X = X - self.mean_
+        X /= self.scale_
+        return X
+
+
+class OneHotEncoder:
+    def __init__(self, categories, handle_unknown="ignore"):
+        self.categories_ = categories
+        self.handle_unknown = handle_unknown
+
+    def transform(self, X):
+        blocks = []
+        for i, categories in enumerate(self.categories_):
+            codes = pd.Categorical(X[:, i], categories=categories).codes
+            if self.handle_unknown != "ignore" and (codes < 0).any():
+                raise ValueError(f"Found unknown categories in column {i} during transform")
+            block = np.zeros((len(X), len(categories)))
+            known = codes >= 0
+            block[np.flatnonzero(known), codes[known]] = 1.0
+            blocks.append(block)
+        return np.hstack(blocks) if blocks else np.empty((len(X), 0))
+
+
+class ColumnPreprocessor:
+    """The inference half of a fitted ColumnTransformer.
+
+    Output matches ColumnTransformer.transform, CSR when the original
+    returned sparse matrices: XGBoost treats the zeros left out of a sparse
+    row as missing values, so the format changes its predictions.
+    """
+
+    def __init__(self, features, transformers, sparse_output):
+        self.feature_names_in_ = np.asarray(features, dtype=object)
+        self.transformers_ = transformers
+        self.sparse_output_ = sparse_output
+
+    def transform(self, df):
+        blocks = []
+        for name, transformer, columns in self.transformers_:
+            if isinstance(transformer, OneHotEncoder):
+                blocks.append(transformer.transform(df[columns].to_numpy(dtype=object)))
+            else:
+                blocks.append(transformer.transform(df[columns].to_numpy(dtype=np.float64)))
+        X = np.hstack(blocks)
+        return sparse.csr_matrix(X) if self.sparse_output_ else X
+
+
+class BoosterClassifier:
+    """predict_proba of an XGBClassifier over its bare booster."""
+
+    def __init__(self, booster, classes, iteration_range):
+        self.booster = booster
+        self.classes_ = classes
+        self.n_features_in_ = booster.num_features()
+        self.iteration_range = tuple(iteration_range)
+
+    def predict_proba(self, X):
+        proba = self.booster.inplace_predict(
+            X, iteration_range=self.iteration_range, predict_type="value", missing=np.nan, validate_features=False
+        )
+        if proba.ndim == 1:
+            return np.vstack((1 - proba, proba)).T
+        return proba
+
+
+class LabelDecoder:
+    def __init__(self, classes):
+        self.classes_ = classes
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y)]
+
+
+def _read_verified(path, file, files):
+    with open(os.path.join(path, file), "rb") as f:
+        data = f.read()
+    if _sha256(data) != files[file]["sha256"]:
+        raise ValueError(f"{os.path.join(path, file)}: checksum mismatch")
+    return data
+
+
+def _load_array(path, file, files, verify):
+    if verify:
+        _read_verified(path, file, files)
+    return np.load(os.path.join(path, file), mmap_mode="r", allow_pickle=False)
+
+
+def has_native(model_path, name):
+    return os.path.exists(os.path.join(native_path(model_path, name), MANIFEST_FILE))
+
+
+def load_model(model_path, name, verify=True):
+    """The inference artifacts of one model from its native export.
+
+    Returns the same roles as the pickles (model, preprocessor, optional
+    label_encoder) plus the feature order, without unpickling anything.
+    Raises ValueError when a file does not match its checksum.
+    """
+    path = native_path(model_path, name)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path}: artifact format {manifest.get('format')}, expected {ARTIFACT_FORMAT}")
+    files = manifest["files"]
+
+    transformers = []
+    for spec in manifest["preprocessor"]["transformers"]:
+        if spec["kind"] == "StandardScaler":
+            transformer = StandardScaler(
+                _load_array(path, spec["mean"], files, verify), _load_array(path, spec["scale"], files, verify)
+            )
+        else:
+            transformer = OneHotEncoder(
+                [_load_array(path, file, files, verify) for file in spec["categories"]], spec["handle_unknown"]
+            )
+        transformers.append((spec["name"], transformer, spec["columns"]))
+    preprocessor = ColumnPreprocessor(manifest["features"], transformers, manifest["preprocessor"]["sparse_output"])
+
+    spec = manifest["model"]
+    if verify:
+        booster = xgb.Booster(model_file=bytearray(_read_verified(path, spec["file"], files)))
+    else:
+        booster = xgb.Booster(model_file=os.path.join(path, spec["file"]))
+    artifacts = {
+        "model": BoosterClassifier(booster, np.asarray(spec["classes"]), spec["iteration_range"]),
+        "preprocessor": preprocessor,
+        "features": manifest["features"],
+    }
+    if "label_encoder" in manifest:
+        artifacts["label_encoder"] = LabelDecoder(
+            np.asarray(_load_array(path, manifest["label_encoder"]["classes"], files, verify))
+        )
+    return artifacts
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "extra"])
+
+
+class ResponseCache:
+    """LRU cache of serialized responses, valid for one dataset version.
+
+    Entries are keyed by (endpoint, normalized inputs) and hold the response
+    body, its ETag and an optional extra value. A lookup or store with a new
+    dataset version drops every entry, so a data reload invalidates the
+    cache without further bookkeeping. The version only moves forward: the
+    versions it replaced are remembered, and a late request still on one
+    of them misses and stores nothing instead of clearing the new entries.
+    """
+
+    # Replaced versions remembered
+    MAX_RETIRED = 64
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.retired = OrderedDict()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # False for a version already replaced, whose entries are not kept
+        if version == self.version:
+            return True
+        if version in self.retired:
+            self.stale += 1
+            return False
+        if self.version is not None:
+            self.retired[self.version] = True
+            if len(self.retired) > self.MAX_RETIRED:
+                self.retired.popitem(last=False)
+        self.entries.clear()
+        self.bytes = 0
+        self.version = version
+        return True
+
+    def get(self, key, version):
+        with self._lock:
+            if not self._check_version(version):
+                self.misses += 1
+                return None
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, extra=None):
+        entry = CachedResponse(body, hashlib.blake2b(body, digest_size=16).hexdigest(), extra)
+        with self._lock:
+            if not self._check_version(version):
+                return entry
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key).body)
+            if len(body) > self.max_bytes:
+                return entry
+            self.entries[key] = entry
+            self.bytes += len(body)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, dropped = self.entries.popitem(last=False)
+                self.bytes -= len(dropped.body)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
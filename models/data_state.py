@@ -0,0 +1,216 @@
+import io
+import os
+import time
+
+import pandas as pd
+
+from models.feature_store import FeatureStore
+from models.market_cube import MarketCube
+from models.player_form import PlayerForm
+from models.player_ratings import load_player_ratings
+from models.player_search import PlayerSearchIndex
+from models.player_similarity import PlayerSimilarityIndex
+from models.row_index import build_indexes, extend_indexes
+from models.schema import append_rows, compact
+from models.snapshot import TABLES, dataset_version, load_tables, source_fingerprint
+from models.team_strength import TeamStrengths
+from models.transfer_model import build_transfer_aggregates
+from models.transfer_predictions import TransferPredictions
+
+# Tables that only ever grow by appended rows; a change to any other table
+# (players are rewritten with fresh market values) triggers a full reload
+APPEND_TABLES = ["appearances", "club_games", "games", "player_valuations", "transfers"]
+# Tables the transfer aggregates are built from
+AGGREGATE_TABLES = {"transfers", "players", "clubs"}
+# Market cube store, relative to the data path
+MARKET_CUBE_DIR = "market_cube"
+# Bytes before the loaded end of a CSV that must be unchanged for an append
+TAIL_BYTES = 4096
+
+
+def _tail(path, size):
+    # Last bytes of the first `size` bytes of the file
+    with open(path, "rb") as f:
+        f.seek(max(0, size - TAIL_BYTES))
+        return f.read(min(size, TAIL_BYTES))
+
+
+def features_as_of():
+    # As of tomorrow so that rows dated today are included
+    return pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+
+
+class DataState:
+    """Tables of one dataset version and everything derived from them.
+
+    A state is never modified once built: a reload builds a new one and the
+    backend swaps its reference, so a request that took the old state keeps
+    a consistent view until it finishes.
+    """
+
+    def __init__(self, data_path, tables, version, sources, feature_store,
+                 indexes=None, player_search=None, aggregates=None, player_features=None, market_cube=None,
+                 team_strengths=None, player_form=None):
+        self.data_path = data_path
+        self.tables = tables
+        self.version = version
+        # Size, mtime and tail bytes of each CSV as loaded
+        self.sources = sources
+        self.feature_store = feature_store
+
+        self.appearances = tables["appearances"]
+        self.club_games = tables["club_games"]
+        self.clubs = tables["clubs"]
+        self.games = tables["games"]
+        self.players = tables["players"]
+        self.player_valuations = tables["player_valuations"]
+        self.transfers = tables["transfers"]
+
+        # Per-player / per-club row positions used instead of full-table mask scans
+        self.indexes = indexes if indexes is not None else build_indexes(tables)
+        # Per-player cumulative stats over appearances by date, for windowed form
+        if player_form is None:
+            index = self.indexes.get(("appearances", "player_id"))
+            player_form = PlayerForm(self.appearances, index.order if index is not None else None)
+        self.player_form = player_form
+        # N-gram name index behind /search_player and /autocomplete_player
+        self.player_search = player_search if player_search is not None else PlayerSearchIndex(self.players)
+        # League x season x window market totals, kept up to date on disk
+        if market_cube is None:
+            market_cube = MarketCube(os.path.join(data_path, MARKET_CUBE_DIR)).get(self.transfers, self.clubs)
+        self.market_cube = market_cube
+        # Player-independent transfer aggregates
+        self.aggregates = aggregates if aggregates is not None else build_transfer_aggregates(
+            self.transfers, self.players, self.clubs, self.market_cube
+        )
+        # Point-in-time player features shared with the training scripts
+        self.features_as_of = features_as_of()
+        if player_features is None:
+            player_features = feature_store.get(self.features_as_of, tables, rolling=True).set_index("player_id")
+        self.player_features = player_features
+        # Nearest-neighbour index over player feature vectors behind /similar_players
+        self.player_similarity = PlayerSimilarityIndex(self.players, player_features)
+        # Elo and Poisson attack/defence per club, updated game by game
+        self.team_strengths = team_strengths if team_strengths is not None else TeamStrengths.fit(self.games)
+        self.club_names = self.clubs.set_index("club_id")["name"].to_dict()
+        # Latest event-based rating per player, maintained by games_ratings.py
+        self.player_ratings = load_player_ratings(data_path)
+        # predict_transfer results of this version from precompute_transfers.py, None when stale
+        self.transfer_predictions = TransferPredictions.load(data_path, version, self.features_as_of)
+
+
+def _sources(data_path, stats):
+    return {
+        name: {**stat, "tail": _tail(os.path.join(data_path, name + ".csv"), stat["size"])}
+        for name, stat in stats.items()
+    }
+
+
+def load_state(data_path, feature_store_path, use_snapshot=True):
+    """Returns (state, load report) with every table read in full."""
+    tables, version, report = load_tables(data_path, use_snapshot)
+    sources = _sources(data_path, report["sources"])
+    return DataState(data_path, tables, version, sources, FeatureStore(feature_store_path)), report
+
+
+def _appended_rows(path, source, size, columns):
+    """Rows between the loaded end of the file and `size`, under the CSV's
+    own `columns` (the loaded table may keep fewer).
+
+    Returns (rows, end) where end is the offset after the last complete
+    line read, or (None, None) when the file was not only appended to.
+    """
+    if size < source["size"] or _tail(path, source["size"]) != source["tail"]:
+        return None, None
+    if source["size"] and not source["tail"].endswith(b"\n"):
+        return None, None
+    with open(path, "rb") as f:
+        f.seek(source["size"])
+        data = f.read(size - source["size"])
+    # A line still being written is left for the next reload
+    data = data[:data.rfind(b"\n") + 1]
+    end = source["size"] + len(data)
+    if not data:
+        return pd.DataFrame(columns=columns), end
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns), end
+
+
+def _match_dtypes(rows, like):
+    # Keep column dtypes of the loaded table where the new rows allow it;
+    # append_rows merges categories and widens narrowed integers
+    for col in rows.columns:
+        dtype = like[col].dtype
+        if rows[col].dtype == dtype or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if dtype.kind in "iu" and rows[col].dtype.kind in "iu":
+            continue
+        if dtype == object or rows[col].notna().all():
+            try:
+                rows[col] = rows[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return rows
+
+
+def reload_state(state):
+    """Returns (state, report) with the rows added to the CSVs since state.
+
+    Appended rows of APPEND_TABLES are concatenated to the in-memory tables
+    and merged into the existing indexes and stored features; any other
+    change falls back to a full load. The same state comes back when no
+    file changed.
+    """
+    start = time.perf_counter()
+    data_path = state.data_path
+    fingerprint = source_fingerprint(data_path)
+    current = fingerprint["sources"]
+    changed = [
+        name for name in TABLES
+        if {"size": state.sources[name]["size"], "mtime_ns": state.sources[name]["mtime_ns"]} != current[name]
+    ]
+
+    appended = {} if all(name in APPEND_TABLES for name in changed) else None
+    stats = {}
+    for name in changed if appended is not None else []:
+        path = os.path.join(data_path, name + ".csv")
+        rows, end = _appended_rows(path, state.sources[name], current[name]["size"], pd.read_csv(path, nrows=0).columns)
+        if rows is None:
+            appended = None
+            break
+        appended[name] = _match_dtypes(compact(name, rows), state.tables[name])
+        stats[name] = {"size": end, "mtime_ns": current[name]["mtime_ns"]}
+
+    if not changed:
+        new_state, method, rows_applied = state, "none", {}
+    elif appended is None:
+        new_state, _ = load_state(data_path, state.feature_store.path, use_snapshot=False)
+        method, rows_applied = "full", {name: len(new_state.tables[name]) for name in TABLES}
+    else:
+        tables = dict(state.tables)
+        for name, rows in appended.items():
+            if len(rows):
+                tables[name] = append_rows(tables[name], rows)
+        grown = {name for name, rows in appended.items() if len(rows)}
+        sources = {**state.sources, **_sources(data_path, stats)}
+        version = dataset_version({**fingerprint, "sources": {
+            name: {"size": src["size"], "mtime_ns": src["mtime_ns"]} for name, src in sources.items()
+        }})
+        new_state = DataState(
+            data_path, tables, version, sources, state.feature_store,
+            indexes=extend_indexes(state.indexes, tables, grown),
+            player_search=state.player_search,
+            aggregates=None if grown & AGGREGATE_TABLES else state.aggregates,
+            market_cube=None if grown & AGGREGATE_TABLES else state.market_cube,
+            team_strengths=state.team_strengths.updated(appended["games"]) if "games" in grown else state.team_strengths,
+            player_form=None if "appearances" in grown else state.player_form,
+        )
+        method, rows_applied = "append", {name: len(rows) for name, rows in appended.items()}
+
+    report = {
+        "method": method,
+        "version": new_state.version,
+        "previous_version": state.version,
+        "rows_applied": rows_applied,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    return new_state, report
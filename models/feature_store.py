@@ -0,0 +1,349 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from models.snapshot import restore_missing_strings, write_feather_atomic, write_json_atomic
+
+# Tables the player features are computed from, with the columns they read
+SOURCE_COLUMNS = {
+    "players": ["player_id", "date_of_birth", "contract_expiration_date", "height_in_cm", "position", "foot",
+                "country_of_citizenship"],
+    "player_valuations": ["player_id", "date", "market_value_in_eur"],
+    "appearances": ["player_id", "date", "goals", "assists", "minutes_played"],
+    "transfers": ["player_id", "transfer_date", "transfer_fee"],
+}
+SOURCE_TABLES = list(SOURCE_COLUMNS)
+
+# Months of valuation history / appearances summarized before the as-of date
+VALUATION_WINDOW = 6
+RECENT_MONTHS = 6
+
+FEATURE_COLUMNS = [
+    "player_id", "age", "contract_remaining", "height_in_cm", "position", "foot", "country_of_citizenship",
+    "market_value_in_eur", "market_value_peak", "market_value_last_month", "avg_market_value_last_6m",
+    "market_value_growth", "market_decline_pct",
+    "goals_total", "assists_total", "minutes_total", "matches_total", "goals_per_game", "assists_per_game",
+    "goals_last_6m", "assists_last_6m", "minutes_last_6m", "matches_last_6m",
+    "num_transfers", "avg_transfer_fee", "transfer_count",
+]
+# Bump when the definitions below or the manifest change so stored snapshots are rebuilt
+STORE_FORMAT = 2
+# Seconds a snapshot that is no longer used stays on disk, so that a process
+# which found it a moment before can still read it
+RETIRED_SECONDS = 24 * 3600
+
+
+def _month_index(dates):
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+
+
+class MonthlyValuations:
+    """Month-end market values per player, forward-filled between valuations.
+
+    Same grid as resampling each player's valuations to "1ME" with ffill:
+    one row per month from the player's first to last valuation, holding the
+    last value known at that month end. Rows are sorted by (player, month)
+    and addressed by the key player_ordinal * KEY_STRIDE + month.
+    """
+
+    KEY_STRIDE = 1 << 20
+
+    def __init__(self, player_valuations):
+        vals = player_valuations.dropna(subset=["player_id", "date"])
+        vals = vals.sort_values(["player_id", "date"], kind="stable")
+        self.player_ids = vals["player_id"].unique()
+        ordinal = np.searchsorted(self.player_ids, vals["player_id"].to_numpy())
+        month = _month_index(vals["date"])
+
+        # Last valuation of each (player, month)
+        obs_keys = ordinal * self.KEY_STRIDE + month
+        last_in_month = np.append(obs_keys[1:] != obs_keys[:-1], True)[:len(obs_keys)]
+        obs_keys = obs_keys[last_in_month]
+        obs_values = vals["market_value_in_eur"].to_numpy(dtype=float)[last_in_month]
+
+        # Expand to every month between each player's first and last valuation
+        obs_ordinal = ordinal[last_in_month]
+        first = np.searchsorted(obs_ordinal, np.arange(len(self.player_ids)), side="left")
+        last = np.searchsorted(obs_ordinal, np.arange(len(self.player_ids)), side="right") - 1
+        first_month = obs_keys[first] % self.KEY_STRIDE
+        lengths = obs_keys[last] % self.KEY_STRIDE - first_month + 1
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        player_of_row = np.repeat(np.arange(len(self.player_ids)), lengths)
+        self.keys = player_of_row * self.KEY_STRIDE + np.repeat(first_month, lengths) + (np.arange(lengths.sum()) - starts)
+        self.values = obs_values[np.searchsorted(obs_keys, self.keys, side="right") - 1]
+
+        self.player_start = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def windows(self, player_ids, ref_dates, size):
+        """Start/end rows of the last `size` months strictly before each ref date.
+
+        Players without valuations get an empty window.
+        """
+        player_ids = np.asarray(player_ids)
+        if not len(self.player_ids):
+            empty = np.zeros(len(player_ids), dtype=np.int64)
+            return empty, empty
+        ordinal = np.searchsorted(self.player_ids, player_ids)
+        ordinal = np.minimum(ordinal, len(self.player_ids) - 1)
+        known = (self.player_ids[ordinal] == player_ids) & ref_dates.notna().to_numpy()
+
+        # Month-end labels are midnight of the last day; they precede ref from ref's month on
+        ref_month = _month_index(ref_dates)
+        month_end = ref_dates.dt.to_period("M").dt.to_timestamp(how="end").dt.normalize()
+        cut_month = ref_month + (month_end < ref_dates).to_numpy()
+
+        cut_month = np.where(known, cut_month, 0).astype(np.int64)
+        end = np.searchsorted(self.keys, ordinal * self.KEY_STRIDE + cut_month, side="left")
+        start = np.maximum(self.player_start[ordinal], end - size)
+        end = np.where(known, np.maximum(end, start), start)
+        return start, end
+
+
+def valuation_window_features(monthly, start, end, size):
+    # Mean over the window skipping NaN, summed in row order like Series.mean
+    total = np.zeros(len(start))
+    count = np.zeros(len(start))
+    for offset in range(size):
+        row = start + offset
+        inside = row < end
+        value = monthly.values[np.where(inside, row, 0)]
+        valid = inside & ~np.isnan(value)
+        total += np.where(valid, value, 0)
+        count += valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_val = np.where(count > 0, total / count, np.nan)
+
+    first = monthly.values[start]
+    last = monthly.values[np.maximum(end - 1, start)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = np.where(first > 0, (last - first) / first, 0)
+    return avg_val, last, growth
+
+
+def _match_totals(appearances):
+    # Goals, assists and minutes summed per player, plus the number of matches
+    # (one appearance row per match, so appearance_id is not needed)
+    by_player = appearances.groupby("player_id")
+    totals = by_player[["goals", "assists", "minutes_played"]].sum()
+    totals["total_matches"] = by_player.size()
+    return totals
+
+
+def performance_totals(appearances):
+    # Career performance stats per player
+    total_perf = _match_totals(appearances).reset_index()
+    total_perf["goals_per_game"] = total_perf["goals"] / total_perf["total_matches"]
+    total_perf["assists_per_game"] = total_perf["assists"] / total_perf["total_matches"]
+    return total_perf
+
+
+def _dates(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
+
+
+def player_features(tables, as_of, player_ids=None):
+    """Per-player features using only rows dated strictly before as_of.
+
+    Restricted to player_ids when given, which is how incremental updates
+    recompute only the players touched by new rows.
+    """
+    as_of = pd.Timestamp(as_of)
+    frames = {}
+    for name in SOURCE_TABLES:
+        df = tables[name]
+        frames[name] = df[df["player_id"].isin(player_ids)] if player_ids is not None else df
+
+    players = frames["players"].drop_duplicates("player_id").set_index("player_id")
+    vals = frames["player_valuations"][["player_id", "date", "market_value_in_eur"]]
+    vals = vals.assign(date=_dates(vals["date"]))
+    vals = vals[vals["date"] < as_of]
+
+    ids = np.union1d(players.index.dropna().to_numpy(), vals["player_id"].dropna().unique())
+    features = pd.DataFrame(index=pd.Index(ids, name="player_id"))
+
+    # Static player attributes
+    dob = _dates(players["date_of_birth"]).reindex(ids)
+    contract_end = _dates(players["contract_expiration_date"]).reindex(ids)
+    features["age"] = as_of.year - dob.dt.year
+    features["contract_remaining"] = (contract_end - as_of).dt.days / 365
+    for col in ["height_in_cm", "position", "foot", "country_of_citizenship"]:
+        features[col] = players[col].reindex(ids)
+
+    # Market value: latest known, peak and the monthly window before as_of
+    by_player = vals.sort_values("date", kind="stable").groupby("player_id")["market_value_in_eur"]
+    features["market_value_in_eur"] = by_player.last().reindex(ids)
+    features["market_value_peak"] = by_player.max().reindex(ids)
+
+    monthly = MonthlyValuations(vals)
+    start, end = monthly.windows(ids, pd.Series(as_of, index=range(len(ids))), VALUATION_WINDOW)
+    has_window = end > start
+    if len(monthly):
+        avg_val, last_val, growth = valuation_window_features(monthly, start, end, VALUATION_WINDOW)
+    else:
+        avg_val = last_val = growth = np.full(len(ids), np.nan)
+    peak = features["market_value_peak"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        decline = np.where(peak > 0, (peak - last_val) / peak, 0)
+    features["market_value_last_month"] = np.where(has_window, last_val, np.nan)
+    features["avg_market_value_last_6m"] = np.where(has_window, avg_val, np.nan)
+    features["market_value_growth"] = np.where(has_window, growth, np.nan)
+    features["market_decline_pct"] = np.where(has_window, decline, np.nan)
+
+    # Performance: career totals and the last RECENT_MONTHS months
+    apps = frames["appearances"]
+    apps = apps.assign(date=_dates(apps["date"]))
+    apps = apps[apps["date"] < as_of]
+    totals = performance_totals(apps).set_index("player_id").reindex(ids)
+    features["goals_total"] = totals["goals"].fillna(0)
+    features["assists_total"] = totals["assists"].fillna(0)
+    features["minutes_total"] = totals["minutes_played"].fillna(0)
+    features["matches_total"] = totals["total_matches"].fillna(0)
+    features["goals_per_game"] = totals["goals_per_game"]
+    features["assists_per_game"] = totals["assists_per_game"]
+
+    recent = apps[apps["date"] >= as_of - pd.DateOffset(months=RECENT_MONTHS)]
+    recent = _match_totals(recent).reindex(ids).fillna(0)
+    features["goals_last_6m"] = recent["goals"]
+    features["assists_last_6m"] = recent["assists"]
+    features["minutes_last_6m"] = recent["minutes_played"]
+    features["matches_last_6m"] = recent["total_matches"]
+
+    # Transfer history; num_transfers counts transfers with a known fee
+    transfers = frames["transfers"]
+    history = transfers[_dates(transfers["transfer_date"]) < as_of].groupby("player_id")["transfer_fee"]
+    features["num_transfers"] = history.count().reindex(ids).fillna(0)
+    features["avg_transfer_fee"] = history.mean().reindex(ids).fillna(0)
+    features["transfer_count"] = history.size().reindex(ids).fillna(0).astype("int64")
+
+    return features.reset_index()[FEATURE_COLUMNS]
+
+
+def _prefix_hash(name, df, rows):
+    # Fingerprint of every column the features read in the first `rows` rows,
+    # so that rows edited in place are told apart from appended ones
+    prefix = df[SOURCE_COLUMNS[name]].iloc[:rows]
+    return str(int(pd.util.hash_pandas_object(prefix, index=False).sum() % (1 << 62)))
+
+
+class FeatureStore:
+    """Player features materialized to disk, one Feather file per as-of date.
+
+    Each file has a manifest entry with the source row counts it was built
+    from. When the source tables only grew, update() recomputes the players
+    touched by the new rows and rewrites the file; otherwise it rebuilds it.
+
+    Dates written with rolling=True (the backend's "as of tomorrow") replace
+    each other: storing one retires the rolling dates before it. Training
+    cutoffs are stored without it and kept until the store format changes.
+    Retired files are deleted RETIRED_SECONDS later, by a later write; files
+    are only ever replaced whole, so readers never see a partial write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _file(self, as_of):
+        return os.path.join(self.path, f"as_of={as_of:%Y-%m-%d}.feather")
+
+    def _manifest_file(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_file()):
+            return {}
+        with open(self._manifest_file()) as f:
+            return json.load(f)
+
+    def _write(self, as_of, features, tables, rolling=False):
+        os.makedirs(self.path, exist_ok=True)
+        write_feather_atomic(features, self._file(as_of))
+        manifest = self._read_manifest()
+        key = f"{as_of:%Y-%m-%d}"
+        # A date also stored as a training cutoff stays kept
+        rolling = rolling and manifest.get(key, {}).get("rolling", True)
+        manifest[key] = {
+            "format": STORE_FORMAT,
+            "rows": {name: len(tables[name]) for name in SOURCE_TABLES},
+            "prefix_hash": {name: _prefix_hash(name, tables[name], len(tables[name])) for name in SOURCE_TABLES},
+            "rolling": rolling,
+        }
+        # Earlier rolling dates and files of an older format are not used any
+        # more: they are retired now and deleted once nobody can be reading them
+        now = time.time()
+        for old, entry in list(manifest.items()):
+            if old == key:
+                continue
+            if "retired" in entry:
+                if now - entry["retired"] >= RETIRED_SECONDS:
+                    del manifest[old]
+                    if os.path.exists(self._file(pd.Timestamp(old))):
+                        os.remove(self._file(pd.Timestamp(old)))
+            elif entry.get("format") != STORE_FORMAT or (rolling and entry.get("rolling") and old < key):
+                manifest[old] = {"retired": now}
+        write_json_atomic(manifest, self._manifest_file())
+
+    def load(self, as_of):
+        as_of = pd.Timestamp(as_of)
+        if not os.path.exists(self._file(as_of)):
+            return None
+        return restore_missing_strings(feather.read_feather(self._file(as_of)))
+
+    def cached(self, as_of):
+        """Whether features for as_of are stored in the current format."""
+        as_of = pd.Timestamp(as_of)
+        entry = self._read_manifest().get(f"{as_of:%Y-%m-%d}")
+        return entry is not None and entry.get("format") == STORE_FORMAT and os.path.exists(self._file(as_of))
+
+    def save(self, as_of, features, tables):
+        """Stores features computed elsewhere from tables, e.g. in a worker process."""
+        self._write(pd.Timestamp(as_of), features, tables)
+
+    def materialize(self, as_of, tables, rolling=False):
+        as_of = pd.Timestamp(as_of)
+        features = player_features(tables, as_of)
+        self._write(as_of, features, tables, rolling)
+        return features
+
+    def update(self, as_of, tables, rolling=False):
+        """Brings the stored features for as_of up to date with tables."""
+        as_of = pd.Timestamp(as_of)
+        entry = self._read_manifest().get(f"{as_of:%Y-%m-%d}")
+        stored = self.load(as_of)
+        if stored is None or entry is None or entry.get("format") != STORE_FORMAT:
+            return self.materialize(as_of, tables, rolling)
+
+        new_rows = {}
+        for name in SOURCE_TABLES:
+            seen = entry["rows"][name]
+            df = tables[name]
+            if len(df) < seen or _prefix_hash(name, df, seen) != entry["prefix_hash"][name]:
+                return self.materialize(as_of, tables, rolling)
+            new_rows[name] = df.iloc[seen:]
+        if not any(len(rows) for rows in new_rows.values()):
+            return stored
+
+        # Only rows dated before as_of can change the features
+        date_columns = {"player_valuations": "date", "appearances": "date", "transfers": "transfer_date"}
+        affected = set(new_rows["players"]["player_id"].dropna())
+        for name, column in date_columns.items():
+            rows = new_rows[name]
+            affected.update(rows.loc[_dates(rows[column]) < as_of, "player_id"].dropna())
+        affected = list(affected)
+
+        recomputed = player_features(tables, as_of, player_ids=affected)
+        features = pd.concat([stored[~stored["player_id"].isin(affected)], recomputed])
+        features = features.sort_values("player_id").reset_index(drop=True)
+        self._write(as_of, features, tables, rolling)
+        return features
+
+    def get(self, as_of, tables, rolling=False):
+        return self.update(as_of, tables, rolling)
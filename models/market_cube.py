@@ -0,0 +1,195 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from models.snapshot import write_feather_atomic, write_json_atomic
+
+CUBE_FILE = "market_cube.feather"
+MANIFEST_FILE = "manifest.json"
+# Bump when the cube definition changes so stored cubes are rebuilt
+CUBE_FORMAT = 1
+
+# Transfer columns the cube is built from; transfer_season is optional
+SOURCE_COLUMNS = ["player_id", "transfer_date", "transfer_season", "from_club_id", "to_club_id", "transfer_fee"]
+
+KEY_COLUMNS = ["domestic_competition_id", "season", "window"]
+CUBE_COLUMNS = KEY_COLUMNS + [
+    "season_start", "total_bought", "total_sold", "net_spending",
+    "n_bought", "n_sold", "n_clubs", "avg_spending_per_club",
+]
+
+# Transfer windows by month; anything else is an out-of-window move
+WINDOW_MONTHS = {6: "summer", 7: "summer", 8: "summer", 9: "summer", 1: "winter", 2: "winter"}
+
+
+def _season_start(transfers):
+    # "23/24" -> 2023; seasons start in July when only the date is known, 0 when neither is
+    dates = pd.to_datetime(transfers["transfer_date"], errors="coerce")
+    start = dates.dt.year - (dates.dt.month < 7)
+    if "transfer_season" in transfers:
+        first = pd.to_numeric(transfers["transfer_season"].astype(str).str[:2], errors="coerce")
+        start = (first + np.where(first < 70, 2000, 1900)).fillna(start)
+    return start.fillna(0).astype("int64")
+
+
+def _season_label(start):
+    return start.map(lambda year: f"{year % 100:02d}/{(year + 1) % 100:02d}" if year else "unknown")
+
+
+def build_cube(transfers, clubs):
+    """League x season x window market totals in one grouped pass.
+
+    Each transfer is counted as bought in the league of the destination
+    club and as sold in the league of the origin club; clubs not in the
+    clubs table have no league and are left out, like in market_trends.csv.
+    """
+    league = clubs.drop_duplicates("club_id").set_index("club_id")["domestic_competition_id"]
+    fee = transfers["transfer_fee"].fillna(0).to_numpy(dtype=float)
+    season_start = _season_start(transfers).to_numpy()
+    month = pd.to_datetime(transfers["transfer_date"], errors="coerce").dt.month
+    window = month.map(WINDOW_MONTHS).fillna("other").to_numpy()
+
+    # One row per (transfer, side): bought on the to-club league, sold on the from-club league
+    sides = pd.DataFrame({
+        "domestic_competition_id": np.concatenate([
+            transfers["to_club_id"].map(league).to_numpy(), transfers["from_club_id"].map(league).to_numpy()
+        ]),
+        "season_start": np.concatenate([season_start, season_start]),
+        "window": np.concatenate([window, window]),
+        "bought": np.concatenate([fee, np.zeros(len(fee))]),
+        "sold": np.concatenate([np.zeros(len(fee)), fee]),
+        "n_bought": np.repeat([1, 0], len(fee)),
+        "n_sold": np.repeat([0, 1], len(fee)),
+    })
+    cube = sides.groupby(["domestic_competition_id", "season_start", "window"]).agg(
+        total_bought=("bought", "sum"),
+        total_sold=("sold", "sum"),
+        n_bought=("n_bought", "sum"),
+        n_sold=("n_sold", "sum"),
+    ).reset_index()
+    cube["season"] = _season_label(cube["season_start"])
+    return _with_club_counts(cube, clubs)
+
+
+def _with_club_counts(cube, clubs):
+    cube["net_spending"] = cube["total_bought"] - cube["total_sold"]
+    n_clubs = clubs.groupby("domestic_competition_id", observed=True)["club_id"].nunique()
+    cube["n_clubs"] = cube["domestic_competition_id"].map(n_clubs)
+    cube["avg_spending_per_club"] = cube["total_bought"] / cube["n_clubs"]
+    return cube.sort_values(["domestic_competition_id", "season_start", "window"]).reset_index(drop=True)[CUBE_COLUMNS]
+
+
+def league_totals(cube):
+    """All-time bought and sold per league, summed over the cube."""
+    return cube.groupby("domestic_competition_id", observed=True)[["total_bought", "total_sold"]].sum()
+
+
+def recent_trends(cube, league=None, seasons=3, window=None):
+    """Cube rows of the last `seasons` seasons in the cube, newest first."""
+    if cube.empty:
+        return cube
+    rows = cube[cube["season_start"] > cube["season_start"].max() - seasons]
+    if league is not None:
+        rows = rows[rows["domestic_competition_id"] == league]
+    if window is not None:
+        rows = rows[rows["window"] == window]
+    return rows.sort_values(["season_start", "domestic_competition_id", "window"], ascending=[False, True, True])
+
+
+def _canonical(df):
+    # The same values in one dtype per column, so that tables read from the CSVs
+    # and the compacted ones of the backend hash alike
+    columns = {}
+    for name, column in df.items():
+        if name.endswith("date"):
+            columns[name] = pd.to_datetime(column, errors="coerce").astype("datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            columns[name] = column.astype("float64")
+        else:
+            columns[name] = column.astype("string")
+    return pd.DataFrame(columns)
+
+
+def _hash(df):
+    return str(int(pd.util.hash_pandas_object(_canonical(df), index=False).sum() % (1 << 62)))
+
+
+def _clubs_hash(clubs):
+    return _hash(clubs[["club_id", "domestic_competition_id"]])
+
+
+def _prefix_hash(transfers, rows):
+    # Fingerprint of every column the cube reads in the first `rows` transfers,
+    # to detect non-append changes
+    columns = [column for column in SOURCE_COLUMNS if column in transfers]
+    return _hash(transfers[columns].iloc[:rows])
+
+
+class MarketCube:
+    """The market cube materialized to one Feather file.
+
+    The manifest records how many transfer rows the cube covers. When the
+    transfers table only grew, update() re-aggregates the seasons touched
+    by the new rows and keeps every other season as stored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read_manifest(self):
+        manifest_file = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file) as f:
+            return json.load(f)
+
+    def _write(self, cube, transfers, clubs):
+        os.makedirs(self.path, exist_ok=True)
+        # Each file is replaced whole, as worker processes may be reading it
+        write_feather_atomic(cube, os.path.join(self.path, CUBE_FILE))
+        write_json_atomic({
+            "format": CUBE_FORMAT,
+            "transfer_rows": len(transfers),
+            "prefix_hash": _prefix_hash(transfers, len(transfers)),
+            "clubs_hash": _clubs_hash(clubs),
+            "seasons": sorted(cube["season"].unique().tolist()),
+        }, os.path.join(self.path, MANIFEST_FILE))
+
+    def load(self):
+        cube_file = os.path.join(self.path, CUBE_FILE)
+        if not os.path.exists(cube_file):
+            return None
+        return feather.read_feather(cube_file)
+
+    def build(self, transfers, clubs):
+        cube = build_cube(transfers, clubs)
+        self._write(cube, transfers, clubs)
+        return cube
+
+    def update(self, transfers, clubs):
+        """Brings the stored cube up to date with transfers and clubs."""
+        manifest = self._read_manifest()
+        stored = self.load()
+        if (
+            stored is None or manifest is None or manifest.get("format") != CUBE_FORMAT
+            or manifest["transfer_rows"] > len(transfers) or manifest["clubs_hash"] != _clubs_hash(clubs)
+            or manifest["prefix_hash"] != _prefix_hash(transfers, manifest["transfer_rows"])
+        ):
+            return self.build(transfers, clubs)
+        if manifest["transfer_rows"] == len(transfers):
+            return stored
+
+        # Re-aggregate only the seasons that received rows
+        season_start = _season_start(transfers)
+        touched = season_start.iloc[manifest["transfer_rows"]:].unique()
+        rebuilt = build_cube(transfers[season_start.isin(touched)], clubs)
+        cube = pd.concat([stored[~stored["season_start"].isin(touched)], rebuilt])
+        cube = _with_club_counts(cube, clubs)
+        self._write(cube, transfers, clubs)
+        return cube
+
+    def get(self, transfers, clubs):
+        return self.update(transfers, clubs)
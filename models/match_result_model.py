@@ -1,27 +1,80 @@
 import numpy as np
+import pandas as pd
 
+from models.team_strength import outcome_probabilities, score_distribution
 
-def predict_match_result(home_team, away_team, club_games_df, games_df):
-    home_stats = club_games_df[club_games_df["club_id"] == home_team]
-    away_stats = club_games_df[club_games_df["club_id"] == away_team]
 
-    if home_stats.empty or away_stats.empty:
-        return {"error": "Times não encontrados."}
+def _match_results(fixtures, strengths):
+    # Closed-form Poisson outcome for every fixture, from one table lookup per club
+    home_ids = [home_team for home_team, _ in fixtures]
+    away_ids = [away_team for _, away_team in fixtures]
+    home_goals, away_goals = strengths.expected_goals(home_ids, away_ids)
+    home_win_prob, draw_prob, away_win_prob = outcome_probabilities(score_distribution(home_goals, away_goals))
 
-    avg_home_goals = home_stats["own_goals"].mean()
-    avg_away_goals = away_stats["own_goals"].mean()
+    results = []
+    for i, (home_team, away_team) in enumerate(fixtures):
+        if home_team not in strengths or away_team not in strengths:
+            results.append({"error": "Times não encontrados."})
+            continue
+        results.append({
+            "home_team": home_team,
+            "away_team": away_team,
+            "predicted_score": f"{round(home_goals[i])} - {round(away_goals[i])}",
+            "expected_goals": {"home": round(float(home_goals[i]), 2), "away": round(float(away_goals[i]), 2)},
+            "win_probability": {
+                "home": round(float(home_win_prob[i]) * 100, 2),
+                "draw": round(float(draw_prob[i]) * 100, 2),
+                "away": round(float(away_win_prob[i]) * 100, 2),
+            }
+        })
+    return results
 
-    home_win_prob = np.random.uniform(0.3, 0.7)  # Probability Simulation
-    draw_prob = 1 - home_win_prob - np.random.uniform(0.1, 0.3)
-    away_win_prob = 1 - home_win_prob - draw_prob
 
-    return {
-        "home_team": home_team,
-        "away_team": away_team,
-        "predicted_score": f"{round(avg_home_goals)} - {round(avg_away_goals)}",
-        "win_probability": {
-            "home": round(home_win_prob * 100, 2),
-            "draw": round(draw_prob * 100, 2),
-            "away": round(away_win_prob * 100, 2),
-        }
-    }
+def predict_match_result(home_team, away_team, strengths):
+    return _match_results([(home_team, away_team)], strengths)[0]
+
+
+def predict_match_result_batch(fixtures, strengths):
+    """predict_match_result for a list of (home_team, away_team) pairs, in input order."""
+    return _match_results(list(fixtures), strengths)
+
+
+def simulate_season(club_ids, strengths, n_sims=1000, seed=None):
+    """Simulates a double round-robin season between club_ids n_sims times.
+
+    Every fixture's score in every simulation comes from one vectorized
+    Poisson draw; returns expected points, goal difference,
+    mean final position and title probability per club, best first.
+    """
+    club_ids = list(dict.fromkeys(club_ids))
+    n_clubs = len(club_ids)
+    home, away = np.nonzero(~np.eye(n_clubs, dtype=bool))
+    home_goals, away_goals = strengths.expected_goals([club_ids[i] for i in home], [club_ids[i] for i in away])
+
+    rng = np.random.default_rng(seed)
+    scored_home = rng.poisson(home_goals, size=(n_sims, len(home)))
+    scored_away = rng.poisson(away_goals, size=(n_sims, len(away)))
+    home_points = np.where(scored_home > scored_away, 3, np.where(scored_home == scored_away, 1, 0))
+    away_points = np.where(scored_away > scored_home, 3, np.where(scored_home == scored_away, 1, 0))
+
+    # Fixture -> club incidence, so season totals are two matrix products
+    home_of = np.zeros((len(home), n_clubs))
+    home_of[np.arange(len(home)), home] = 1
+    away_of = np.zeros((len(away), n_clubs))
+    away_of[np.arange(len(away)), away] = 1
+    points = home_points @ home_of + away_points @ away_of
+    goal_difference = (scored_home - scored_away) @ home_of + (scored_away - scored_home) @ away_of
+
+    # Points, then goal difference, then a random draw
+    order = points * 10_000 + goal_difference + rng.random(points.shape)
+    position = (-order).argsort(axis=1).argsort(axis=1) + 1
+
+    table = pd.DataFrame({
+        "club_id": club_ids,
+        "known": [club_id in strengths for club_id in club_ids],
+        "expected_points": points.mean(axis=0),
+        "expected_goal_difference": goal_difference.mean(axis=0),
+        "mean_position": position.mean(axis=0),
+        "title_probability": (position == 1).mean(axis=0),
+    })
+    return table.sort_values(["mean_position", "club_id"], ignore_index=True)
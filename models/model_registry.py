@@ -0,0 +1,242 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import joblib
+import numpy as np
+
+from models.artifacts import has_native, load_model
+
+# Saved artifacts served by the backend, with the preprocessor and label
+# encoder each model was trained with
+MODEL_SPECS = {
+    "transfer": {
+        "model": "xgb_transfer_model.pkl",
+        "preprocessor": "preprocessor.pkl",
+    },
+    "destination": {
+        "model": "xgb_club_prediction_model.pkl",
+        "preprocessor": "club_preprocessor.pkl",
+        "label_encoder": "club_label_encoder.pkl",
+    },
+}
+
+# Feature store columns under the names the models were trained with
+FEATURE_RENAMES = {
+    "goals_last_6m": "goals",
+    "assists_last_6m": "assists",
+    "minutes_last_6m": "minutes_played",
+    "matches_last_6m": "matches",
+}
+
+
+def _output_width(preprocessor):
+    # Columns produced by a fitted ColumnTransformer of scalers and one-hot encoders
+    width = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder" or transformer == "drop":
+            continue
+        categories = getattr(transformer, "categories_", None)
+        width += len(columns) if categories is None else sum(len(c) for c in categories)
+    return width
+
+
+def validate(name, artifacts):
+    """Raise ValueError when the artifacts of one model do not fit together."""
+    model = artifacts["model"]
+    preprocessor = artifacts["preprocessor"]
+    width = _output_width(preprocessor)
+    if width != model.n_features_in_:
+        raise ValueError(f"{name}: preprocessor yields {width} features, model expects {model.n_features_in_}")
+    encoder = artifacts.get("label_encoder")
+    if encoder is not None and len(encoder.classes_) != len(model.classes_):
+        raise ValueError(f"{name}: label encoder has {len(encoder.classes_)} classes, model has {len(model.classes_)}")
+
+
+class ModelRegistry:
+    """Saved models loaded once and shared by every request.
+
+    Models are loaded on first use, or all at once with load_all() at
+    startup, from their native export when there is one and from the
+    pickles otherwise. Each model is validated against its preprocessor and
+    label encoder when it is loaded.
+    """
+
+    def __init__(self, model_path, specs=MODEL_SPECS, native=True):
+        self.model_path = model_path
+        self.specs = specs
+        self.native = native
+        self.models = {}
+        self.formats = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        artifacts = self.models.get(name)
+        if artifacts is not None:
+            return artifacts
+        with self._lock:
+            if name not in self.models:
+                if self.native and has_native(self.model_path, name):
+                    artifacts = load_model(self.model_path, name)
+                    self.formats[name] = "native"
+                else:
+                    artifacts = {
+                        role: joblib.load(os.path.join(self.model_path, file))
+                        for role, file in self.specs[name].items()
+                    }
+                    artifacts["features"] = list(artifacts["preprocessor"].feature_names_in_)
+                    self.formats[name] = "joblib"
+                validate(name, artifacts)
+                self.models[name] = artifacts
+        return self.models[name]
+
+    def load_all(self):
+        for name in self.specs:
+            try:
+                self.get(name)
+            except (OSError, ValueError) as e:
+                self.errors[name] = str(e)
+        return self
+
+    def status(self):
+        return {
+            name: {
+                "loaded": name in self.models,
+                "format": self.formats.get(name),
+                "error": self.errors.get(name),
+                "files": self.specs[name],
+            }
+            for name in self.specs
+        }
+
+
+def model_inputs(features, player_ids, columns):
+    # Model input rows for player_ids from the feature store table indexed by player_id
+    rows = features.reindex(player_ids).rename(columns=FEATURE_RENAMES)
+    return rows[columns]
+
+
+def predict_transfer_probability(registry, features, player_ids):
+    """Probability of a transfer per player, from the XGBoost transfer model."""
+    artifacts = registry.get("transfer")
+    X = artifacts["preprocessor"].transform(model_inputs(features, player_ids, artifacts["features"]))
+    return artifacts["model"].predict_proba(X)[:, 1]
+
+
+def predict_destination_clubs(registry, features, player_ids, top=5):
+    """Top destination club ids and their probabilities per player."""
+    artifacts = registry.get("destination")
+    X = artifacts["preprocessor"].transform(model_inputs(features, player_ids, artifacts["features"]))
+    proba = artifacts["model"].predict_proba(X)
+    clubs = artifacts["label_encoder"].inverse_transform(artifacts["model"].classes_)
+    best = np.argsort(-proba, axis=1, kind="stable")[:, :top]
+    return [
+        [(clubs[j].item(), float(proba[i, j])) for j in best[i]]
+        for i in range(len(player_ids))
+    ]
+
+
+class MicroBatcher:
+    """Collects concurrent submissions into one call of `fn`.
+
+    `fn` takes a list of items and returns one result per item. A worker
+    thread waits up to `max_wait` seconds after the first pending item for
+    more to arrive, then serves at most `max_batch_size` of them at once, so
+    one predict_proba call answers many requests. When a batch fails, its
+    items are retried one at a time, so a bad item only fails its own request.
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_wait=0.005):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._run_each(batch)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run_each(self, batch):
+        for item, future in batch:
+            try:
+                result = self.fn([item])[0]
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += 1
+            future.set_result(result)
+
+
+def _is_player_id(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def model_transfer_results(registry, features, player_ids, club_names, top=5):
+    """Model-based transfer probability and likely destinations, in input order.
+
+    Both models score all known players of the batch with one
+    predict_proba call each; ids that are not numbers get an error of their own.
+    """
+    valid = [_is_player_id(player_id) for player_id in player_ids]
+    known = [
+        player_id for player_id in dict.fromkeys(p for p, ok in zip(player_ids, valid) if ok)
+        if player_id in features.index
+    ]
+    results = {}
+    if known:
+        probabilities = predict_transfer_probability(registry, features, known)
+        destinations = predict_destination_clubs(registry, features, known, top)
+        for player_id, prob, clubs in zip(known, probabilities, destinations):
+            results[player_id] = {
+                "player_id": int(player_id),
+                "transfer_probability": round(float(prob) * 100, 2),
+                "likely_destinations": {
+                    club_names.get(club_id, str(club_id)): round(p * 100, 2) for club_id, p in clubs
+                },
+            }
+    return [
+        results.get(player_id, {"error": "Player not found."}) if ok else {"error": "invalid player_id"}
+        for player_id, ok in zip(player_ids, valid)
+    ]
@@ -1,15 +1,75 @@
 import numpy as np
 
-def predict_performance(player_id, appearances_df):
-    player_data = appearances_df[appearances_df["player_id"] == player_id]
+from models.instrumentation import stage
+from models.player_form import FORM_STATS
+from models.row_index import lookup, lookup_many
+
+# Windows accepted by predict_performance; each narrows the appearances the form is averaged over
+FORM_WINDOWS = ["last_games", "last_days", "season"]
+
+def _rounded(means):
+    # + 0.0 turns the -0.0 of a rounded tiny negative into 0.0
+    return {stat: None if mean is None else round(mean, 2) + 0.0 for stat, mean in means.items()}
+
+def player_form(form, player_id, window):
+    """Recent form of a player from the PlayerForm cumulative sums.
+
+    Means of every stat over the appearances in all the given windows
+    (last_games, last_days, season), their difference to the career means
+    as the trend, and with a halflife the exponentially weighted means up
+    to the last game.
+    """
+    career = form.career(player_id)
+    result = {"window": {key: window[key] for key in FORM_WINDOWS if window.get(key) is not None}}
+    lo, hi = form.window(player_id, **result["window"])
+    means = form.means(lo, hi)
+    result.update({
+        "games": hi - lo,
+        "from": form.date(lo) if hi > lo else None,
+        "to": form.date(hi - 1) if hi > lo else None,
+        "means": _rounded(means),
+        "trend": _rounded({
+            stat: None if means[stat] is None or career[stat] is None else means[stat] - career[stat]
+            for stat in FORM_STATS
+        }),
+    })
+    if window.get("halflife") is not None:
+        result["ewm"] = {"halflife": window["halflife"], **_rounded(form.ewm(player_id, window["halflife"]))}
+    return result
+
+def predict_performance(player_id, appearances_df, indexes=None, form=None, window=None):
+    """Career means of goals, assists and cards per game.
+
+    With a PlayerForm the means come from its cumulative sums instead of
+    the player's rows, and a window adds the player's recent form.
+    """
+    if form is not None:
+        with stage("predict_performance.form"):
+            if player_id not in form:
+                return {"error": "Jogador não encontrado."}
+            career = _rounded(form.career(player_id))
+            result = {
+                "player_id": player_id,
+                "predicted_goals": career["goals"],
+                "predicted_assists": career["assists"],
+                "predicted_yellow_cards": career["yellow_cards"],
+                "predicted_red_cards": career["red_cards"],
+            }
+            if window:
+                result["form"] = player_form(form, player_id, window)
+        return result
+
+    with stage("predict_performance.lookup"):
+        player_data = lookup(indexes, "appearances", appearances_df, "player_id", player_id)
 
     if player_data.empty:
         return {"error": "Jogador não encontrado."}
 
-    avg_goals = player_data["goals"].mean()
-    avg_assists = player_data["assists"].mean()
-    avg_yellow_cards = player_data["yellow_cards"].mean()
-    avg_red_cards = player_data["red_cards"].mean()
+    with stage("predict_performance.averages"):
+        avg_goals = player_data["goals"].mean()
+        avg_assists = player_data["assists"].mean()
+        avg_yellow_cards = player_data["yellow_cards"].mean()
+        avg_red_cards = player_data["red_cards"].mean()
 
     return {
         "player_id": player_id,
@@ -18,3 +78,25 @@ def predict_performance(player_id, appearances_df):
         "predicted_yellow_cards": round(avg_yellow_cards, 2),
         "predicted_red_cards": round(avg_red_cards, 2),
     }
+
+
+def predict_performance_batch(player_ids, appearances_df, indexes=None):
+    """predict_performance for many players in one grouped pass, in input order."""
+    keys = list(dict.fromkeys(player_ids))
+    player_data = lookup_many(indexes, "appearances", appearances_df, "player_id", keys)
+    means = player_data.groupby("player_id")[["goals", "assists", "yellow_cards", "red_cards"]].mean()
+
+    results = []
+    for player_id in player_ids:
+        if player_id not in means.index:
+            results.append({"error": "Jogador não encontrado."})
+            continue
+        avg_goals, avg_assists, avg_yellow_cards, avg_red_cards = means.loc[player_id]
+        results.append({
+            "player_id": player_id,
+            "predicted_goals": round(avg_goals, 2),
+            "predicted_assists": round(avg_assists, 2),
+            "predicted_yellow_cards": round(avg_yellow_cards, 2),
+            "predicted_red_cards": round(avg_red_cards, 2),
+        })
+    return results
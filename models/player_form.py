@@ -0,0 +1,144 @@
+import threading
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Per-appearance stats summed by the form windows
+FORM_STATS = ["goals", "assists", "yellow_cards", "red_cards", "minutes_played"]
+# Seasons start on this month and day, as in the transfer windows
+SEASON_START = (7, 1)
+# Exponentially weighted form per half-life kept at once
+MAX_HALFLIVES = 16
+
+
+def season_bounds(season):
+    """First and last day + 1 of the season starting in year `season`, as datetime64[D]."""
+    month, day = SEASON_START
+    start = np.datetime64(f"{season:04d}-{month:02d}-{day:02d}", "D")
+    return start, np.datetime64(f"{season + 1:04d}-{month:02d}-{day:02d}", "D")
+
+
+class PlayerForm:
+    """Cumulative sums of each player's stats over their appearances by date.
+
+    Appearances are sorted by player and date once; a player's rows are
+    one run, and the totals over any run of consecutive appearances are
+    the difference of two cumulative sums. The last N games are found by
+    subtraction, a date range (last N days, a season) by a binary search
+    within the player's run. Missing values count neither in the sums nor
+    in the number of games averaged over.
+    """
+
+    def __init__(self, appearances_df, order=None):
+        # order: row positions grouped by player in table order, as kept by the
+        # appearances KeyIndex; only re-sorted when a player's dates are not
+        player_ids = appearances_df["player_id"].to_numpy()
+        dates = appearances_df["date"].to_numpy().astype("datetime64[D]")
+        if order is None:
+            order = np.argsort(player_ids, kind="stable")
+        player_ids = player_ids[order]
+        dates = dates[order]
+        if ((dates[1:] < dates[:-1]) & (player_ids[1:] == player_ids[:-1])).any():
+            by_date = np.lexsort((dates, player_ids))
+            order, player_ids, dates = order[by_date], player_ids[by_date], dates[by_date]
+        self._df = appearances_df
+        self._order = order
+        # Days since 1970 as int32, missing dates first
+        self.days = np.where(np.isnat(dates), np.iinfo(np.int32).min, dates.astype(np.int64)).astype(np.int32)
+        # Form windows in days end at the latest appearance of the dataset
+        self.as_of = int(self.days.max()) if len(self.days) and self.days.max() > np.iinfo(np.int32).min else None
+
+        first = np.ones(len(player_ids), dtype=bool)
+        first[1:] = player_ids[1:] != player_ids[:-1]
+        self.starts = np.flatnonzero(first)
+        self.ends = np.append(self.starts[1:], len(player_ids))
+        self.slots = {player_id: i for i, player_id in enumerate(player_ids[self.starts].tolist())}
+
+        # Leading zero: the totals of rows [lo, hi) are sums[hi] - sums[lo].
+        # Integer stats are summed exactly in the narrowest integer type that
+        # holds their total; float stats count their known values alongside
+        self.sums = {}
+        self.counts = {}
+        for stat in FORM_STATS:
+            values = appearances_df[stat].to_numpy()[order]
+            if values.dtype.kind in "iub":
+                sums = np.cumsum(values, dtype=np.int64)
+                if not len(sums) or np.iinfo(np.int32).min <= sums.min() and sums.max() <= np.iinfo(np.int32).max:
+                    sums = sums.astype(np.int32)
+                self.counts[stat] = None
+            else:
+                values = values.astype(float)
+                known = ~np.isnan(values)
+                sums = np.cumsum(np.where(known, values, 0.0))
+                self.counts[stat] = np.concatenate([[0], np.cumsum(known, dtype=np.int32)])
+            self.sums[stat] = np.concatenate([np.zeros(1, dtype=sums.dtype), sums])
+        self._ewm = {}
+        self._lock = threading.Lock()
+
+    def _values(self, stat):
+        # The stat in player and date order, missing values as 0
+        return np.nan_to_num(self._df[stat].to_numpy(dtype=float)[self._order])
+
+    def __contains__(self, player_id):
+        return player_id in self.slots
+
+    def window(self, player_id, last_games=None, last_days=None, season=None):
+        """Row range [lo, hi) of the player's appearances in every given window."""
+        slot = self.slots[player_id]
+        lo, hi = self.starts[slot], self.ends[slot]
+        if season is not None:
+            first_day, end_day = (day.astype(np.int64) for day in season_bounds(season))
+            days = self.days[lo:hi]
+            lo, hi = lo + np.searchsorted(days, first_day), lo + np.searchsorted(days, end_day)
+        if last_days is not None and self.as_of is not None:
+            lo = max(lo, self.starts[slot] + np.searchsorted(self.days[self.starts[slot]:hi], self.as_of - (last_days - 1)))
+        if last_games is not None:
+            lo = max(lo, hi - last_games)
+        return int(lo), int(max(lo, hi))
+
+    def means(self, lo, hi):
+        """Mean of each stat over rows [lo, hi), None without known values."""
+        means = {}
+        for stat in FORM_STATS:
+            counts = self.counts[stat]
+            count = hi - lo if counts is None else counts[hi] - counts[lo]
+            means[stat] = float(self.sums[stat][hi] - self.sums[stat][lo]) / count if count else None
+        return means
+
+    def date(self, row):
+        """Date of appearance row as YYYY-MM-DD, None when missing."""
+        day = self.days[row]
+        return None if day == np.iinfo(np.int32).min else str(np.datetime64(int(day), "D"))
+
+    def career(self, player_id):
+        slot = self.slots[player_id]
+        return self.means(self.starts[slot], self.ends[slot])
+
+    def _ewm_table(self, halflife):
+        # Exponentially weighted mean of each stat at every player's last appearance
+        with self._lock:
+            table = self._ewm.get(halflife)
+            if table is None:
+                decay = 0.5 ** (1 / halflife)
+                lengths = self.ends - self.starts
+                carried = decay ** lengths
+                table = {}
+                for stat in FORM_STATS:
+                    # One filter over all players; what it carries over from the
+                    # previous player decays with the length of the run and is removed
+                    smoothed = lfilter([1 - decay], [1, -decay], self._values(stat))
+                    before = np.where(self.starts > 0, smoothed[self.starts - 1], 0.0)
+                    table[stat] = (smoothed[self.ends - 1] - carried * before) / (1 - carried)
+                self._ewm[halflife] = table
+                if len(self._ewm) > MAX_HALFLIVES:
+                    self._ewm.pop(next(iter(self._ewm)))
+        return table
+
+    def ewm(self, player_id, halflife):
+        """Mean of each stat weighted by 0.5 ** (games since / halflife), up to the last game.
+
+        Computed once per half-life for every player, then a lookup; missing
+        values count as 0 here.
+        """
+        slot = self.slots[player_id]
+        return {stat: float(values[slot]) for stat, values in self._ewm_table(halflife).items()}
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+# Rolling rating state written by games_ratings.py, relative to the data path
+RATINGS_STATE_DIR = "ratings_state"
+STATE_FORMAT = 1
+
+
+class RatingState:
+    """What games_ratings.py needs to rate new events without the history.
+
+    windows: per player, the last scored events with a date (enough for one
+    rolling window) and every event without a date, which sorts after all
+    dated ones. latest: the newest rating of each player. The high-water
+    mark is the latest event date processed and the ids of events on it;
+    events without a date are remembered by id.
+    """
+
+    def __init__(self, windows, latest, hwm_date, hwm_ids, nat_ids, meta=None):
+        self.windows = windows
+        self.latest = latest
+        self.hwm_date = hwm_date
+        self.hwm_ids = set(hwm_ids)
+        self.nat_ids = set(nat_ids)
+        self.meta = meta or {}
+
+    @staticmethod
+    def path(data_path):
+        return os.path.join(data_path, RATINGS_STATE_DIR)
+
+    def save(self, data_path):
+        path = self.path(data_path)
+        os.makedirs(path, exist_ok=True)
+        feather.write_feather(self.windows.reset_index(drop=True), os.path.join(path, "windows.feather"))
+        feather.write_feather(self.latest.reset_index(drop=True), os.path.join(path, "latest.feather"))
+        manifest = {
+            **self.meta,
+            "format": STATE_FORMAT,
+            "hwm_date": None if pd.isna(self.hwm_date) else self.hwm_date.isoformat(),
+            "hwm_ids": sorted(self.hwm_ids),
+            "nat_ids": sorted(self.nat_ids),
+        }
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, data_path):
+        path = cls.path(data_path)
+        manifest_file = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != STATE_FORMAT:
+            return None
+        windows = feather.read_feather(os.path.join(path, "windows.feather"))
+        latest = feather.read_feather(os.path.join(path, "latest.feather"))
+        hwm_date = manifest.pop("hwm_date")
+        hwm_date = pd.Timestamp(hwm_date) if hwm_date else pd.NaT
+        return cls(windows, latest, hwm_date, manifest.pop("hwm_ids"), manifest.pop("nat_ids"), manifest)
+
+
+def load_player_ratings(data_path):
+    """Latest rolling rating and its date per player, indexed by player_id.
+
+    Reads one small Feather file; None when games_ratings.py has not run.
+    """
+    latest_file = os.path.join(RatingState.path(data_path), "latest.feather")
+    if not os.path.exists(latest_file):
+        return None
+    return feather.read_feather(latest_file).set_index("player_id")
@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+import numpy as np
+from unidecode import unidecode
+
+from models.instrumentation import stage
+
+# Weights of the search ranking; a lower relevance score ranks first
+DEFAULT_RANKING = {"age": 1.0, "market_value": 0.0, "current_club": 0.0}
+TARGET_AGE = 25
+MAX_GRAM = 3
+
+
+def normalize_name(text):
+    return unidecode(str(text).lower())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _substring_distance(pattern, text):
+    # Smallest edit distance between pattern and any substring of text (Sellers)
+    prev = list(range(len(pattern) + 1))
+    best = prev[-1]
+    for ch in text:
+        cur = [0]
+        for i, p in enumerate(pattern, 1):
+            cur.append(min(prev[i - 1] + (p != ch), prev[i] + 1, cur[i - 1] + 1))
+        best = min(best, cur[-1])
+        prev = cur
+    return best
+
+
+class PlayerSearchIndex:
+    """N-gram inverted index over normalized player names.
+
+    Players are numbered in default-ranking order (closest to TARGET_AGE
+    first), so every posting list is already sorted by rank and a search
+    with the default ranking stops after the first `limit` verified hits.
+    Names are indexed with a leading space, which makes " jo" a token
+    prefix query on the same postings.
+    """
+
+    def __init__(self, players, max_distance=2):
+        players = players[players["age"].notnull()]
+        order = np.argsort(np.abs(players["age"].to_numpy() - TARGET_AGE), kind="stable")
+        self.players = players.iloc[order]
+        self.max_distance = max_distance
+
+        self.names = [" " + name for name in self.players["name_norm"].astype(str)]
+        self.age = self.players["age"].to_numpy(dtype=float)
+        market_value = self.players.get("market_value_in_eur")
+        self.market_value = np.zeros(len(self.names)) if market_value is None else market_value.fillna(0).to_numpy(dtype=float)
+        self.club = self.players["current_club_name"].astype(str).to_numpy()
+
+        postings = defaultdict(list)
+        for doc, name in enumerate(self.names):
+            for n in range(1, MAX_GRAM + 1):
+                for gram in _grams(name, n):
+                    postings[gram].append(doc)
+        self.postings = {gram: np.array(docs, dtype=np.int32) for gram, docs in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _scores(self, docs, ranking, club):
+        scores = ranking["age"] * np.abs(self.age[docs] - TARGET_AGE)
+        scores = scores - ranking["market_value"] * np.log10(1 + self.market_value[docs])
+        if club:
+            scores = scores - ranking["current_club"] * (self.club[docs] == club)
+        return scores
+
+    def _rank(self, docs, ranking, club):
+        if not len(docs) or ranking == DEFAULT_RANKING:
+            return docs
+        return docs[np.argsort(self._scores(docs, ranking, club), kind="stable")]
+
+    def _substring_matches(self, pattern, limit=None):
+        if not pattern.strip():
+            docs = np.arange(len(self.names), dtype=np.int32)
+            return docs if limit is None else docs[:limit]
+
+        n = min(len(pattern), MAX_GRAM)
+        lists = [self.postings.get(gram) for gram in _grams(pattern, n)]
+        if any(docs is None for docs in lists):
+            return np.array([], dtype=np.int32)
+        candidates = min(lists, key=len)
+        if len(pattern) <= MAX_GRAM:
+            return candidates if limit is None else candidates[:limit]
+
+        found = []
+        for doc in candidates:
+            if pattern in self.names[doc]:
+                found.append(doc)
+                if limit is not None and len(found) == limit:
+                    break
+        return np.array(found, dtype=np.int32)
+
+    def _fuzzy_matches(self, pattern, exclude, needed, max_candidates=300):
+        max_distance = 1 if len(pattern) <= 4 else self.max_distance
+        # Short queries share too few trigrams with their typos, use bigrams
+        n = MAX_GRAM if len(pattern) > 6 else 2
+        grams = _grams(pattern, n)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return np.array([], dtype=np.int32)
+
+        # q-gram lemma: each edit destroys at most n grams of the query
+        docs, shared = np.unique(np.concatenate(lists), return_counts=True)
+        keep = shared >= max(1, len(grams) - n * max_distance)
+        docs, shared = docs[keep], shared[keep]
+        # Most shared grams first, rank order among equals
+        docs = docs[np.argsort(-shared, kind="stable")][:max_candidates]
+
+        matches = []
+        for doc in docs:
+            if doc in exclude:
+                continue
+            distance = _substring_distance(pattern, self.names[doc])
+            if distance <= max_distance:
+                matches.append((distance, len(matches), doc))
+                if len(matches) == needed:
+                    break
+        matches.sort()
+        return np.array([doc for _, _, doc in matches], dtype=np.int32)
+
+    def search(self, query, limit=10, fuzzy=True, ranking=None, club=None):
+        """Players whose name contains query, best ranked first.
+
+        When fewer than `limit` names contain the query, the rest is filled
+        with names within a small edit distance of it.
+        """
+        ranking = {**DEFAULT_RANKING, **(ranking or {})}
+        pattern = normalize_name(query)
+        default = ranking == DEFAULT_RANKING
+
+        with stage("search.substring"):
+            docs = self._substring_matches(pattern, limit if default else None)
+        with stage("search.rank"):
+            docs = self._rank(docs, ranking, club)[:limit]
+        if fuzzy and len(docs) < limit and len(pattern.strip()) >= 2:
+            with stage("search.fuzzy"):
+                fuzzy_docs = self._fuzzy_matches(pattern.strip(), set(docs.tolist()), limit - len(docs))
+            docs = np.concatenate([docs, fuzzy_docs])
+
+        with stage("search.rows"):
+            matched = self.players.iloc[docs].copy()
+            if default:
+                matched["relevance_score"] = abs(matched["age"] - TARGET_AGE)
+            else:
+                matched["relevance_score"] = self._scores(docs, ranking, club)
+        return matched
+
+    def autocomplete(self, prefix, limit=10, ranking=None, club=None):
+        """Players with a name token starting with prefix."""
+        ranking = {**DEFAULT_RANKING, **(ranking or {})}
+        pattern = " " + normalize_name(prefix).lstrip()
+        default = ranking == DEFAULT_RANKING
+        docs = self._substring_matches(pattern, limit if default else None)
+        return self.players.iloc[self._rank(docs, ranking, club)[:limit]]
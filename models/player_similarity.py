@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from models.instrumentation import stage
+
+# Numeric features compared and their weight; market value is compared on a
+# log scale, every feature after standardization
+NUMERIC_WEIGHTS = {
+    "age": 1.0,
+    "market_value_in_eur": 1.5,
+    "market_value_growth": 0.5,
+    "goals_per_game": 1.0,
+    "assists_per_game": 1.0,
+    "height_in_cm": 0.5,
+}
+LOG_FEATURES = {"market_value_in_eur"}
+# Standardized values are clipped to this many standard deviations, so that
+# one outlier cannot dominate a distance
+CLIP_SD = 4.0
+# One-hot categories; players of another position are 2 * weight apart
+CATEGORY_WEIGHTS = {"position": 2.0, "foot": 0.5}
+DEFAULT_NEIGHBOURS = 10
+MAX_NEIGHBOURS = 100
+
+
+def _value(value):
+    return None if pd.isna(value) else value
+
+
+class PlayerSimilarityIndex:
+    """Exact nearest neighbours of players in a weighted feature space.
+
+    Each player is a vector of standardized feature-store features (age,
+    log market value, value growth, goals and assists per game, height)
+    and one-hot position and foot, scaled by their weights; missing values
+    sit at the mean. A query is one matrix-vector product over all players,
+    filters are boolean masks over the same rows.
+    """
+
+    def __init__(self, players_df, features):
+        players = players_df.drop_duplicates("player_id").set_index("player_id")
+        self.player_ids = players.index.to_numpy()
+        self.rows = {player_id: i for i, player_id in enumerate(self.player_ids.tolist())}
+        features = features.reindex(self.player_ids)
+
+        columns = []
+        for name, weight in NUMERIC_WEIGHTS.items():
+            values = features[name].to_numpy(dtype=float)
+            if name in LOG_FEATURES:
+                values = np.log1p(np.clip(values, 0, None))
+            known = values[np.isfinite(values)]
+            std = known.std() if len(known) else 0.0
+            z = (values - known.mean()) / std if std > 0 else np.zeros(len(values))
+            columns.append(weight * np.clip(np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0), -CLIP_SD, CLIP_SD))
+        for name, weight in CATEGORY_WEIGHTS.items():
+            codes, categories = pd.factorize(players[name].astype(object))
+            one_hot = np.zeros((len(codes), len(categories)))
+            known = codes >= 0
+            one_hot[np.flatnonzero(known), codes[known]] = weight
+            columns.extend(one_hot.T)
+        self.vectors = np.ascontiguousarray(np.column_stack(columns), dtype=np.float32)
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+        # Shown with each neighbour and used by the filters
+        self.names = players["name"].to_numpy(dtype=object)
+        self.positions = players["position"].to_numpy(dtype=object)
+        self.feet = players["foot"].to_numpy(dtype=object)
+        self.clubs = players["current_club_id"].to_numpy(dtype=float)
+        self.club_names = players["current_club_name"].to_numpy(dtype=object)
+        self.leagues = players["current_club_domestic_competition_id"].to_numpy(dtype=object)
+        self.ages = features["age"].to_numpy(dtype=float)
+        self.market_values = features["market_value_in_eur"].to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    def _mask(self, row, position=None, foot=None, league=None, min_age=None, max_age=None,
+              min_market_value=None, max_market_value=None, other_clubs=False):
+        # Rows that pass every given filter, the queried player excluded
+        mask = np.ones(len(self), dtype=bool)
+        mask[row] = False
+        if position is not None:
+            mask &= self.positions == position
+        if foot is not None:
+            mask &= self.feet == foot
+        if league is not None:
+            mask &= self.leagues == league
+        if min_age is not None:
+            mask &= self.ages >= min_age
+        if max_age is not None:
+            mask &= self.ages <= max_age
+        if min_market_value is not None:
+            mask &= self.market_values >= min_market_value
+        if max_market_value is not None:
+            mask &= self.market_values <= max_market_value
+        if other_clubs and not np.isnan(self.clubs[row]):
+            mask &= self.clubs != self.clubs[row]
+        return mask
+
+    def similar(self, player_id, k=DEFAULT_NEIGHBOURS, **filters):
+        """The k players closest to player_id passing the filters, closest first.
+
+        None when the player is unknown. Ties are broken by player order.
+        """
+        row = self.rows.get(player_id)
+        if row is None:
+            return None
+        with stage("similar_players.search"):
+            query = self.vectors[row]
+            distances = self.norms - 2 * (self.vectors @ query) + self.norms[row]
+            candidates = np.flatnonzero(self._mask(row, **filters))
+            if len(candidates) > k:
+                # Every candidate tied with the k-th, so that ties go by player order
+                kth = np.partition(distances[candidates], k - 1)[k - 1]
+                candidates = candidates[distances[candidates] <= kth]
+            candidates = candidates[np.lexsort((candidates, distances[candidates]))][:k]
+        return [
+            {
+                "player_id": int(self.player_ids[i]),
+                "name": _value(self.names[i]),
+                "position": _value(self.positions[i]),
+                "age": None if np.isnan(self.ages[i]) else int(self.ages[i]),
+                "current_club_name": _value(self.club_names[i]),
+                "market_value": None if np.isnan(self.market_values[i]) else int(self.market_values[i]),
+                "distance": round(float(np.sqrt(max(distances[i], 0.0))), 4),
+            }
+            for i in candidates
+        ]
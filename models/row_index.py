@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# (table, key column) pairs the backend looks rows up by
+INDEXED_COLUMNS = [
+    ("appearances", "player_id"),
+    ("club_games", "club_id"),
+    ("players", "player_id"),
+    ("player_valuations", "player_id"),
+    ("transfers", "player_id"),
+    ("transfers", "from_club_id"),
+    ("transfers", "to_club_id"),
+]
+
+
+class KeyIndex:
+    """Row positions of a table grouped by one key column.
+
+    Positions are stably sorted by key, so the rows of each key form one
+    contiguous run of `order` and come back in their original table order.
+    A lookup is a dict hit on the key plus a positional take.
+    """
+
+    def __init__(self, df, column, order=None):
+        self.df = df
+        self.column = column
+
+        keys = df[column].to_numpy()
+        if order is None:
+            valid = np.flatnonzero(pd.notna(keys))
+            order = valid[np.argsort(keys[valid], kind="stable")]
+        self.order = order
+
+        sorted_keys = keys[self.order]
+        first = np.ones(len(sorted_keys), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        self.starts = np.flatnonzero(first)
+        self.ends = np.empty_like(self.starts)
+        self.ends[:-1] = self.starts[1:]
+        self.ends[-1:] = len(sorted_keys)
+        self.slots = {key: i for i, key in enumerate(sorted_keys[self.starts].tolist())}
+
+    def extend(self, df):
+        """Index of df, made of the rows indexed here followed by new rows.
+
+        Only the new rows are sorted; they are merged after the existing
+        rows of equal key, which gives the same order as indexing df anew.
+        """
+        keys = df[self.column].to_numpy()
+        new = np.arange(len(self.df), len(df))
+        new = new[pd.notna(keys[new])]
+        new = new[np.argsort(keys[new], kind="stable")]
+        at = np.searchsorted(keys[self.order], keys[new], side="right")
+        return KeyIndex(df, self.column, np.insert(self.order, at, new))
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def positions(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            return self.order[:0]
+        return self.order[self.starts[slot]:self.ends[slot]]
+
+    def rows(self, key):
+        return self.df.iloc[self.positions(key)]
+
+    def rows_many(self, keys):
+        # Rows of several keys at once, grouped in the order of `keys`
+        slots = [self.slots[k] for k in keys if k in self.slots]
+        if not slots:
+            return self.df.iloc[:0]
+        positions = np.concatenate([self.order[self.starts[s]:self.ends[s]] for s in slots])
+        return self.df.iloc[positions]
+
+
+def build_indexes(tables, columns=INDEXED_COLUMNS):
+    return {(table, column): KeyIndex(tables[table], column) for table, column in columns}
+
+
+def extend_indexes(indexes, tables, appended):
+    # Indexes after rows were appended to the tables named in `appended`
+    return {
+        (table, column): index.extend(tables[table]) if table in appended else index
+        for (table, column), index in indexes.items()
+    }
+
+
+def lookup(indexes, table, df, column, key):
+    """Rows of df where column == key, through indexes when one covers it."""
+    index = indexes.get((table, column)) if indexes else None
+    if index is None:
+        return df[df[column] == key]
+    return index.rows(key)
+
+
+def lookup_many(indexes, table, df, column, keys):
+    """Rows of df where column is one of keys."""
+    index = indexes.get((table, column)) if indexes else None
+    if index is None:
+        return df[df[column].isin(keys)]
+    return index.rows_many(keys)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# Columns the backend reads from each table, None keeps them all (players
+# are returned whole by /select_player). Missing columns are skipped.
+COLUMNS = {
+    "appearances": ["player_id", "date", "goals", "assists", "yellow_cards", "red_cards", "minutes_played"],
+    "club_games": ["game_id", "club_id", "own_goals", "opponent_id", "opponent_goals", "hosting"],
+    "clubs": ["club_id", "name", "domestic_competition_id"],
+    "games": [
+        "game_id", "competition_id", "season", "date",
+        "home_club_id", "away_club_id", "home_club_goals", "away_club_goals",
+    ],
+    "players": None,
+    "player_valuations": ["player_id", "date", "market_value_in_eur"],
+    "transfers": [
+        "player_id", "transfer_date", "transfer_season", "from_club_id", "to_club_id",
+        "from_club_name", "to_club_name", "transfer_fee", "market_value_in_eur",
+    ],
+}
+
+# Repeated strings, stored as categoricals with sorted categories so that
+# grouping by them orders groups like grouping the strings
+CATEGORY_COLUMNS = {
+    "appearances": [],
+    "club_games": ["hosting"],
+    "clubs": ["domestic_competition_id"],
+    "games": ["competition_id"],
+    "players": [
+        "current_club_name", "current_club_domestic_competition_id", "country_of_citizenship",
+        "country_of_birth", "position", "sub_position", "foot",
+    ],
+    "player_valuations": [],
+    "transfers": ["transfer_season", "from_club_name", "to_club_name"],
+}
+
+# Parsed once at load; players' dates are handled by preprocess_players
+DATE_COLUMNS = {
+    "appearances": ["date"],
+    "games": ["date"],
+    "player_valuations": ["date"],
+    "transfers": ["transfer_date"],
+}
+
+# Integer columns narrowed to the smallest type holding their values; ids
+# stay at least 32-bit so arithmetic on them cannot overflow
+ID_COLUMNS = {"player_id", "club_id", "game_id", "opponent_id", "from_club_id", "to_club_id",
+              "home_club_id", "away_club_id", "current_club_id"}
+
+
+def usecols(name):
+    """read_csv usecols for a table, tolerant of columns the CSV lacks."""
+    columns = COLUMNS[name]
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda column: column in wanted
+
+
+def _downcast(series, minimum):
+    if series.dtype.kind not in "iu" or not len(series):
+        return series
+    low, high = series.min(), series.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.dtype(dtype).itemsize >= np.dtype(minimum).itemsize and np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return series.astype(dtype)
+    return series
+
+
+def compact(name, df):
+    """df with the table's schema applied: unused columns dropped, dates
+    parsed, repeated strings as categoricals and integers narrowed.
+
+    Float columns are left as they are, so every mean and sum computed from
+    them is unchanged.
+    """
+    columns = COLUMNS[name]
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    df = df.copy()
+    for column in DATE_COLUMNS.get(name, []):
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    for column in CATEGORY_COLUMNS[name]:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    for column in df.columns:
+        df[column] = _downcast(df[column], np.int32 if column in ID_COLUMNS else np.int8)
+    return df
+
+
+def append_rows(df, rows):
+    """df followed by rows, both compacted; categories are merged and
+    integer columns widened where the new rows need it."""
+    rows = rows[df.columns].copy()
+    df = df.copy(deep=False)
+    for column in df.columns:
+        dtype = df[column].dtype
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        new = pd.Index(rows[column].dropna().astype(object).unique()).difference(dtype.categories)
+        if len(new):
+            dtype = pd.CategoricalDtype(dtype.categories.union(new))
+            df[column] = df[column].astype(dtype)
+        rows[column] = rows[column].astype(dtype)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def memory_report(tables):
+    """Rows and deep memory use per table and column."""
+    report = {}
+    for name, df in tables.items():
+        usage = df.memory_usage(deep=True, index=False)
+        report[name] = {
+            "rows": len(df),
+            "bytes": int(usage.sum()),
+            "columns": {
+                column: {"dtype": str(df[column].dtype), "bytes": int(usage[column])}
+                for column in df.columns
+            },
+        }
+    return report
@@ -0,0 +1,113 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing when the worker pool is full."""
+
+
+class WorkerPool:
+    """Bounded thread pool for the CPU-bound work of requests.
+
+    At most `workers` calls run at once and `max_queued` more may wait; a
+    submission beyond that raises Overloaded right away, so a spike is
+    answered with 503s instead of an ever longer queue. Calls run in a copy
+    of the caller's context, which keeps stage timers working.
+    """
+
+    def __init__(self, workers=4, max_queued=64):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="worker")
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"{self.workers} running and {self.max_queued} queued")
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, timeout=None):
+        """fn(*args) on the pool, waiting at most `timeout` seconds.
+
+        A call that times out is not interrupted: it keeps its slot until it
+        finishes, so timeouts still count against the pool's capacity.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller of a key runs fn; callers arriving while it runs wait
+    for it and get the same result or exception. Nothing is kept once the
+    call returns, caching is left to the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "calls": self.calls, "shared": self.shared}
@@ -0,0 +1,162 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults shared by both backends
+SESSION_TTL = 3600
+MAX_SESSIONS = 10000
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class MemorySessionStore:
+    """Per-session state of one process, kept as JSON text.
+
+    Sessions are evicted least recently used first once there are more
+    than `max_sessions` of them or their total size exceeds `max_bytes`,
+    and expire `ttl` seconds after their last access.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, max_bytes=MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()  # id -> (state json, last access)
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, session_id, now):
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        if now - entry[1] > self.ttl:
+            self._drop(session_id)
+            return None
+        self.sessions.move_to_end(session_id)
+        self.sessions[session_id] = (entry[0], now)
+        return json.loads(entry[0])
+
+    def _drop(self, session_id):
+        text, _ = self.sessions.pop(session_id)
+        self.bytes -= len(text)
+
+    def _set(self, session_id, state, now):
+        if session_id in self.sessions:
+            self._drop(session_id)
+        text = json.dumps(state)
+        self.sessions[session_id] = (text, now)
+        self.bytes += len(text)
+        while len(self.sessions) > self.max_sessions or (self.bytes > self.max_bytes and len(self.sessions) > 1):
+            self._drop(next(iter(self.sessions)))
+
+    def get(self, session_id):
+        with self._lock:
+            return self._get(session_id, time.time())
+
+    def update(self, session_id, **fields):
+        # Merge fields into the session state atomically
+        with self._lock:
+            now = time.time()
+            state = self._get(session_id, now) or {}
+            state.update(fields)
+            self._set(session_id, state, now)
+            return state
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self.sessions), "bytes": self.bytes}
+
+
+class SqliteSessionStore:
+    """Per-session state in a local SQLite file shared by worker processes.
+
+    Same limits as MemorySessionStore; access times live in the table, so
+    LRU order and expiry hold across processes.
+    """
+
+    def __init__(self, path, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, max_bytes=MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, state TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _get(self, db, session_id, now):
+        row = db.execute(
+            "SELECT state FROM sessions WHERE id = ? AND accessed >= ?", (session_id, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM sessions WHERE accessed < ?", (now - self.ttl,))
+        count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        if count <= self.max_sessions and size <= self.max_bytes:
+            return
+        # Oldest first until both limits hold, always keeping the newest session
+        for session_id, row_size in db.execute("SELECT id, size FROM sessions ORDER BY accessed").fetchall()[:-1]:
+            if count <= self.max_sessions and size <= self.max_bytes:
+                break
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            count -= 1
+            size -= row_size
+
+    def get(self, session_id):
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._get(db, session_id, time.time())
+        finally:
+            db.execute("COMMIT")
+        return state
+
+    def update(self, session_id, **fields):
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            state = self._get(db, session_id, now) or {}
+            state.update(fields)
+            text = json.dumps(state)
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, size, accessed) VALUES (?, ?, ?, ?)",
+                (session_id, text, len(text), now),
+            )
+            self._evict(db, now)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return state
+
+    def stats(self):
+        count, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions"
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": size}
+
+
+def make_session_store(backend="memory", path=None, **limits):
+    if backend == "memory":
+        return MemorySessionStore(**limits)
+    if backend == "sqlite":
+        return SqliteSessionStore(path, **limits)
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from unidecode import unidecode
+
+from models.schema import compact, usecols
+
+# Tables the backend keeps in memory
+TABLES = ["appearances", "club_games", "clubs", "games", "players", "player_valuations", "transfers"]
+
+SNAPSHOT_DIR = "snapshot"
+MANIFEST_FILE = "manifest.json"
+# Bump when the preprocessing below or the schema changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT = 2
+
+
+def preprocess_players(players, today=None):
+    today = today or datetime.now()
+    players = players.dropna(subset=["name", "date_of_birth", "current_club_name"]).reset_index(drop=True)
+
+    # unidecode only once per distinct name
+    names = players["name"].astype(str)
+    players["name_norm"] = names.map({n: unidecode(n).lower() for n in names.unique()})
+    players["date_of_birth"] = pd.to_datetime(players["date_of_birth"], errors="coerce")
+    age = today.year - players["date_of_birth"].dt.year
+    players["age"] = age.astype("int64") if age.notnull().all() else age
+    if "player_id" not in players.columns:
+        players["player_id"] = players.index
+    return players
+
+
+def source_fingerprint(data_path):
+    sources = {}
+    for name in TABLES:
+        stat = os.stat(os.path.join(data_path, name + ".csv"))
+        sources[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return {
+        "format": SNAPSHOT_FORMAT,
+        # Ages are derived from the current year
+        "year": datetime.now().year,
+        "sources": sources,
+    }
+
+
+def dataset_version(fingerprint):
+    payload = json.dumps(fingerprint, sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def read_csv_table(data_path, name):
+    """One table from its CSV, preprocessed and compacted to its schema."""
+    df = pd.read_csv(os.path.join(data_path, name + ".csv"), usecols=usecols(name))
+    if name == "players":
+        df = preprocess_players(df)
+    return compact(name, df)
+
+
+def _read_csv_tables(data_path):
+    return {name: read_csv_table(data_path, name) for name in TABLES}
+
+
+def _temp_path(path):
+    # Next to the target, so that os.replace is a rename on the same filesystem
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_feather_atomic(df, path, **kwargs):
+    """Writes a Feather file through a temporary file and a rename, so that
+    readers in other processes see either the old file or the new one."""
+    temp = _temp_path(path)
+    try:
+        feather.write_feather(df, temp, **kwargs)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def write_json_atomic(value, path):
+    """json.dump through a temporary file and a rename, see write_feather_atomic."""
+    temp = _temp_path(path)
+    try:
+        with open(temp, "w") as f:
+            json.dump(value, f, indent=2)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def build_snapshot(data_path):
+    snapshot_path = os.path.join(data_path, SNAPSHOT_DIR)
+    os.makedirs(snapshot_path, exist_ok=True)
+    fingerprint = source_fingerprint(data_path)
+
+    tables = _read_csv_tables(data_path)
+    for name, df in tables.items():
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Uncompressed so the file can be memory-mapped on load
+        feather.write_feather(table, os.path.join(snapshot_path, name + ".feather"), compression="uncompressed")
+        print(f"  {name}: {len(df)} rows, {table.num_columns} columns")
+
+    fingerprint["version"] = dataset_version(fingerprint)
+    with open(os.path.join(snapshot_path, MANIFEST_FILE), "w") as f:
+        json.dump(fingerprint, f, indent=2)
+    return fingerprint["version"]
+
+
+def snapshot_status(data_path):
+    """Returns (is_fresh, reason) for the snapshot under data_path."""
+    manifest_path = os.path.join(data_path, SNAPSHOT_DIR, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return False, "no snapshot"
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest.pop("version", None)
+
+    current = source_fingerprint(data_path)
+    if manifest.get("format") != current["format"]:
+        return False, "snapshot format changed"
+    if manifest.get("year") != current["year"]:
+        return False, "derived ages are out of date"
+    for name in TABLES:
+        if manifest["sources"].get(name) != current["sources"][name]:
+            return False, f"{name}.csv changed"
+        if not os.path.exists(os.path.join(data_path, SNAPSHOT_DIR, name + ".feather")):
+            return False, f"{name}.feather missing"
+    return True, "fresh"
+
+
+def restore_missing_strings(df):
+    # Arrow hands back None for missing strings where read_csv gives NaN
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].to_numpy()
+        missing = pd.isna(values)
+        if missing.any():
+            df[col] = np.where(missing, np.nan, values)
+    return df
+
+
+def load_tables(data_path, use_snapshot=True):
+    """Loads the backend tables, preferring a fresh snapshot over the CSVs.
+
+    Returns (tables, version, report) where report holds per-table load time
+    and memory figures, and the size and mtime of each CSV that was loaded.
+    """
+    # Taken before reading, so rows appended while loading count as new on reload
+    fingerprint = source_fingerprint(data_path)
+    fresh, reason = snapshot_status(data_path) if use_snapshot else (False, "snapshot disabled")
+    source = "snapshot" if fresh else "csv"
+    if not fresh:
+        print(f"Loading CSVs ({reason}); run `python -m models.snapshot build` to speed up startup")
+
+    tables = {}
+    report = {"source": source, "tables": {}}
+    start_total = time.perf_counter()
+    for name in TABLES:
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        if fresh:
+            table = feather.read_table(os.path.join(data_path, SNAPSHOT_DIR, name + ".feather"), memory_map=True)
+            df = restore_missing_strings(table.to_pandas(split_blocks=True))
+        else:
+            df = read_csv_table(data_path, name)
+        tables[name] = df
+        report["tables"][name] = {
+            "rows": len(df),
+            "seconds": round(time.perf_counter() - start, 4),
+            "memory_bytes": int(df.memory_usage(deep=True).sum()),
+            "rss_delta_bytes": rss_bytes() - rss_before,
+        }
+    report["seconds"] = round(time.perf_counter() - start_total, 4)
+    report["rss_bytes"] = rss_bytes()
+    report["sources"] = fingerprint["sources"]
+
+    version = dataset_version(fingerprint)
+    return tables, version, report
+
+
+def print_report(report):
+    print(f"Loaded tables from {report['source']} in {report['seconds']:.2f}s (RSS {report['rss_bytes'] / 2**20:.1f} MB)")
+    for name, stats in report["tables"].items():
+        print(
+            f"  {name:<18} {stats['rows']:>10} rows  {stats['seconds']:>7.3f}s  "
+            f"{stats['memory_bytes'] / 2**20:>8.1f} MB  (RSS +{stats['rss_delta_bytes'] / 2**20:.1f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the columnar data snapshot")
+    parser.add_argument("command", choices=["build", "status", "load"])
+    parser.add_argument("--data-path", default="../data/")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Building snapshot in {os.path.join(args.data_path, SNAPSHOT_DIR)}")
+        version = build_snapshot(args.data_path)
+        print(f"Snapshot {version} written.")
+    elif args.command == "status":
+        fresh, reason = snapshot_status(args.data_path)
+        print(f"{'fresh' if fresh else 'stale'}: {reason}")
+    else:
+        _, _, report = load_tables(args.data_path)
+        print_report(report)
@@ -0,0 +1,217 @@
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+ELO_START = 1500.0
+ELO_K = 20.0
+# Elo points added to the home side when computing the expected result
+ELO_HOME_ADVANTAGE = 65.0
+# Weight of the newest game in a club's exponentially weighted goal rates;
+# a new club starts at the league average as if it had played PRIOR_GAMES
+# average games, and rates are plain means until the decay weight is larger
+GOAL_DECAY = 0.05
+PRIOR_GAMES = 5
+# Same for the league-wide home and away scoring rates
+BASE_DECAY = 0.005
+# Scores above this many goals per side are left out of the score distribution
+MAX_GOALS = 10
+
+
+def _margin_multiplier(goal_difference):
+    # World Football Elo: wins by more goals move ratings further
+    goal_difference = abs(goal_difference)
+    if goal_difference <= 1:
+        return 1.0
+    if goal_difference == 2:
+        return 1.5
+    return (11 + goal_difference) / 8
+
+
+def _sorted_results(games):
+    # Played games in date order, undated ones last; fixtures without a score yet are skipped.
+    # numpy sorts NaT last, where Series.argsort would return -1 for it
+    games = games.dropna(subset=["home_club_id", "away_club_id", "home_club_goals", "away_club_goals"])
+    order = np.argsort(pd.to_datetime(games["date"], errors="coerce").to_numpy(), kind="stable")
+    return games.iloc[order]
+
+
+class TeamStrengths:
+    """Per-club Elo rating and Poisson attack/defence rates.
+
+    The table is updated one game at a time in date order, so new results
+    are applied as they arrive without refitting. Goal rates are kept
+    venue-neutral (home goals scaled by the league home rate and away goals
+    by the away rate) and home advantage comes from the league rates.
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.club_ids = []
+        self.elo = []
+        self.scored = []
+        self.conceded = []
+        self.games = []
+        self.home_rate = None
+        self.away_rate = None
+        self.n_results = 0
+
+    @classmethod
+    def fit(cls, games):
+        strengths = cls()
+        strengths.update(games)
+        return strengths
+
+    def copy(self):
+        strengths = TeamStrengths()
+        strengths.__dict__.update({
+            name: value.copy() if isinstance(value, (list, dict)) else value
+            for name, value in self.__dict__.items()
+        })
+        return strengths
+
+    def updated(self, games):
+        """A copy with the results in games applied; self is unchanged."""
+        strengths = self.copy()
+        strengths.update(games)
+        return strengths
+
+    def _position(self, club_id):
+        position = self.positions.get(club_id)
+        if position is None:
+            position = self.positions[club_id] = len(self.club_ids)
+            self.club_ids.append(club_id)
+            self.elo.append(ELO_START)
+            self.scored.append(None)
+            self.conceded.append(None)
+            self.games.append(0)
+        return position
+
+    def update(self, games):
+        games = _sorted_results(games)
+        columns = ["home_club_id", "away_club_id", "home_club_goals", "away_club_goals"]
+        for home_id, away_id, home_goals, away_goals in zip(*(games[c].tolist() for c in columns)):
+            self.add_result(int(home_id), int(away_id), home_goals, away_goals)
+
+    def add_result(self, home_id, away_id, home_goals, away_goals):
+        home, away = self._position(home_id), self._position(away_id)
+
+        # Elo, from the home side's point of view
+        expected = 1 / (1 + 10 ** ((self.elo[away] - self.elo[home] - ELO_HOME_ADVANTAGE) / 400))
+        result = 1.0 if home_goals > away_goals else 0.5 if home_goals == away_goals else 0.0
+        change = ELO_K * _margin_multiplier(home_goals - away_goals) * (result - expected)
+        self.elo[home] += change
+        self.elo[away] -= change
+
+        # League rates first, so the first game already has a scale
+        self.n_results += 1
+        weight = max(1 / self.n_results, BASE_DECAY)
+        self.home_rate = home_goals if self.home_rate is None else self.home_rate + weight * (home_goals - self.home_rate)
+        self.away_rate = away_goals if self.away_rate is None else self.away_rate + weight * (away_goals - self.away_rate)
+        mean_rate = (self.home_rate + self.away_rate) / 2
+        home_neutral = home_goals * mean_rate / self.home_rate if self.home_rate else mean_rate
+        away_neutral = away_goals * mean_rate / self.away_rate if self.away_rate else mean_rate
+
+        for club, scored, conceded in ((home, home_neutral, away_neutral), (away, away_neutral, home_neutral)):
+            if self.scored[club] is None:
+                self.scored[club] = self.conceded[club] = mean_rate
+            self.games[club] += 1
+            weight = max(1 / (self.games[club] + PRIOR_GAMES), GOAL_DECAY)
+            self.scored[club] += weight * (scored - self.scored[club])
+            self.conceded[club] += weight * (conceded - self.conceded[club])
+
+    def __contains__(self, club_id):
+        return club_id in self.positions
+
+    def expected_goals(self, home_ids, away_ids):
+        """Poisson means (home, away) for arrays of fixtures.
+
+        Clubs without games get the league average attack and defence.
+        """
+        if self.n_results == 0:
+            return np.full(len(home_ids), np.nan), np.full(len(away_ids), np.nan)
+        mean_rate = (self.home_rate + self.away_rate) / 2
+        scored = np.append(np.asarray(self.scored), mean_rate) / mean_rate
+        conceded = np.append(np.asarray(self.conceded), mean_rate) / mean_rate
+        unknown = len(self.club_ids)
+        home = np.array([self.positions.get(club_id, unknown) for club_id in home_ids], dtype=np.int64)
+        away = np.array([self.positions.get(club_id, unknown) for club_id in away_ids], dtype=np.int64)
+        return (
+            self.home_rate * scored[home] * conceded[away],
+            self.away_rate * scored[away] * conceded[home],
+        )
+
+    def table(self):
+        mean_rate = (self.home_rate + self.away_rate) / 2 if self.n_results else np.nan
+        return pd.DataFrame({
+            "club_id": self.club_ids,
+            "elo": self.elo,
+            "attack": np.asarray(self.scored) / mean_rate,
+            "defence": np.asarray(self.conceded) / mean_rate,
+            "games": self.games,
+        }).sort_values("elo", ascending=False, ignore_index=True)
+
+
+def score_distribution(home_goals, away_goals):
+    """Independent Poisson score probabilities, shape (fixtures, MAX_GOALS + 1, MAX_GOALS + 1).
+
+    Rows are home goals and columns away goals, renormalized over the scores
+    up to MAX_GOALS.
+    """
+    home_goals = np.maximum(np.asarray(home_goals, dtype=float), 1e-6)
+    away_goals = np.maximum(np.asarray(away_goals, dtype=float), 1e-6)
+    goals = np.arange(MAX_GOALS + 1)
+    log_factorial = np.array([math.lgamma(k + 1) for k in goals])
+    home = np.exp(goals * np.log(home_goals[:, None]) - home_goals[:, None] - log_factorial)
+    away = np.exp(goals * np.log(away_goals[:, None]) - away_goals[:, None] - log_factorial)
+    scores = home[:, :, None] * away[:, None, :]
+    return scores / scores.sum(axis=(1, 2), keepdims=True)
+
+
+def outcome_probabilities(scores):
+    """(home win, draw, away win) probabilities from score_distribution."""
+    home = np.tril(np.ones(scores.shape[1:]), -1)
+    away = np.triu(np.ones(scores.shape[1:]), 1)
+    return (scores * home).sum(axis=(1, 2)), np.trace(scores, axis1=1, axis2=2), (scores * away).sum(axis=(1, 2))
+
+
+def evaluate(games):
+    """Log loss and accuracy of predicting each game from the games before it."""
+    games = _sorted_results(games)
+    strengths = TeamStrengths()
+    probabilities, outcomes = [], []
+    columns = ["home_club_id", "away_club_id", "home_club_goals", "away_club_goals"]
+    for home_id, away_id, home_goals, away_goals in zip(*(games[c].tolist() for c in columns)):
+        home_id, away_id = int(home_id), int(away_id)
+        if home_id in strengths and away_id in strengths:
+            expected = strengths.expected_goals([home_id], [away_id])
+            probabilities.append(np.ravel(outcome_probabilities(score_distribution(*expected))))
+            outcomes.append(0 if home_goals > away_goals else 1 if home_goals == away_goals else 2)
+        strengths.add_result(home_id, away_id, home_goals, away_goals)
+
+    probabilities, outcomes = np.array(probabilities), np.array(outcomes)
+    picked = probabilities[np.arange(len(outcomes)), outcomes]
+    base_rates = np.bincount(outcomes, minlength=3) / len(outcomes)
+    return {
+        "games": len(outcomes),
+        "log_loss": float(-np.log(np.clip(picked, 1e-12, None)).mean()),
+        "base_rate_log_loss": float(-np.log(base_rates[outcomes]).mean()),
+        "accuracy": float((probabilities.argmax(axis=1) == outcomes).mean()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the team strength table from games.csv")
+    parser.add_argument("--data-path", default="../data/")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--evaluate", action="store_true", help="score each game from the games before it")
+    args = parser.parse_args()
+
+    games = pd.read_csv(os.path.join(args.data_path, "games.csv"))
+    if args.evaluate:
+        for name, value in evaluate(games).items():
+            print(f"{name:<20} {value:.4f}" if isinstance(value, float) else f"{name:<20} {value}")
+    else:
+        print(TeamStrengths.fit(games).table().head(args.top).to_string(index=False))
@@ -5,113 +5,244 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from xgboost import XGBClassifier
-from sklearn.metrics import classification_report
+from sklearn.metrics import accuracy_score, classification_report, f1_score, precision_score, recall_score, roc_auc_score
 from imblearn.over_sampling import SMOTE
 import joblib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import argparse
 import os
+import sys
+import time
+
+# Allow `models.*` imports when run as a script from models/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.artifacts import export_model
+from models.feature_store import FeatureStore, player_features
 
 # Paths
 DATA_PATH = "../data/"
 MODEL_PATH = "../models/saved/"
-os.makedirs(MODEL_PATH, exist_ok=True)
-
-# Load datasets
-players = pd.read_csv(DATA_PATH + "players.csv")
-transfers = pd.read_csv(DATA_PATH + "transfers.csv")
-player_valuations = pd.read_csv(DATA_PATH + "player_valuations.csv")
-appearances = pd.read_csv(DATA_PATH + "appearances.csv")
-
-# Preprocessing: ensure proper datetime formats
-players["date_of_birth"] = pd.to_datetime(players["date_of_birth"], errors="coerce")
-players["contract_expiration_date"] = pd.to_datetime(players["contract_expiration_date"], errors="coerce")
-transfers["transfer_date"] = pd.to_datetime(transfers["transfer_date"], errors="coerce")
-player_valuations["date"] = pd.to_datetime(player_valuations["date"], errors="coerce")
-appearances["date"] = pd.to_datetime(appearances["date"], errors="coerce")
-
-# Build base training dataset
-cutoff_date = pd.to_datetime("2022-07-01")
-
-# Latest valuation before cutoff
-latest_vals = player_valuations[player_valuations["date"] < cutoff_date]
-latest_vals = latest_vals.sort_values("date").groupby("player_id").last().reset_index()
-
-# Merge with player info
-latest_vals = latest_vals.merge(players[["player_id", "date_of_birth", "position", "foot", "height_in_cm", "contract_expiration_date"]], on="player_id", how="left")
-
-# Calculate age and contract remaining
-latest_vals["age"] = latest_vals["date_of_birth"].apply(lambda x: cutoff_date.year - x.year if pd.notnull(x) else None)
-latest_vals["contract_remaining"] = (latest_vals["contract_expiration_date"] - cutoff_date).dt.days / 365
-
-# Aggregate performance stats (last 6 months)
-recent_appearances = appearances[(appearances["date"] >= cutoff_date - pd.DateOffset(months=6)) & (appearances["date"] < cutoff_date)]
-perf = recent_appearances.groupby("player_id").agg({
-    "goals": "sum",
-    "assists": "sum",
-    "minutes_played": "sum",
-    "appearance_id": "count"
-}).rename(columns={"appearance_id": "matches"}).reset_index()
-
-latest_vals = latest_vals.merge(perf, on="player_id", how="left")
-
-# Fill missing performance data with zeros
-latest_vals[["goals", "assists", "minutes_played", "matches"]] = latest_vals[["goals", "assists", "minutes_played", "matches"]].fillna(0)
-
-# Transfer history features
-transfer_history = transfers[transfers["transfer_date"] < cutoff_date]
-history = transfer_history.groupby("player_id").agg({
-    "transfer_fee": ["count", "mean"]
-})
-history.columns = ["num_transfers", "avg_transfer_fee"]
-history = history.reset_index()
-
-latest_vals = latest_vals.merge(history, on="player_id", how="left")
-
-# Fill missing transfer history with zeros
-latest_vals[["num_transfers", "avg_transfer_fee"]] = latest_vals[["num_transfers", "avg_transfer_fee"]].fillna(0)
-
-# Target: was transferred after cutoff
-recent_transfers = transfers[transfers["transfer_date"] >= cutoff_date]
-latest_vals["was_transferred"] = latest_vals["player_id"].isin(recent_transfers["player_id"]).astype(int)
-
-# Drop NaNs and keep relevant features
-features = [
+FEATURE_STORE_PATH = DATA_PATH + "feature_store/"
+
+CUTOFF_DATE = "2022-07-01"
+# Backtest cutoffs fall on the opening day of each transfer window
+WINDOW_MONTHS = (1, 7)
+# Backtest label: transferred within this many months of the cutoff
+BACKTEST_HORIZON_MONTHS = 12
+BACKTEST_FILE = "transfer_backtest.csv"
+
+# Performance stats of the last 6 months under the names the model was trained with
+FEATURE_RENAMES = {
+    "goals_last_6m": "goals",
+    "assists_last_6m": "assists",
+    "minutes_last_6m": "minutes_played",
+    "matches_last_6m": "matches",
+}
+FEATURES = [
     "age", "market_value_in_eur", "contract_remaining",
     "goals", "assists", "minutes_played", "matches",
     "num_transfers", "avg_transfer_fee", "height_in_cm",
     "position"
 ]
-data = latest_vals.dropna(subset=["age", "market_value_in_eur", "contract_remaining", "height_in_cm", "position"] + ["was_transferred"])
-X = data[features]
-y = data["was_transferred"]
-
-# One-hot encode categorical features
-categorical_features = ["position"]
-numerical_features = [col for col in X.columns if col not in categorical_features]
-
-preprocessor = ColumnTransformer([
-    ("num", StandardScaler(), numerical_features),
-    ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features)
-])
+CATEGORICAL_FEATURES = ["position"]
 
-X_processed = preprocessor.fit_transform(X)
 
-# Balance classes with SMOTE
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X_processed, y)
+def load_data(data_path=DATA_PATH):
+    # Load datasets
+    players = pd.read_csv(data_path + "players.csv")
+    transfers = pd.read_csv(data_path + "transfers.csv")
+    player_valuations = pd.read_csv(data_path + "player_valuations.csv")
+    appearances = pd.read_csv(data_path + "appearances.csv")
 
-# Split
-X_train, X_test, y_train, y_test = train_test_split(X_resampled, y_resampled, test_size=0.2, stratify=y_resampled, random_state=42)
+    # Preprocessing: ensure proper datetime formats
+    players["date_of_birth"] = pd.to_datetime(players["date_of_birth"], errors="coerce")
+    players["contract_expiration_date"] = pd.to_datetime(players["contract_expiration_date"], errors="coerce")
+    transfers["transfer_date"] = pd.to_datetime(transfers["transfer_date"], errors="coerce")
+    player_valuations["date"] = pd.to_datetime(player_valuations["date"], errors="coerce")
+    appearances["date"] = pd.to_datetime(appearances["date"], errors="coerce")
+    return {"players": players, "player_valuations": player_valuations, "appearances": appearances, "transfers": transfers}
 
-# Train model
-model = XGBClassifier(eval_metric='logloss')
-model.fit(X_train, y_train)
 
-# Evaluate
-y_pred = model.predict(X_test)
-print(classification_report(y_test, y_pred))
+def training_frame(features, transfers, cutoff_date, horizon_months=None):
+    """Features as of the cutoff labelled with whether the player moved after it.
 
-# Save model and preprocessor
-joblib.dump(model, MODEL_PATH + "xgb_transfer_model.pkl")
-joblib.dump(preprocessor, MODEL_PATH + "preprocessor.pkl")
-print("Model and preprocessor saved successfully.")
\ No newline at end of file
+    Without a horizon every later transfer counts, like the saved model;
+    with one only transfers in the following horizon_months do.
+    """
+    data = features.rename(columns=FEATURE_RENAMES)
+
+    # Target: was transferred after cutoff
+    recent_transfers = transfers[transfers["transfer_date"] >= cutoff_date]
+    if horizon_months is not None:
+        recent_transfers = recent_transfers[recent_transfers["transfer_date"] < cutoff_date + pd.DateOffset(months=horizon_months)]
+    data["was_transferred"] = data["player_id"].isin(recent_transfers["player_id"]).astype(int)
+
+    # Drop NaNs and keep relevant features
+    return data.dropna(subset=["age", "market_value_in_eur", "contract_remaining", "height_in_cm", "position"] + ["was_transferred"])
+
+
+def train(data, n_jobs=None):
+    """Fits the preprocessor and classifier; returns (model, preprocessor, metrics).
+
+    SMOTE needs both classes, so a cutoff where nobody (or everybody) moves
+    raises ValueError.
+    """
+    X = data[FEATURES]
+    y = data["was_transferred"]
+    if y.nunique() < 2:
+        raise ValueError("only one class in the training labels")
+
+    # One-hot encode categorical features
+    numerical_features = [col for col in X.columns if col not in CATEGORICAL_FEATURES]
+    preprocessor = ColumnTransformer([
+        ("num", StandardScaler(), numerical_features),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES)
+    ])
+
+    X_processed = preprocessor.fit_transform(X)
+
+    # Balance classes with SMOTE
+    smote = SMOTE(random_state=42)
+    X_resampled, y_resampled = smote.fit_resample(X_processed, y)
+
+    # Split
+    X_train, X_test, y_train, y_test = train_test_split(X_resampled, y_resampled, test_size=0.2, stratify=y_resampled, random_state=42)
+
+    # Train model
+    model = XGBClassifier(eval_metric='logloss', n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+
+    # Evaluate
+    y_pred = model.predict(X_test)
+    metrics = {
+        "players": len(data),
+        "positive_rate": float(y.mean()),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred, zero_division=0),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+        "roc_auc": roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]),
+        "report": classification_report(y_test, y_pred),
+    }
+    return model, preprocessor, metrics
+
+
+def transfer_window_cutoffs(start, end):
+    months = pd.date_range(start, end, freq="MS")
+    return list(months[months.month.isin(WINDOW_MONTHS)])
+
+
+# Per-process state of the backtest workers
+_worker = {}
+
+
+def _init_worker(data_path, store_path, n_jobs):
+    # Forked workers inherit the parent's tables; spawned ones read them once
+    if "tables" not in _worker:
+        _worker["tables"] = load_data(data_path)
+    _worker["store"] = FeatureStore(store_path)
+    _worker["n_jobs"] = n_jobs
+
+
+def _compute_features(cutoff):
+    return player_features(_worker["tables"], cutoff)
+
+
+def _backtest_cutoff(cutoff, horizon_months):
+    start = time.perf_counter()
+    features = _worker["store"].load(cutoff)
+    data = training_frame(features, _worker["tables"]["transfers"], cutoff, horizon_months)
+    try:
+        _, _, metrics = train(data, n_jobs=_worker["n_jobs"])
+        metrics.pop("report")
+    except ValueError as e:
+        metrics = {"players": len(data), "error": str(e)}
+    return {"cutoff": f"{cutoff:%Y-%m-%d}", **metrics, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def backtest(tables, cutoffs, data_path=DATA_PATH, store_path=FEATURE_STORE_PATH,
+             workers=None, horizon_months=BACKTEST_HORIZON_MONTHS):
+    """Trains and evaluates one model per cutoff across a process pool.
+
+    Feature snapshots come from the feature store and are computed once per
+    cutoff; missing ones are computed in the pool and written by this
+    process, which owns the store manifest. Each worker fits with
+    cpu_count / workers XGBoost threads so the pool does not oversubscribe
+    the cores. Returns a DataFrame with one row of metrics per cutoff.
+    """
+    workers = workers or os.cpu_count()
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+    store = FeatureStore(store_path)
+    _worker["tables"] = tables
+    _init_worker(data_path, store_path, n_jobs)
+
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data_path, store_path, n_jobs)) if workers > 1 else None
+    run = pool.map if pool else map
+    try:
+        # Up to date stored snapshots are reused (and extended when the tables grew)
+        missing = []
+        for cutoff in cutoffs:
+            if store.cached(cutoff):
+                store.get(cutoff, tables)
+            else:
+                missing.append(cutoff)
+        for cutoff, features in zip(missing, run(_compute_features, missing)):
+            store.save(cutoff, features, tables)
+        print(f"Features: {len(cutoffs) - len(missing)} cutoffs cached, {len(missing)} computed")
+
+        results = list(run(_backtest_cutoff, cutoffs, [horizon_months] * len(cutoffs)))
+    finally:
+        if pool:
+            pool.shutdown()
+    return pd.DataFrame(results)
+
+
+def summarize(results):
+    metrics = [col for col in ["positive_rate", "accuracy", "precision", "recall", "f1", "roc_auc"] if col in results]
+    return results[metrics].agg(["mean", "std", "min", "max"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the XGBoost transfer model")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--cutoff", default=CUTOFF_DATE, help="cutoff date of the saved model")
+    parser.add_argument("--backtest", nargs=2, metavar=("START", "END"),
+                        help="train and evaluate at every transfer window between START and END instead of saving a model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="backtest worker processes")
+    parser.add_argument("--horizon-months", type=int, default=BACKTEST_HORIZON_MONTHS, help="backtest label horizon")
+    args = parser.parse_args()
+
+    store_path = os.path.join(args.data_path, "feature_store/")
+    tables = load_data(args.data_path)
+
+    if args.backtest:
+        cutoffs = transfer_window_cutoffs(*args.backtest)
+        print(f"Backtesting {len(cutoffs)} cutoffs with {args.workers} workers")
+        start = time.perf_counter()
+        results = backtest(tables, cutoffs, args.data_path, store_path, args.workers, args.horizon_months)
+        wall = time.perf_counter() - start
+        print(results.drop(columns="seconds").to_string(index=False))
+        print(summarize(results).round(4).to_string())
+        print(f"{wall:.1f}s wall, {results['seconds'].sum():.1f}s of training "
+              f"({results['seconds'].sum() / wall:.1f}x parallel)")
+        os.makedirs(MODEL_PATH, exist_ok=True)
+        results.to_csv(MODEL_PATH + BACKTEST_FILE, index=False)
+        print(f"Per-cutoff metrics written to {MODEL_PATH + BACKTEST_FILE}")
+        raise SystemExit(0)
+
+    # Player features as of the cutoff, from the store shared with the club model and the backend
+    cutoff_date = pd.to_datetime(args.cutoff)
+    latest_vals = FeatureStore(store_path).get(cutoff_date, tables)
+    data = training_frame(latest_vals, tables["transfers"], cutoff_date)
+
+    model, preprocessor, metrics = train(data)
+    print(metrics["report"])
+
+    # Save model and preprocessor
+    os.makedirs(MODEL_PATH, exist_ok=True)
+    joblib.dump(model, MODEL_PATH + "xgb_transfer_model.pkl")
+    joblib.dump(preprocessor, MODEL_PATH + "preprocessor.pkl")
+    # Native artifacts the backend loads in place of the pickles
+    export_model("transfer", {"model": model, "preprocessor": preprocessor}, MODEL_PATH)
+    print("Model and preprocessor saved successfully.")
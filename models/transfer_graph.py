@@ -0,0 +1,217 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Fee weighting: a transfer counts 1 + ln(1 + fee in millions of euros)
+FEE_UNIT = 1e6
+# Weighted variants kept per graph, by (half-life, fee weighting)
+MAX_VARIANTS = 16
+
+
+class TransferGraph:
+    """Transfers between clubs as a sparse club x club matrix.
+
+    Rows are origin clubs and columns destination clubs, both indexed by
+    club id through `club_ids`; entry (i, j) is the number of transfers
+    from club i to club j, or their summed weight in a variant with time
+    decay and/or fee weighting. Transfers with a known origin and
+    destination name are edges; destinations without a club id get
+    negative ids, one per name. Each club is named as in the transfers.
+
+    Edges also keep the club names of their transfers, so that the
+    name-keyed patterns of predict_transfer read the same as when grouped
+    from the transfer rows, renamed clubs included.
+    """
+
+    def __init__(self, club_ids, names, labels, rows, cols, from_names, to_names, positions, dates, fees):
+        self.club_ids = club_ids
+        self.names = names
+        self.labels = labels
+        self.slots = {club_id: i for i, club_id in enumerate(club_ids.tolist())}
+        # One entry per transfer, ordered by (row, col, from name, to name, table position)
+        self._rows = rows
+        self._cols = cols
+        self._dates = dates
+        self._fees = fees
+
+        # Distinct (origin, destination) pairs, the entries of the matrix
+        changed = np.ones(len(rows), dtype=bool)
+        changed[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        self._starts = np.flatnonzero(changed)
+        self.matrix = self._compile(np.ones(len(rows)))
+        self._variants = {}
+        self._lock = threading.Lock()
+
+        # Distinct (origin, destination, from name, to name) edges, with their
+        # transfer count and the table position of their first transfer
+        changed[1:] |= (from_names[1:] != from_names[:-1]) | (to_names[1:] != to_names[:-1])
+        starts = np.flatnonzero(changed)
+        self._edge_rows = rows[starts]
+        self._edge_from = from_names[starts]
+        self._edge_to = to_names[starts]
+        self._edge_counts = np.diff(np.append(starts, len(rows)))
+        self._edge_first = positions[starts]
+        self._out_ptr = np.searchsorted(self._edge_rows, np.arange(len(club_ids) + 1))
+        edge_cols = cols[starts]
+        self._in_order = np.argsort(edge_cols, kind="stable")
+        self._in_ptr = np.searchsorted(edge_cols[self._in_order], np.arange(len(club_ids) + 1))
+
+    @classmethod
+    def build(cls, transfers_df):
+        known = (transfers_df["from_club_id"].notna() & transfers_df["to_club_name"].notna()).to_numpy()
+        positions = np.flatnonzero(known)
+        origins = transfers_df["from_club_id"].to_numpy()[positions].astype(np.int64)
+        from_names = transfers_df["from_club_name"].to_numpy(dtype=object)[positions]
+        to_names = transfers_df["to_club_name"].to_numpy(dtype=object)[positions]
+        # Destinations without a club id ("Without Club" and the like) are
+        # nodes of their own, one per name, under negative ids
+        destinations = transfers_df["to_club_id"].to_numpy(dtype=float)[positions]
+        missing = np.isnan(destinations)
+        unnamed = pd.factorize(to_names[missing], sort=True)[0]
+        destinations = np.where(missing, 0, destinations).astype(np.int64)
+        destinations[missing] = -1 - unnamed
+        club_ids = np.unique(np.concatenate([origins, destinations]))
+
+        # Each club under its first name in the transfers, as destination or else as origin
+        names = pd.Series(np.concatenate([to_names, from_names]), index=np.concatenate([destinations, origins])).dropna()
+        names = names[~names.index.duplicated()].reindex(club_ids).to_numpy(dtype=object)
+
+        # Club names of the transfers as codes into one sorted label array, -1 when missing
+        codes, labels = pd.factorize(np.concatenate([from_names, to_names]), sort=True)
+        from_codes, to_codes = codes[:len(positions)], codes[len(positions):]
+
+        rows = np.searchsorted(club_ids, origins)
+        cols = np.searchsorted(club_ids, destinations)
+        order = np.lexsort((positions, to_codes, from_codes, cols, rows))
+        return cls(
+            club_ids, names, np.asarray(labels, dtype=object),
+            rows[order], cols[order], from_codes[order], to_codes[order], positions[order],
+            pd.to_datetime(transfers_df["transfer_date"]).to_numpy()[positions][order],
+            transfers_df["transfer_fee"].to_numpy(dtype=float)[positions][order],
+        )
+
+    def __len__(self):
+        return len(self.club_ids)
+
+    def _compile(self, weights):
+        # CSR matrix of the edge weights summed per (origin, destination) pair
+        n = len(self.club_ids)
+        data = np.add.reduceat(weights, self._starts) if len(weights) else weights
+        rows = self._rows[self._starts]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return sparse.csr_matrix((data, self._cols[self._starts], indptr), shape=(n, n))
+
+    def _variant(self, half_life_days, fee_weighted):
+        # (matrix, row-normalized matrix) with each transfer weighted as asked
+        key = (half_life_days or None, bool(fee_weighted))
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is None:
+                variant = self._variants[key] = self._weigh(*key)
+                if len(self._variants) > MAX_VARIANTS:
+                    self._variants.pop(next(iter(self._variants)))
+        return variant
+
+    def _weigh(self, half_life_days, fee_weighted):
+        weights = np.ones(len(self._rows))
+        if half_life_days:
+            # Transfers without a date weigh 0 and do not set the latest date
+            dated = self._dates[~np.isnat(self._dates)]
+            latest = dated.max() if len(dated) else np.datetime64("NaT")
+            age = (latest - self._dates) / np.timedelta64(1, "D")
+            weights *= np.where(np.isnan(age), 0.0, 0.5 ** (age / half_life_days))
+        if fee_weighted:
+            weights *= 1 + np.log1p(np.nan_to_num(self._fees, nan=0.0).clip(0) / FEE_UNIT)
+        matrix = self._compile(weights) if half_life_days or fee_weighted else self.matrix
+        totals = np.asarray(matrix.sum(axis=1)).ravel()
+        scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+        return matrix, (sparse.diags(scale) @ matrix).tocsr()
+
+    def weighted(self, half_life_days=None, fee_weighted=False):
+        """Matrix with each transfer weighted by recency and/or fee.
+
+        With a half-life, a transfer counts 0.5 ** (age / half_life) where
+        age is its distance in days to the latest transfer; with fee
+        weighting it counts 1 + ln(1 + fee in millions), free and unknown
+        fees counting 1. Without either it is the count matrix.
+        """
+        return self._variant(half_life_days, fee_weighted)[0]
+
+    def transitions(self, club_ids, half_life_days=None, fee_weighted=False):
+        """Destination shares of each of club_ids, one sparse row per club.
+
+        Clubs unknown to the graph or without outgoing transfers get empty rows.
+        """
+        matrix = self._variant(half_life_days, fee_weighted)[1]
+        rows = [self.slots.get(club_id) for club_id in club_ids]
+        selector = sparse.csr_matrix(
+            (np.ones(sum(row is not None for row in rows)),
+             ([k for k, row in enumerate(rows) if row is not None], [row for row in rows if row is not None])),
+            shape=(len(rows), len(self)),
+        )
+        return selector @ matrix
+
+    def destination_shares(self, club_id):
+        """Share of each destination name among the club's outgoing transfers.
+
+        Ordered like value_counts of the destination names: by first
+        appearance, then a descending argsort of the counts.
+        """
+        i = self.slots.get(club_id)
+        if i is None:
+            return {}
+        edges = slice(self._out_ptr[i], self._out_ptr[i + 1])
+        to_names, inverse = np.unique(self._edge_to[edges], return_inverse=True)
+        counts = np.bincount(inverse, weights=self._edge_counts[edges]).astype(np.int64)
+        first = np.full(len(to_names), np.iinfo(np.int64).max)
+        np.minimum.at(first, inverse, self._edge_first[edges])
+        appearance = np.argsort(first)[::-1]
+        order = appearance[counts[appearance].argsort(kind="quicksort")][::-1]
+        shares = counts[order] / counts.sum()
+        return dict(zip(self.labels[to_names[order]].tolist(), shares.tolist()))
+
+    def pair_shares(self, club_id):
+        """Share of each (from name, to name) pair among the transfers out of
+        the club and into it from other clubs, in name order."""
+        i = self.slots.get(club_id)
+        if i is None:
+            return {}
+        incoming = self._in_order[self._in_ptr[i]:self._in_ptr[i + 1]]
+        edges = np.concatenate([np.arange(self._out_ptr[i], self._out_ptr[i + 1]), incoming[self._edge_rows[incoming] != i]])
+        edges = edges[self._edge_from[edges] >= 0]
+        keys = self._edge_from[edges] * len(self.labels) + self._edge_to[edges]
+        pairs, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=self._edge_counts[edges])
+        shares = counts / counts.sum()
+        return {
+            (self.labels[pair // len(self.labels)], self.labels[pair % len(self.labels)]): share
+            for pair, share in zip(pairs.tolist(), shares.tolist())
+        }
+
+    def reach(self, club_ids, hops=2, half_life_days=None, fee_weighted=False):
+        """Where transfers starting at each of club_ids lead within `hops` moves.
+
+        One sparse matrix per hop with a row per club: entry j of hop k is
+        the probability that a k-th consecutive move ends at club j, each
+        move following the destination shares of the club it starts from.
+        """
+        matrix = self._variant(half_life_days, fee_weighted)[1]
+        step = self.transitions(club_ids, half_life_days, fee_weighted)
+        steps = [step]
+        for _ in range(hops - 1):
+            step = step @ matrix
+            steps.append(step)
+        return steps
+
+    def top(self, vector, n=10):
+        """The n largest entries of a sparse row as (club id, name, value),
+        largest first; destinations without a club id have id None."""
+        vector = sparse.csr_matrix(vector)
+        order = np.lexsort((vector.indices, -vector.data))[:n]
+        return [
+            (int(self.club_ids[j]) if self.club_ids[j] >= 0 else None, self.names[j], float(value))
+            for j, value in zip(vector.indices[order], vector.data[order])
+        ]
@@ -1,73 +1,126 @@
 import numpy as np
 import pandas as pd
 
-def get_market_trends(transfers_df, clubs_df):
-    transfers_df["transfer_fee"] = transfers_df["transfer_fee"].fillna(0)
-    transfers_df = transfers_df.merge(
-        clubs_df[['club_id', 'domestic_competition_id']],
-        left_on="to_club_id", right_on="club_id", how="left"
-    )
-    league_investments = transfers_df.groupby("domestic_competition_id")["transfer_fee"].sum().reset_index()
-    all_leagues = clubs_df[['domestic_competition_id']].drop_duplicates()
-    league_investments = all_leagues.merge(league_investments, on="domestic_competition_id", how="left")
-    league_investments["transfer_fee"] = league_investments["transfer_fee"].fillna(0)
+from models.instrumentation import stage
+from models.market_cube import build_cube, league_totals
+from models.row_index import lookup, lookup_many
+from models.transfer_graph import TransferGraph
+
+def get_market_trends(transfers_df, clubs_df, cube=None):
+    # All-time investment score per league (0-10), from the market cube
+    if cube is None:
+        cube = build_cube(transfers_df, clubs_df)
+    league_investments = clubs_df[["domestic_competition_id"]].drop_duplicates()
+    bought = league_totals(cube)["total_bought"]
+    # Mapped as strings: mapping a categorical would give a categorical back
+    league_investments["transfer_fee"] = league_investments["domestic_competition_id"].astype(object).map(bought).fillna(0)
     max_investment = league_investments["transfer_fee"].max()
     league_investments["investment_score"] = (league_investments["transfer_fee"] / max_investment) * 10
     return league_investments.set_index("domestic_competition_id")["investment_score"].to_dict()
 
 def get_club_spending_profile(transfers_df):
-    club_stats = transfers_df.copy()
+    club_stats = transfers_df[["to_club_name", "transfer_fee"]].copy()
     club_stats["transfer_fee"] = club_stats["transfer_fee"].fillna(0)
-    club_summary = club_stats.groupby("to_club_name")["transfer_fee"].agg(["mean", "std"]).fillna(0)
+    club_summary = club_stats.groupby("to_club_name", observed=True)["transfer_fee"].agg(["mean", "std"]).fillna(0)
     return club_summary.to_dict(orient="index")
 
-def get_recent_transfer_patterns(transfers_df, club_id):
-    recent = transfers_df[transfers_df["from_club_id"] == club_id]
-    return recent["to_club_name"].value_counts(normalize=True).to_dict()
-
-def get_club_to_club_patterns(transfers_df, club_id):
-    club_transfers = transfers_df[(transfers_df["from_club_id"] == club_id) | (transfers_df["to_club_id"] == club_id)]
-    pairs = club_transfers.groupby(["from_club_name", "to_club_name"]).size().reset_index(name="count")
+def _destination_shares(to_club_names):
+    # As strings: value_counts of a categorical lists every category and breaks
+    # ties by category instead of first appearance
+    return to_club_names.astype(object).value_counts(normalize=True).to_dict()
+
+# Pattern functions over the transfer rows; predict_transfer reads the same
+# shares from the TransferGraph in the aggregates
+def get_recent_transfer_patterns(transfers_df, club_id, indexes=None):
+    recent = lookup(indexes, "transfers", transfers_df, "from_club_id", club_id)
+    return _destination_shares(recent["to_club_name"])
+
+def get_club_to_club_patterns(transfers_df, club_id, indexes=None):
+    outgoing = lookup(indexes, "transfers", transfers_df, "from_club_id", club_id)
+    incoming = lookup(indexes, "transfers", transfers_df, "to_club_id", club_id)
+    club_transfers = pd.concat([outgoing, incoming[incoming["from_club_id"] != club_id]])
+    pairs = club_transfers.groupby(["from_club_name", "to_club_name"], observed=True).size().reset_index(name="count")
     pairs["probability"] = pairs["count"] / pairs["count"].sum()
     return pairs.set_index(["from_club_name", "to_club_name"])["probability"].to_dict()
 
-def predict_transfer(player_id, player_valuations_df, transfers_df, players_df, clubs_df):
-    player_data = players_df[players_df["player_id"] == player_id]
+def get_nationality_destinations(transfers_df, players_df):
+    # Destination histogram of all transfers, per player nationality
+    nationality = players_df.drop_duplicates("player_id").set_index("player_id")["country_of_citizenship"]
+    transfer_nationality = transfers_df["player_id"].map(nationality)
+    return {
+        country: _destination_shares(group["to_club_name"])
+        for country, group in transfers_df.groupby(transfer_nationality, sort=False, observed=True)
+    }
+
+def build_transfer_aggregates(transfers_df, players_df, clubs_df, cube=None):
+    # Player-independent tables used by predict_transfer; build once per dataset version
+    return {
+        "market_trends": get_market_trends(transfers_df, clubs_df, cube),
+        "spending_profile": get_club_spending_profile(transfers_df),
+        "destination_to_league": clubs_df.set_index("name")["domestic_competition_id"].to_dict(),
+        "nationality_destinations": get_nationality_destinations(transfers_df, players_df),
+        "transfer_graph": TransferGraph.build(transfers_df),
+    }
+
+def predict_transfer(player_id, player_valuations_df, transfers_df, players_df, clubs_df, aggregates=None, indexes=None, features=None):
+    with stage("predict_transfer.lookup"):
+        player_data = lookup(indexes, "players", players_df, "player_id", player_id)
     if player_data.empty:
         return {"error": "Player not found."}
 
-    valuation_data = player_valuations_df[player_valuations_df["player_id"] == player_id]
-    transfer_data = transfers_df[transfers_df["player_id"] == player_id]
+    with stage("predict_transfer.history"):
+        if features is not None and player_id in features.index:
+            # Served from the feature store
+            last_value = features.at[player_id, "market_value_peak"]
+            transfer_count = int(features.at[player_id, "transfer_count"])
+        else:
+            valuation_data = lookup(indexes, "player_valuations", player_valuations_df, "player_id", player_id)
+            transfer_data = lookup(indexes, "transfers", transfers_df, "player_id", player_id)
+            last_value = valuation_data["market_value_in_eur"].max()
+            transfer_count = len(transfer_data)
 
-    last_value = valuation_data["market_value_in_eur"].max()
     contract_end = player_data["contract_expiration_date"].iloc[0]
     nationality = player_data["country_of_citizenship"].iloc[0]
     age = 2025 - player_data["date_of_birth"].iloc[0].year
     last_value = int(last_value) if not np.isnan(last_value) else None
-    transfer_count = len(transfer_data)
     current_club = player_data["current_club_id"].iloc[0]
     current_club_name = player_data["current_club_name"].iloc[0]
     player_league = player_data["current_club_domestic_competition_id"].iloc[0]
 
     # Base probability
-    contract_factor = 0.6 if contract_end <= "2025-06-30" else 0.2
+    # A missing contract date counts as not expiring, as in predict_transfer_batch
+    contract_factor = 0.6 if pd.notna(contract_end) and contract_end <= "2025-06-30" else 0.2
     transfer_prob = min(1, (transfer_count / 10) + (100 - age) / 200 + contract_factor)
-    # Patterns
-    recent_club_patterns = get_recent_transfer_patterns(transfers_df, current_club)
-    club_to_club_patterns = get_club_to_club_patterns(transfers_df, current_club)
+    if aggregates is None:
+        with stage("predict_transfer.aggregates"):
+            aggregates = build_transfer_aggregates(transfers_df, players_df, clubs_df)
+
+    # Patterns, rows of the transfer graph
+    with stage("predict_transfer.club_patterns"):
+        graph = aggregates["transfer_graph"]
+        recent_club_patterns = graph.destination_shares(current_club)
+        club_to_club_patterns = graph.pair_shares(current_club)
 
     # Nationality and continent
-    same_nationality = players_df[players_df["country_of_citizenship"] == nationality]["player_id"]
-    national_transfers = transfers_df[transfers_df["player_id"].isin(same_nationality)]
-    national_destinations = national_transfers["to_club_name"].value_counts(normalize=True).to_dict()
+    with stage("predict_transfer.nationality"):
+        national_destinations = aggregates["nationality_destinations"].get(nationality, {})
 
     # Investment trends per league
-    market_trends = get_market_trends(transfers_df, clubs_df)
-    investment_factor = market_trends.get(player_league, 0.3)
-    transfer_prob = min(1, transfer_prob + investment_factor)
-
+    with stage("predict_transfer.market_trends"):
+        market_trends = aggregates["market_trends"]
+        investment_factor = market_trends.get(player_league, 0.3)
+        transfer_prob = min(1, transfer_prob + investment_factor)
+
+    with stage("predict_transfer.scoring"):
+        likely_destinations = score_destinations(
+            current_club_name, recent_club_patterns, club_to_club_patterns, national_destinations, last_value, aggregates
+        )
+    return transfer_result(player_id, last_value, transfer_prob, likely_destinations)
+
+def score_destinations(current_club_name, recent_club_patterns, club_to_club_patterns, national_destinations, last_value, aggregates):
+    market_trends = aggregates["market_trends"]
     # Club spending profile
-    spending_profile = get_club_spending_profile(transfers_df)
+    spending_profile = aggregates["spending_profile"]
 
     # Destination score calculation
     likely_destinations = {}
@@ -83,7 +136,7 @@ def predict_transfer(player_id, player_valuations_df, transfers_df, players_df,
         likely_destinations[club] = likely_destinations.get(club, 0) + prob * 0.3
 
     # Adjust with league investment and club financial capacity
-    destination_to_league = clubs_df.set_index("name")["domestic_competition_id"].to_dict()
+    destination_to_league = aggregates["destination_to_league"]
     for club in likely_destinations:
         league_id = destination_to_league.get(club)
         if league_id and league_id in market_trends:
@@ -102,20 +155,71 @@ def predict_transfer(player_id, player_valuations_df, transfers_df, players_df,
     # Normalize and return top 5
     total = sum(likely_destinations.values())
     if total == 0:
-        return {
-            "player_id": int(player_id),
-            "market_value": last_value,
-            "transfer_probability": round(transfer_prob * 100, 2),
-            "likely_destinations": {}
-        }
+        return {}
 
     normalized = {club: (score / total) * 100 for club, score in likely_destinations.items()}
     top5 = dict(sorted(normalized.items(), key=lambda x: x[1], reverse=True)[:5])
-    top5 = {club: round(score, 2) for club, score in top5.items()}
+    return {club: round(score, 2) for club, score in top5.items()}
 
+def transfer_result(player_id, last_value, transfer_prob, likely_destinations):
     return {
         "player_id": int(player_id),
         "market_value": last_value,
         "transfer_probability": round(transfer_prob * 100, 2),
-        "likely_destinations": top5
-    }
\ No newline at end of file
+        "likely_destinations": likely_destinations
+    }
+
+def predict_transfer_batch(player_ids, player_valuations_df, transfers_df, players_df, clubs_df, aggregates=None, indexes=None, features=None):
+    """predict_transfer for many players, results in input order.
+
+    Player features are computed for the whole batch with grouped
+    operations, and club patterns are computed once per distinct club.
+    """
+    if aggregates is None:
+        aggregates = build_transfer_aggregates(transfers_df, players_df, clubs_df)
+    market_trends = aggregates["market_trends"]
+    graph = aggregates["transfer_graph"]
+
+    keys = list(dict.fromkeys(player_ids))
+    player_data = lookup_many(indexes, "players", players_df, "player_id", keys).drop_duplicates("player_id")
+    player_data = player_data.set_index("player_id")
+    if features is not None and player_data.index.isin(features.index).all():
+        # Served from the feature store
+        last_values = features["market_value_peak"].reindex(player_data.index)
+        transfer_counts = features["transfer_count"].reindex(player_data.index)
+    else:
+        valuation_data = lookup_many(indexes, "player_valuations", player_valuations_df, "player_id", keys)
+        transfer_data = lookup_many(indexes, "transfers", transfers_df, "player_id", keys)
+        last_values = valuation_data.groupby("player_id")["market_value_in_eur"].max().reindex(player_data.index)
+        transfer_counts = transfer_data.groupby("player_id").size().reindex(player_data.index, fill_value=0)
+
+    # Same base probability as predict_transfer, across the whole batch
+    age = 2025 - player_data["date_of_birth"].dt.year
+    contract_factor = np.where(player_data["contract_expiration_date"] <= "2025-06-30", 0.6, 0.2)
+    transfer_prob = (transfer_counts / 10) + (100 - age) / 200 + contract_factor
+    transfer_prob = transfer_prob.where(transfer_prob < 1, 1)
+    investment_factor = player_data["current_club_domestic_competition_id"].astype(object).map(lambda league: market_trends.get(league, 0.3))
+    transfer_prob = transfer_prob + investment_factor
+    transfer_prob = transfer_prob.where(transfer_prob < 1, 1)
+
+    club_patterns = {}
+    results = {}
+    rows = zip(
+        player_data.index, player_data["current_club_id"], player_data["current_club_name"],
+        player_data["country_of_citizenship"], last_values, transfer_prob,
+    )
+    for player_id, current_club, current_club_name, nationality, last_value, prob in rows:
+        if current_club not in club_patterns:
+            club_patterns[current_club] = (graph.destination_shares(current_club), graph.pair_shares(current_club))
+        recent_club_patterns, club_to_club_patterns = club_patterns[current_club]
+        national_destinations = aggregates["nationality_destinations"].get(nationality, {})
+
+        last_value = int(last_value) if not np.isnan(last_value) else None
+        likely_destinations = score_destinations(
+            current_club_name, recent_club_patterns, club_to_club_patterns, national_destinations, last_value, aggregates
+        )
+        # min(1, ...) in predict_transfer yields the int 1 when capped
+        prob = 1 if prob >= 1 else float(prob)
+        results[player_id] = transfer_result(player_id, last_value, prob, likely_destinations)
+
+    return [results.get(player_id, {"error": "Player not found."}) for player_id in player_ids]
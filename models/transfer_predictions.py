@@ -0,0 +1,117 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+# Table written by precompute_transfers.py, relative to the data path
+TRANSFER_PREDICTIONS_DIR = "transfer_predictions"
+TABLE_FILE = "predictions.feather"
+MANIFEST_FILE = "manifest.json"
+TABLE_FORMAT = 1
+TOP_DESTINATIONS = 5
+
+
+def predictions_table(results):
+    """predict_transfer results as one row per player.
+
+    The top destinations are spread over club_1..club_5 / score_1..score_5
+    in rank order; capped marks a probability that hit 100%, which
+    predict_transfer returns as the int 100.
+    """
+    results = [result for result in results if "error" not in result]
+    columns = {
+        "player_id": np.array([result["player_id"] for result in results], dtype=np.int64),
+        "market_value": np.array([np.nan if result["market_value"] is None else result["market_value"] for result in results], dtype=float),
+        "transfer_probability": np.array([result["transfer_probability"] for result in results], dtype=float),
+        "capped": np.array([isinstance(result["transfer_probability"], int) for result in results], dtype=bool),
+    }
+    ranked = [list(result["likely_destinations"].items()) for result in results]
+    for rank in range(TOP_DESTINATIONS):
+        clubs = [destinations[rank][0] if rank < len(destinations) else None for destinations in ranked]
+        columns[f"club_{rank + 1}"] = pd.Categorical(clubs)
+        columns[f"score_{rank + 1}"] = np.array(
+            [destinations[rank][1] if rank < len(destinations) else np.nan for destinations in ranked], dtype=float
+        )
+    table = pd.DataFrame(columns)
+    table["player_id"] = pd.to_numeric(table["player_id"], downcast="integer")
+    return table
+
+
+class TransferPredictions:
+    """Precomputed predict_transfer results of one dataset version.
+
+    Only served while the backend's data version and feature as-of date
+    match the ones the table was computed from; get() returns None for
+    players the job did not cover, which are then predicted live.
+    """
+
+    def __init__(self, table, manifest):
+        self.table = table
+        self.manifest = manifest
+        self.rows = {player_id: row for row, player_id in enumerate(table["player_id"].tolist())}
+        self._market_value = table["market_value"].to_numpy()
+        self._probability = table["transfer_probability"].to_numpy()
+        self._capped = table["capped"].to_numpy()
+        self._clubs = [table[f"club_{rank + 1}"].to_numpy() for rank in range(TOP_DESTINATIONS)]
+        self._scores = [table[f"score_{rank + 1}"].to_numpy() for rank in range(TOP_DESTINATIONS)]
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, player_id):
+        row = self.rows.get(player_id)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        market_value = self._market_value[row]
+        destinations = {}
+        for clubs, scores in zip(self._clubs, self._scores):
+            if pd.isna(clubs[row]):
+                break
+            destinations[clubs[row]] = float(scores[row])
+        return {
+            "player_id": int(player_id),
+            "market_value": None if np.isnan(market_value) else int(market_value),
+            "transfer_probability": 100 if self._capped[row] else float(self._probability[row]),
+            "likely_destinations": destinations,
+        }
+
+    def stats(self):
+        return {
+            "version": self.manifest["version"],
+            "as_of": self.manifest["as_of"],
+            "players": len(self),
+            "coverage": self.manifest.get("coverage"),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    @staticmethod
+    def path(data_path):
+        return os.path.join(data_path, TRANSFER_PREDICTIONS_DIR)
+
+    def save(self, data_path):
+        path = self.path(data_path)
+        os.makedirs(path, exist_ok=True)
+        feather.write_feather(self.table, os.path.join(path, TABLE_FILE))
+        with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+            json.dump({**self.manifest, "format": TABLE_FORMAT}, f, indent=2)
+
+    @classmethod
+    def load(cls, data_path, version, as_of):
+        """The stored table if it was computed for this version and as-of date, else None."""
+        path = cls.path(data_path)
+        manifest_file = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if (manifest.get("format") != TABLE_FORMAT or manifest.get("version") != version
+                or manifest.get("as_of") != f"{as_of:%Y-%m-%d}"):
+            return None
+        return cls(feather.read_feather(os.path.join(path, TABLE_FILE)), manifest)
@@ -0,0 +1,132 @@
+# Transfer probability and top-5 destinations of every active player,
+# computed offline across processes and served by the backend's /predict_transfer
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Allow `models.*` imports when run as a script
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.data_state import load_state
+from models.transfer_model import predict_transfer, predict_transfer_batch
+from models.transfer_predictions import TransferPredictions, predictions_table
+
+DATA_PATH = "data/"
+# Chunks per worker; players of one club share a chunk so club patterns are computed once
+CHUNKS_PER_WORKER = 4
+
+
+def active_player_ids(players):
+    # Players at a club; with the full dataset, those who played the latest season
+    active = players["current_club_id"].notna()
+    if "last_season" in players:
+        active &= players["last_season"] == players["last_season"].max()
+    return players.loc[active].sort_values(["current_club_id", "player_id"])["player_id"].drop_duplicates().tolist()
+
+
+# Per-process state of the workers
+_worker = {}
+
+
+def _init_worker(data_path):
+    # Forked workers inherit the parent's state; spawned ones load it once
+    if "state" not in _worker:
+        _worker["state"], _ = load_state(data_path, os.path.join(data_path, "feature_store/"))
+
+
+def _predict_chunk(player_ids):
+    state = _worker["state"]
+    start = time.perf_counter()
+    results = predict_transfer_batch(
+        player_ids, state.player_valuations, state.transfers, state.players, state.clubs,
+        state.aggregates, state.indexes, state.player_features,
+    )
+    return results, time.perf_counter() - start
+
+
+def precompute(state, player_ids, workers=None):
+    """predict_transfer results of player_ids as a TransferPredictions table.
+
+    Chunks of consecutive players (sorted by club) are predicted in a
+    process pool; the manifest records the data version, the feature as-of
+    date, coverage and timings.
+    """
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    chunks = [chunk.tolist() for chunk in np.array_split(np.array(player_ids, dtype=object), max(1, workers * CHUNKS_PER_WORKER)) if len(chunk)]
+
+    _worker["state"] = state
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(state.data_path,)) if workers > 1 else None
+    try:
+        outputs = list((pool.map if pool else map)(_predict_chunk, chunks))
+    finally:
+        if pool:
+            pool.shutdown()
+
+    results = [result for chunk_results, _ in outputs for result in chunk_results]
+    table = predictions_table(results)
+    seconds = time.perf_counter() - start
+    manifest = {
+        "version": state.version,
+        "as_of": f"{state.features_as_of:%Y-%m-%d}",
+        "players": len(state.players),
+        "active_players": len(player_ids),
+        "predicted": len(table),
+        "coverage": round(len(table) / len(state.players), 4) if len(state.players) else None,
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "chunk_seconds": round(sum(chunk_seconds for _, chunk_seconds in outputs), 3),
+    }
+    return TransferPredictions(table, manifest)
+
+
+def verify(state, predictions, sample=None, seed=0):
+    """Compares stored results with live predict_transfer; returns the mismatched player ids."""
+    player_ids = list(predictions.rows)
+    if sample is not None and sample < len(player_ids):
+        player_ids = np.random.default_rng(seed).choice(player_ids, sample, replace=False).tolist()
+    mismatched = []
+    for player_id in player_ids:
+        live = predict_transfer(
+            player_id, state.player_valuations, state.transfers, state.players, state.clubs,
+            state.aggregates, state.indexes, state.player_features,
+        )
+        # As JSON, so that an int 100 and a float 100.0 differ like in the response
+        if json.dumps(predictions.get(player_id), sort_keys=True) != json.dumps(live, sort_keys=True):
+            mismatched.append(player_id)
+    print(f"{'Identical' if not mismatched else f'{len(mismatched)} DIFFERENT'} results on {len(player_ids)} players")
+    return mismatched
+
+
+def run(data_path, workers=None, verify_sample=None):
+    state, _ = load_state(data_path, os.path.join(data_path, "feature_store/"))
+    player_ids = active_player_ids(state.players)
+    print(f"Predicting {len(player_ids)} active players of {len(state.players)} with {workers or os.cpu_count()} workers")
+
+    predictions = precompute(state, player_ids, workers)
+    predictions.save(data_path)
+    manifest = predictions.manifest
+    print(f"{manifest['predicted']} players predicted ({manifest['coverage']:.1%} of all players) in {manifest['seconds']:.2f}s, "
+          f"{manifest['chunk_seconds']:.2f}s in workers ({manifest['chunk_seconds'] / manifest['seconds']:.1f}x parallel, "
+          f"{manifest['seconds'] * 1000 / max(1, manifest['predicted']):.2f}ms per player)")
+    print(f"Written to {TransferPredictions.path(data_path)} for data version {manifest['version']} as of {manifest['as_of']}")
+
+    if verify_sample is not None:
+        return not verify(state, predictions, sample=verify_sample or None)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute transfer predictions for every active player")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--verify", type=int, nargs="?", const=0, metavar="SAMPLE",
+                        help="compare with live predict_transfer afterwards, on SAMPLE random players (all by default)")
+    args = parser.parse_args()
+
+    raise SystemExit(0 if run(args.data_path, args.workers, args.verify) else 1)
@@ -0,0 +1,60 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from models.train_club_prediction_model import player_stats, prepare_transfers, verify
+
+
+def _tables(seed=7, n_players=60, n_clubs=8):
+    rng = np.random.default_rng(seed)
+    player_ids = np.arange(1, n_players + 1)
+    players = pd.DataFrame({
+        "player_id": player_ids,
+        "date_of_birth": pd.to_datetime("1990-01-01") + pd.to_timedelta(rng.integers(0, 4000, n_players), unit="D"),
+        "contract_expiration_date": pd.to_datetime("2024-06-30") + pd.to_timedelta(rng.integers(0, 1500, n_players), unit="D"),
+        "height_in_cm": rng.integers(165, 200, n_players).astype(float),
+        "position": rng.choice(["Goalkeeper", "Defender", "Midfield", "Attack"], n_players),
+        "foot": rng.choice(["left", "right", "both"], n_players),
+        "country_of_citizenship": rng.choice(["Spain", "Brazil", "Japan"], n_players),
+    })
+    players.loc[3, "date_of_birth"] = pd.NaT
+    players.loc[5, "contract_expiration_date"] = pd.NaT
+
+    n_vals = 600
+    player_valuations = pd.DataFrame({
+        "player_id": rng.choice(player_ids[:-5], n_vals),
+        "date": pd.to_datetime("2016-01-01") + pd.to_timedelta(rng.integers(0, 2500, n_vals), unit="D"),
+        "market_value_in_eur": rng.choice([0, 250_000, 1_000_000, 4_500_000, 12_000_000], n_vals).astype(float),
+    }).drop_duplicates(["player_id", "date"])
+    n_apps = 1500
+    appearances = pd.DataFrame({
+        "player_id": rng.choice(player_ids[:-2], n_apps),
+        "date": pd.to_datetime("2016-01-01") + pd.to_timedelta(rng.integers(0, 2500, n_apps), unit="D"),
+        "goals": rng.poisson(0.3, n_apps),
+        "assists": rng.poisson(0.2, n_apps),
+        "minutes_played": rng.integers(1, 91, n_apps),
+    })
+    n_transfers = 150
+    transfers = pd.DataFrame({
+        "player_id": rng.choice(player_ids, n_transfers),
+        "transfer_date": pd.to_datetime("2016-06-01") + pd.to_timedelta(rng.integers(0, 2700, n_transfers), unit="D"),
+        "from_club_id": rng.integers(1, n_clubs + 1, n_transfers),
+        "to_club_id": rng.integers(1, n_clubs + 1, n_transfers).astype(float),
+    })
+    transfers.loc[::17, "to_club_id"] = np.nan
+    clubs = pd.DataFrame({
+        "club_id": np.arange(1, n_clubs + 1),
+        "domestic_competition_id": np.where(np.arange(n_clubs) % 2, "ES1", "L1"),
+    })
+    competitions = pd.DataFrame({"competition_id": ["ES1", "L1"], "country_name": ["Spain", "Germany"]})
+    return players, transfers, player_valuations, appearances, clubs, competitions
+
+
+def test_build_dataset_matches_loop():
+    players, transfers, player_valuations, appearances, clubs, competitions = _tables()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", pd.errors.SettingWithCopyWarning)
+        transfers = prepare_transfers(transfers, clubs, competitions)
+    peak_value, total_perf = player_stats(player_valuations, appearances)
+    verify(transfers, player_valuations, players, total_perf, peak_value, len(transfers))
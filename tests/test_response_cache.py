@@ -0,0 +1,23 @@
+from models.cache import ResponseCache
+
+
+def test_new_version_replaces_entries():
+    cache = ResponseCache()
+    cache.put("a", "v1", b"old")
+    assert cache.get("a", "v2") is None
+    cache.put("a", "v2", b"new")
+    assert cache.get("a", "v2").body == b"new"
+
+
+def test_late_requests_on_an_old_version_keep_the_new_entries():
+    cache = ResponseCache()
+    cache.put("a", "v1", b"old")
+    cache.put("a", "v2", b"new")
+    # A request that took the previous state before the reload
+    assert cache.get("a", "v1") is None
+    entry = cache.put("b", "v1", b"late")
+    assert entry.body == b"late"
+    assert cache.version == "v2"
+    assert cache.get("a", "v2").body == b"new"
+    assert cache.get("b", "v2") is None
+    assert cache.stats()["stale"] == 2
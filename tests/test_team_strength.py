@@ -0,0 +1,45 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from models.team_strength import TeamStrengths
+
+
+def _games(dates):
+    return pd.DataFrame({
+        "date": dates,
+        "home_club_id": [1, 2, 3, 1, 4],
+        "away_club_id": [2, 3, 1, 4, 2],
+        "home_club_goals": [2, 0, 1, 3, 1],
+        "away_club_goals": [1, 0, 2, 0, 1],
+    })
+
+
+def _fitted_in_order(games):
+    # Results applied one by one in the expected order
+    strengths = TeamStrengths()
+    for home_id, away_id, home_goals, away_goals in games[
+        ["home_club_id", "away_club_id", "home_club_goals", "away_club_goals"]
+    ].itertuples(index=False):
+        strengths.add_result(home_id, away_id, home_goals, away_goals)
+    return strengths
+
+
+def test_fit_applies_every_game_once_with_undated_games_last():
+    games = _games(["2024-03-01", None, "2024-01-01", None, "2024-02-01"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        strengths = TeamStrengths.fit(games)
+    expected = _fitted_in_order(games.iloc[[2, 4, 0, 1, 3]])
+    assert strengths.n_results == len(games)
+    assert strengths.games == expected.games
+    assert strengths.elo == pytest.approx(expected.elo)
+    assert strengths.scored == pytest.approx(expected.scored)
+
+
+def test_fit_orders_dated_games_by_date():
+    games = _games(["2024-05-01", "2024-01-01", "2024-03-01", "2024-02-01", "2024-04-01"])
+    strengths = TeamStrengths.fit(games)
+    expected = _fitted_in_order(games.iloc[[1, 3, 2, 4, 0]])
+    assert strengths.elo == pytest.approx(expected.elo)
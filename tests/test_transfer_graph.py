@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.transfer_graph import TransferGraph
+
+
+def _transfers(dates):
+    return pd.DataFrame({
+        "player_id": [1, 2, 3, 4],
+        "transfer_date": pd.to_datetime(dates),
+        "from_club_id": [10, 10, 10, 20],
+        "to_club_id": [20.0, 20.0, 30.0, 30.0],
+        "from_club_name": ["Ten", "Ten", "Ten", "Twenty"],
+        "to_club_name": ["Twenty", "Twenty", "Thirty", "Thirty"],
+        "transfer_fee": [0.0, 1e6, np.nan, 5e5],
+    })
+
+
+def test_half_life_weights_decay_from_latest_transfer():
+    graph = TransferGraph.build(_transfers(["2023-01-01", "2024-01-01", "2024-01-01", "2023-01-01"]))
+    weighted = graph.weighted(half_life_days=365).toarray()
+    ten, twenty, thirty = (graph.slots[club] for club in (10, 20, 30))
+    assert weighted[ten, twenty] == pytest.approx(1 + 0.5 ** (365 / 365))
+    assert weighted[ten, thirty] == pytest.approx(1.0)
+    assert weighted[twenty, thirty] == pytest.approx(0.5)
+
+
+def test_missing_date_weighs_zero_and_keeps_the_others():
+    graph = TransferGraph.build(_transfers(["2023-01-01", None, "2024-01-01", "2023-01-01"]))
+    weighted = graph.weighted(half_life_days=365).toarray()
+    ten, twenty, thirty = (graph.slots[club] for club in (10, 20, 30))
+    assert weighted[ten, twenty] == pytest.approx(0.5)
+    assert weighted[ten, thirty] == pytest.approx(1.0)
+    assert weighted.sum() == pytest.approx(2.0)
+    shares = graph.transitions([10], half_life_days=365).toarray()[0]
+    assert shares[thirty] == pytest.approx(1 / 1.5)
+
+
+def test_all_dates_missing_gives_empty_weights():
+    graph = TransferGraph.build(_transfers([None] * 4))
+    assert graph.weighted(half_life_days=365).sum() == 0
+    assert graph.weighted().sum() == 4